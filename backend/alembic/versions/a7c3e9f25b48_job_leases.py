@@ -0,0 +1,32 @@
+"""job + automation run leases (leased_until)
+
+Revision ID: a7c3e9f25b48
+Revises: f4a8d1c06e39
+Create Date: 2026-10-17 13:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'a7c3e9f25b48'
+down_revision: Union[str, None] = 'f4a8d1c06e39'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('leased_until', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_jobs_leased_until'), ['leased_until'], unique=False)
+    with op.batch_alter_table('automation_runs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('leased_until', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('automation_runs', schema=None) as batch_op:
+        batch_op.drop_column('leased_until')
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_jobs_leased_until'))
+        batch_op.drop_column('leased_until')
@@ -0,0 +1,32 @@
+"""job run timings for queue metrics (started_at, finished_at, worker)
+
+Revision ID: b2d6f8a41c90
+Revises: a7c3e9f25b48
+Create Date: 2026-10-17 15:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'b2d6f8a41c90'
+down_revision: Union[str, None] = 'a7c3e9f25b48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('started_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('worker', sa.String(length=100), nullable=True))
+        batch_op.add_column(sa.Column('finished_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_jobs_finished_at'), ['finished_at'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_jobs_finished_at'))
+        batch_op.drop_column('finished_at')
+        batch_op.drop_column('worker')
+        batch_op.drop_column('started_at')
@@ -0,0 +1,26 @@
+"""sending_domain smtp_connections (concurrent relay connections per send)
+
+Revision ID: b3e8f4a61c27
+Revises: a5c7e2d91b30
+Create Date: 2026-10-17 10:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'b3e8f4a61c27'
+down_revision: Union[str, None] = 'a5c7e2d91b30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('sending_domains', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('smtp_connections', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('sending_domains', schema=None) as batch_op:
+        batch_op.drop_column('smtp_connections')
@@ -0,0 +1,43 @@
+"""quota reservations tied to jobs; messages record the period they were charged to
+
+Revision ID: c5e1a7d93f02
+Revises: b2d6f8a41c90
+Create Date: 2026-10-17 17:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'c5e1a7d93f02'
+down_revision: Union[str, None] = 'b2d6f8a41c90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('quota_reservations',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('workspace_id', sa.Integer(), nullable=False),
+    sa.Column('period', sa.String(length=7), nullable=False),
+    sa.Column('held', sa.Integer(), nullable=False),
+    sa.Column('job_id', sa.Integer(), nullable=True),
+    sa.Column('job_attempt', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.ForeignKeyConstraint(['workspace_id'], ['workspaces.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('quota_reservations', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_quota_reservations_job_id'), ['job_id'], unique=False)
+    with op.batch_alter_table('messages', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('quota_period', sa.String(length=7), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('messages', schema=None) as batch_op:
+        batch_op.drop_column('quota_period')
+    with op.batch_alter_table('quota_reservations', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_quota_reservations_job_id'))
+    op.drop_table('quota_reservations')
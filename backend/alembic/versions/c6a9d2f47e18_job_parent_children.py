@@ -0,0 +1,32 @@
+"""job parent_id / pending_children (fan-out of chunked campaign sends)
+
+Revision ID: c6a9d2f47e18
+Revises: b3e8f4a61c27
+Create Date: 2026-10-17 10:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'c6a9d2f47e18'
+down_revision: Union[str, None] = 'b3e8f4a61c27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('parent_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('pending_children', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.create_index(batch_op.f('ix_jobs_parent_id'), ['parent_id'], unique=False)
+        batch_op.create_foreign_key('fk_jobs_parent_id', 'jobs', ['parent_id'], ['id'], ondelete='CASCADE')
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_jobs_parent_id', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_jobs_parent_id'))
+        batch_op.drop_column('pending_children')
+        batch_op.drop_column('parent_id')
@@ -0,0 +1,30 @@
+"""message attempts / next_attempt_at (per-message retry of deferred sends)
+
+Revision ID: d8b1e5c39f62
+Revises: c6a9d2f47e18
+Create Date: 2026-10-17 10:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'd8b1e5c39f62'
+down_revision: Union[str, None] = 'c6a9d2f47e18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('messages', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('next_attempt_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_messages_next_attempt_at'), ['next_attempt_at'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('messages', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_messages_next_attempt_at'))
+        batch_op.drop_column('next_attempt_at')
+        batch_op.drop_column('attempts')
@@ -0,0 +1,41 @@
+"""send_usage (per-workspace monthly send counter with reservations)
+
+Revision ID: e2f7c4b93a15
+Revises: d8b1e5c39f62
+Create Date: 2026-10-17 11:00:00.000000
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'e2f7c4b93a15'
+down_revision: Union[str, None] = 'd8b1e5c39f62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('send_usage',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('workspace_id', sa.Integer(), nullable=False),
+    sa.Column('period', sa.String(length=7), nullable=False),
+    sa.Column('sent', sa.Integer(), nullable=False),
+    sa.Column('reserved', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['workspace_id'], ['workspaces.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('workspace_id', 'period', name='uq_send_usage_workspace_period')
+    )
+    # Seed the current month from the messages already sent in it.
+    now = datetime.utcnow()
+    op.execute(sa.text(
+        "INSERT INTO send_usage (workspace_id, period, sent, reserved) "
+        "SELECT workspace_id, :period, COUNT(id), 0 FROM messages "
+        "WHERE status = 'sent' AND sent_at >= :start GROUP BY workspace_id"
+    ).bindparams(period=now.strftime("%Y-%m"), start=datetime(now.year, now.month, 1)))
+
+
+def downgrade() -> None:
+    op.drop_table('send_usage')
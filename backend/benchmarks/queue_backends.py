@@ -0,0 +1,133 @@
+"""Queue backend benchmark: jobs/s through each ``QueueBackend``.
+
+For every backend (``sql`` — the jobs table in the app database, ``sqlite-wal``
+— a queue file of its own, ``memory`` — a per-process store) it enqueues a
+backlog of no-op jobs one transaction each, then drains it with a pool of
+worker threads (claim, run, complete: the real ``run_job`` path, progress
+heartbeat included). Optionally, threads posing as API traffic keep writing
+to the app database meanwhile, which is where a separate queue store pays off::
+
+    python benchmarks/queue_backends.py
+    python benchmarks/queue_backends.py --jobs 5000 --workers 8 --api-writers 2
+    python benchmarks/queue_backends.py --db postgresql+psycopg://u:p@localhost/icereach_bench
+
+Reported per backend: enqueue/s, drain jobs/s, the app-database writes/s the
+API threads managed during the drain, and worker errors (on SQLite, mostly
+"database is locked" from workers and API contending for one write lock).
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--db", default="sqlite:///./queue_backends_bench.db", help="app database")
+    ap.add_argument("--jobs", type=int, default=2000)
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--batch", type=int, default=8, help="jobs per claim")
+    ap.add_argument("--api-writers", type=int, default=1, help="threads writing to the app DB during the drain")
+    ap.add_argument("--backends", default="sql,sqlite-wal,memory")
+    ap.add_argument("--timeout", type=float, default=120, help="give up draining after this many seconds")
+    args = ap.parse_args()
+
+    os.environ["DATABASE_URL"] = args.db  # before icereach reads its settings
+    from sqlalchemy import update
+
+    from icereach.db import Base, SessionLocal, engine
+    from icereach.models import Workspace
+    from icereach.services import queue
+
+    @queue.register("bench_noop")
+    def _noop(db, job, progress):
+        progress(50)
+        return {}
+
+    def make(name: str, tmp: str) -> queue.QueueBackend:
+        if name == "sql":
+            return queue.QueueBackend(engine)
+        if name == "sqlite-wal":
+            return queue.SqliteQueueBackend(f"sqlite:///{tmp}/queue.db")
+        return queue.MemoryQueueBackend()
+
+    def run(name: str) -> dict:
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+        with tempfile.TemporaryDirectory() as tmp:
+            backend = make(name, tmp)
+            queue.use_backend(backend)
+            with SessionLocal() as db:
+                ws = Workspace(name="Bench", slug=f"bench-{name}")
+                db.add(ws)
+                db.commit()
+                ws_id = ws.id
+
+            t0 = time.perf_counter()
+            with SessionLocal() as db:
+                for _ in range(args.jobs):
+                    queue.enqueue(db, ws_id, "bench_noop", {})
+            enqueue_s = time.perf_counter() - t0
+
+            done, errors = [0], [0]
+            lock = threading.Lock()
+            stop = threading.Event()
+            api_writes = [0]
+
+            def worker():
+                while not stop.is_set():
+                    jobs = []
+                    try:
+                        with SessionLocal() as db:
+                            jobs = queue.claim_batch(db, args.batch)
+                            for job in jobs:
+                                queue.run_job(db, job)
+                    except Exception:  # noqa: BLE001 — e.g. "database is locked"; its job stays leased
+                        with lock:
+                            errors[0] += 1
+                    with lock:
+                        done[0] += len(jobs)
+                        if done[0] >= args.jobs:
+                            stop.set()
+                    if not jobs:
+                        time.sleep(0.001)
+
+            def api_writer():
+                while not stop.is_set():
+                    with SessionLocal() as db:
+                        db.execute(update(Workspace).where(Workspace.id == ws_id).values(name=f"Bench {time.time()}"))
+                        db.commit()
+                    api_writes[0] += 1
+
+            threads = [threading.Thread(target=worker, daemon=True) for _ in range(args.workers)]
+            threads += [threading.Thread(target=api_writer, daemon=True) for _ in range(args.api_writers)]
+            t0 = time.perf_counter()
+            for t in threads:
+                t.start()
+            stop.wait(args.timeout)
+            stop.set()
+            for t in threads:
+                t.join()
+            drain_s = time.perf_counter() - t0
+            queue.use_backend(queue.QueueBackend(engine))
+            backend.engine.dispose()
+        return {"enqueue/s": args.jobs / enqueue_s, "jobs/s": done[0] / drain_s, "errors": errors[0],
+                "api writes/s": api_writes[0] / drain_s}
+
+    print(f"app db {engine.dialect.name}: {args.jobs} jobs, {args.workers} workers, batch {args.batch}, "
+          f"{args.api_writers} API writer(s)")
+    for name in filter(None, (b.strip() for b in args.backends.split(","))):
+        r = run(name)
+        print(f"  {name:<11} {r['enqueue/s']:>8.0f} enqueue/s   {r['jobs/s']:>8.0f} jobs/s   "
+              f"{r['api writes/s']:>8.0f} API writes/s   {r['errors']:>4} errors")
+
+
+if __name__ == "__main__":
+    main()
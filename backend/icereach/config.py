@@ -28,6 +28,92 @@ class Settings(BaseSettings):
     # Rate limiting (requests per IP per minute for API/public surfaces; 0 = disabled)
     rate_limit_per_minute: int = 600
 
+    # Campaign sends: Message rows reserved per multi-row INSERT, and messages
+    # delivered between commits of their outcomes (1 = commit after every send).
+    send_batch_size: int = 500
+    send_commit_interval: int = 50
+    # Campaigns with more pending recipients than this are split into chunk jobs
+    # of this many recipients, sent in parallel by however many workers run.
+    send_chunk_size: int = 5000
+    # Send-rate governor (messages/second). Recipient domains are grouped by MX
+    # host (all Google-hosted domains together); each group starts at
+    # send_rate_per_mx, creeps up by send_rate_step per delivered message to
+    # send_rate_per_mx_max and halves on a throttling 4xx (floor: _min). The
+    # per-sending-domain bucket caps the relay/ESP (0 = unpaced). A recipient
+    # that can't be paced within send_defer_max_wait seconds is retried that
+    # long after, as often as it takes (nothing was sent). One that gets a
+    # temporary failure is deferred: its message gets a next_attempt_at and is
+    # retried on its own up to send_retry_attempts times, with exponential
+    # backoff from send_retry_backoff seconds.
+    send_rate_per_domain: float = 0.0
+    send_rate_per_mx: float = 20.0
+    send_rate_per_mx_min: float = 0.5
+    send_rate_per_mx_max: float = 200.0
+    send_rate_step: float = 0.05
+    send_defer_max_wait: float = 5.0
+    send_mx_grouping: bool = True
+    send_retry_attempts: int = 5
+    send_retry_backoff: int = 300
+    # Monthly quota is reserved by each sending job in blocks of this many sends
+    # (unused allowance is returned when the job finishes).
+    send_quota_block: int = 1000
+    # DKIM signing processes for bulk sends: 0 = sign in the sending thread,
+    # N = a pool of N processes, -1 = one per CPU core.
+    dkim_sign_processes: int = 0
+    # A reused SMTP connection idle at least this long is NOOP-probed before the
+    # next send (busier ones rely on reconnect-and-retry). Pipeline MAIL/RCPT/DATA
+    # when the relay advertises ESMTP PIPELINING.
+    smtp_idle_probe_seconds: float = 15.0
+    smtp_pipelining: bool = True
+
+    # Transactional sends (/v1/emails) go out inside the request (200). With
+    # transactional_async on they are queued and answered 202 instead, then
+    # delivered by the worker's transactional lane (polled every
+    # transactional_poll_interval seconds), which keeps provider connections
+    # warm per sending domain and closes them after transactional_idle_seconds
+    # unused.
+    transactional_async: bool = False
+    transactional_poll_interval: float = 0.05
+    transactional_idle_seconds: float = 60.0
+    transactional_claim_batch: int = 16
+
+    # Worker threads reserved per queue lane (transactional|interactive|bulk),
+    # besides the general loop that runs any job most urgent first.
+    worker_lanes: str = "transactional:1,interactive:1"
+    worker_lane_poll_interval: float = 0.25
+    # Jobs a worker loop claims per round trip (Postgres: one SKIP LOCKED
+    # SELECT). Keep 1 for long jobs, so idle workers can take the next one.
+    queue_claim_batch: int = 1
+    # A running job's claim lasts this long past its last heartbeat (progress
+    # callback); then the reaper, run every job_reap_interval seconds by each
+    # worker, re-queues it. Must exceed the longest gap between progress calls.
+    job_lease_seconds: int = 600
+    job_reap_interval: float = 60.0
+    # Job progress is written at most every job_progress_interval seconds, or
+    # when it moves job_progress_step points; in between it rides along with
+    # the handler's own commits.
+    job_progress_interval: float = 2.0
+    job_progress_step: int = 5
+    # Worker supervisor (python -m icereach.services.supervisor): processes per
+    # pool as "name:processes[xthreads]", name a job type ("a+b" for several),
+    # a lane, or "*" for the rest. Children are recycled after N jobs or past
+    # an RSS limit (0 = never), and get drain_seconds to finish on SIGTERM.
+    worker_pools: str = "transactional:1,*:2"
+    worker_recycle_jobs: int = 1000
+    worker_recycle_rss_mb: int = 512
+    worker_drain_seconds: float = 60.0
+    # Asyncio worker (python -m icereach.services.aioworker): jobs run at once,
+    # and the threads sync handlers run on.
+    worker_async_concurrency: int = 32
+    worker_async_threads: int = 8
+    # Where jobs live: "sql" (the app database), "sqlite-wal" (a SQLite file of
+    # their own, at queue_database_url) or "memory" (this process only; the API
+    # then runs its own worker threads).
+    queue_backend: str = "sql"
+    queue_database_url: str = "sqlite:///./icereach_queue.db"
+    # Bearer token for /api/queue/metrics (JSON and Prometheus); empty = disabled.
+    queue_metrics_token: str = ""
+
     # Optional shared secret for inbound ESP webhooks (?secret=...); empty = no check
     webhook_secret: str = ""
 
@@ -68,6 +68,9 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
 async def lifespan(app: FastAPI):
     # Dev convenience: ensure schema exists. Production uses Alembic migrations.
     Base.metadata.create_all(engine)
+    from .services import queue
+    if queue.backend().name == "memory":
+        queue.start_embedded()  # its jobs exist only in this process
     yield
 
 
@@ -110,6 +113,11 @@ def create_app() -> FastAPI:
         app.include_router(public_router)
     except ModuleNotFoundError:
         pass
+    try:
+        from .routers.jobs import metrics_router
+        app.include_router(metrics_router)
+    except ModuleNotFoundError:
+        pass
     try:
         from .routers.admin import audit_router, billing_router, members_router
         app.include_router(audit_router)
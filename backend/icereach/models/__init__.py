@@ -8,17 +8,18 @@ from .sending import (
     Campaign,
     CampaignVariant,
     Event,
+    LinkSet,
     Message,
     SavedBlock,
     SendingDomain,
     Template,
 )
-from .workspace import ApiKey, Membership, Session, User, Workspace
+from .workspace import ApiKey, Membership, QuotaReservation, SendUsage, Session, User, Workspace
 
 __all__ = [
-    "Workspace", "User", "Membership", "Session", "ApiKey",
+    "Workspace", "User", "Membership", "Session", "ApiKey", "SendUsage", "QuotaReservation",
     "Contact", "ContactList", "ListMembership", "Segment", "Suppression",
-    "SendingDomain", "Template", "SavedBlock", "Campaign", "CampaignVariant", "Message", "Event",
+    "SendingDomain", "Template", "SavedBlock", "Campaign", "CampaignVariant", "Message", "Event", "LinkSet",
     "Automation", "AutomationStep", "AutomationRun",
     "SignupForm", "OutboundWebhook",
     "Job", "AuditLog", "AIUsage",
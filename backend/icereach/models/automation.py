@@ -40,6 +40,8 @@ class AutomationRun(Base, TimestampMixin, WorkspaceScopedMixin):
     automation_id: Mapped[int] = mapped_column(ForeignKey("automations.id", ondelete="CASCADE"), index=True, nullable=False)
     contact_id: Mapped[int] = mapped_column(ForeignKey("contacts.id", ondelete="CASCADE"), index=True, nullable=False)
     position: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
-    status: Mapped[str] = mapped_column(String(20), default="active", nullable=False)  # active|done|exited|failed
+    status: Mapped[str] = mapped_column(String(20), default="active", nullable=False)  # active|running|done|exited|failed
     next_run_at: Mapped[datetime] = mapped_column(DateTime, index=True, nullable=False)
+    # Claim expiry while 'running'; the reaper hands stale runs back as 'active'.
+    leased_until: Mapped[Optional[datetime]] = mapped_column(DateTime)
     last_error: Mapped[Optional[str]] = mapped_column(Text)
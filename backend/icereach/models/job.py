@@ -3,7 +3,7 @@
 from datetime import datetime
 from typing import Any, Optional
 
-from sqlalchemy import JSON, DateTime, ForeignKey, Integer, String, Text, func
+from sqlalchemy import JSON, DateTime, ForeignKey, Index, Integer, String, Text, func
 from sqlalchemy.orm import Mapped, mapped_column
 
 from ..db import Base
@@ -12,10 +12,12 @@ from .base import TimestampMixin, WorkspaceScopedMixin
 
 class Job(Base, TimestampMixin, WorkspaceScopedMixin):
     __tablename__ = "jobs"
+    # claim_next: due queued jobs, most urgent first.
+    __table_args__ = (Index("ix_jobs_claim", "status", "priority", "run_after"),)
 
     id: Mapped[int] = mapped_column(primary_key=True)
     type: Mapped[str] = mapped_column(String(50), nullable=False, index=True)
-    status: Mapped[str] = mapped_column(String(20), default="queued", nullable=False, index=True)  # queued|running|done|failed
+    status: Mapped[str] = mapped_column(String(20), default="queued", nullable=False, index=True)  # queued|running|waiting|done|failed
     progress: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
     message: Mapped[str] = mapped_column(String(500), default="", nullable=False)
     payload: Mapped[dict[str, Any]] = mapped_column(JSON, default=dict, nullable=False)
@@ -23,6 +25,20 @@ class Job(Base, TimestampMixin, WorkspaceScopedMixin):
     error: Mapped[Optional[str]] = mapped_column(Text)
     attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
     run_after: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False, index=True)
+    # Higher runs first; defaults from the job type's lane (services/queue.py LANES).
+    priority: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    # While 'running': the claim expires (and the reaper re-queues the job)
+    # unless the handler heartbeats via its progress callback before then.
+    leased_until: Mapped[Optional[datetime]] = mapped_column(DateTime, index=True)
+    # The latest run: when its handler started, and where (host:pid); when the
+    # job reached done or failed. Queue metrics (services/queue_metrics.py).
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    worker: Mapped[Optional[str]] = mapped_column(String(100))
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, index=True)
+    # Fan-out: a parent 'waiting' on child jobs is re-queued once pending_children
+    # (decremented as each child finishes or dead-letters) reaches zero.
+    parent_id: Mapped[Optional[int]] = mapped_column(ForeignKey("jobs.id", ondelete="CASCADE"), index=True)
+    pending_children: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
 
 
 class AuditLog(Base, TimestampMixin, WorkspaceScopedMixin):
@@ -1,4 +1,4 @@
-"""Sending: SendingDomain, Template, Campaign, CampaignVariant, Message, Event."""
+"""Sending: SendingDomain, Template, Campaign, CampaignVariant, Message, Event, LinkSet."""
 
 from datetime import datetime
 from typing import Any, Optional
@@ -27,6 +27,8 @@ class SendingDomain(Base, TimestampMixin, WorkspaceScopedMixin):
     smtp_port: Mapped[int] = mapped_column(Integer, default=587, nullable=False)
     smtp_username: Mapped[str] = mapped_column(String(320), default="", nullable=False)
     smtp_password: Mapped[str] = mapped_column(Text, default="", nullable=False)
+    # Concurrent relay connections a campaign send may hold open (SMTP only).
+    smtp_connections: Mapped[int] = mapped_column(Integer, default=1, nullable=False)
     # Verify the relay's TLS cert (secure default). False only for a trusted self-signed relay.
     verify_tls: Mapped[bool] = mapped_column(default=True, nullable=False)
     spf_verified: Mapped[bool] = mapped_column(default=False, nullable=False)
@@ -117,10 +119,15 @@ class Message(Base, TimestampMixin, WorkspaceScopedMixin):
     automation_id: Mapped[Optional[int]] = mapped_column(ForeignKey("automations.id", ondelete="CASCADE"), index=True)
     contact_id: Mapped[int] = mapped_column(ForeignKey("contacts.id", ondelete="CASCADE"), index=True, nullable=False)
     variant_id: Mapped[Optional[int]] = mapped_column(ForeignKey("campaign_variants.id"))
-    status: Mapped[str] = mapped_column(String(20), default="queued", nullable=False)  # queued|sent|hard_bounce|soft_bounce|failed
+    status: Mapped[str] = mapped_column(String(20), default="queued", nullable=False)  # queued|sent|deferred|retrying|hard_bounce|soft_bounce|failed
     message_id: Mapped[Optional[str]] = mapped_column(String(255), index=True)
     sent_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
     error: Mapped[Optional[str]] = mapped_column(Text)
+    # Delivery attempts so far, and when a 'deferred' message is next due for one.
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    next_attempt_at: Mapped[Optional[datetime]] = mapped_column(DateTime, index=True)
+    # Usage period (YYYY-MM) the send was charged to, so a refund goes back there.
+    quota_period: Mapped[Optional[str]] = mapped_column(String(7))
 
 
 class Event(Base, TimestampMixin, WorkspaceScopedMixin):
@@ -132,3 +139,18 @@ class Event(Base, TimestampMixin, WorkspaceScopedMixin):
     url: Mapped[Optional[str]] = mapped_column(Text)
     user_agent: Mapped[Optional[str]] = mapped_column(String(500))
     ip_hash: Mapped[Optional[str]] = mapped_column(String(64))
+
+
+class LinkSet(Base, TimestampMixin):
+    """The tracked link targets of one piece of content, stored once.
+
+    Content-addressed by ``digest`` (shared by every message rendered from the
+    same content), so compact click tokens only carry ``(set id, link index)``.
+    Rows are immutable once written.
+    """
+
+    __tablename__ = "link_sets"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    digest: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
+    urls: Mapped[list[str]] = mapped_column(JSON, default=list, nullable=False)
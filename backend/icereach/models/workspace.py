@@ -1,4 +1,4 @@
-"""Identity & tenancy: Workspace, User, Membership, Session, ApiKey."""
+"""Identity & tenancy: Workspace, User, Membership, Session, ApiKey, SendUsage, QuotaReservation."""
 
 from datetime import datetime
 from typing import Optional
@@ -18,6 +18,8 @@ class Workspace(Base, TimestampMixin):
     slug: Mapped[str] = mapped_column(String(200), unique=True, nullable=False)
     plan: Mapped[str] = mapped_column(String(40), default="free", nullable=False)
     monthly_send_limit: Mapped[int] = mapped_column(Integer, default=0, nullable=False)  # 0 = unlimited
+    # Share of worker capacity relative to other workspaces when jobs compete.
+    queue_weight: Mapped[int] = mapped_column(Integer, default=1, nullable=False)
 
     memberships: Mapped[list["Membership"]] = relationship(back_populates="workspace", cascade="all, delete-orphan")
 
@@ -68,3 +70,38 @@ class ApiKey(Base, TimestampMixin):
     scopes: Mapped[str] = mapped_column(String(255), default="", nullable=False)
     last_used_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
     revoked_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+
+
+class SendUsage(Base):
+    """Sends charged against a workspace's allowance for one calendar month.
+
+    ``reserved`` is allowance held by sends in flight (see services/quota.py);
+    both counters only ever move through conditional UPDATEs.
+    """
+
+    __tablename__ = "send_usage"
+    __table_args__ = (UniqueConstraint("workspace_id", "period", name="uq_send_usage_workspace_period"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    workspace_id: Mapped[int] = mapped_column(ForeignKey("workspaces.id", ondelete="CASCADE"), nullable=False)
+    period: Mapped[str] = mapped_column(String(7), nullable=False)  # YYYY-MM (UTC)
+    sent: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    reserved: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+
+class QuotaReservation(Base, TimestampMixin):
+    """Allowance one sender holds in ``SendUsage.reserved`` (see services/quota.py).
+
+    Tied to the job run holding it (``job_id`` / ``job_attempt``; API requests
+    have none), so a reaper can release what a dead worker still held.
+    """
+
+    __tablename__ = "quota_reservations"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    workspace_id: Mapped[int] = mapped_column(ForeignKey("workspaces.id", ondelete="CASCADE"), nullable=False)
+    period: Mapped[str] = mapped_column(String(7), nullable=False)
+    held: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    # No foreign key: the jobs table may live in another database (queue backends).
+    job_id: Mapped[Optional[int]] = mapped_column(Integer, index=True)
+    job_attempt: Mapped[Optional[int]] = mapped_column(Integer)
@@ -1,15 +1,20 @@
-"""Background job status (workspace-scoped)."""
+"""Background job status (workspace-scoped), and queue-wide metrics for operators."""
 
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException
+import hmac
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
 from sqlalchemy import select
 from sqlalchemy.orm import Session as DbSession
 
+from ..config import settings
 from ..db import get_db
 from ..models import Job
 from ..schemas.contact import JobOut
 from ..security.deps import AuthContext, auth_context
+from ..services import queue_metrics
 
 router = APIRouter(prefix="/api/jobs", tags=["jobs"])
 
@@ -30,6 +35,31 @@ def get_job(job_id: int, ctx: AuthContext = Depends(auth_context), db: DbSession
 @router.get("", response_model=list[JobOut])
 def list_jobs(ctx: AuthContext = Depends(auth_context), db: DbSession = Depends(get_db), limit: int = 50):
     rows = db.scalars(
-        select(Job).where(Job.workspace_id == ctx.workspace.id).order_by(Job.id.desc()).limit(min(limit, 200))
+        # Top-level jobs only; a chunked send's children roll up into their parent.
+        select(Job).where(Job.workspace_id == ctx.workspace.id, Job.parent_id.is_(None))
+        .order_by(Job.id.desc()).limit(min(limit, 200))
     ).all()
     return [_out(j) for j in rows]
+
+
+# ---- Queue metrics (all workspaces; for operators and autoscalers) ----
+metrics_router = APIRouter(prefix="/api/queue", tags=["jobs"])
+
+
+def _metrics_token(authorization: str = Header("")) -> None:
+    if not settings.queue_metrics_token:
+        raise HTTPException(status_code=404, detail="Queue metrics are disabled")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), settings.queue_metrics_token.encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+
+
+@metrics_router.get("/metrics", dependencies=[Depends(_metrics_token)])
+def queue_metrics_json(db: DbSession = Depends(get_db), window: float = Query(300, gt=0, le=86400)):
+    return queue_metrics.snapshot(db, window)
+
+
+@metrics_router.get("/metrics/prometheus", response_class=PlainTextResponse, dependencies=[Depends(_metrics_token)])
+def queue_metrics_prometheus(db: DbSession = Depends(get_db), window: float = Query(300, gt=0, le=86400)):
+    return PlainTextResponse(queue_metrics.prometheus(queue_metrics.snapshot(db, window)),
+                             media_type="text/plain; version=0.0.4")
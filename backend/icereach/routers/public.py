@@ -15,7 +15,7 @@ from sqlalchemy.orm import Session as DbSession
 
 from ..db import get_db
 from ..models import Contact, Event, ListMembership, Message, Suppression
-from ..services.tracking import decode_token, is_bot
+from ..services.tracking import decode_token, is_bot, resolve_link
 
 router = APIRouter(tags=["public"])
 
@@ -51,7 +51,10 @@ def track_open(token: str, request: Request, db: DbSession = Depends(get_db)):
 def track_click(token: str, request: Request, db: DbSession = Depends(get_db)):
     try:
         data = decode_token(token)
-        target = data.get("url") or "/"
+        if "link_set" in data:  # compact token: the target is stored once per content
+            target = resolve_link(db, data["link_set"], data["link_index"])
+        else:
+            target = data.get("url") or "/"
         _record_event(db, int(data["message_id"]), "click", request, url=target)
         return RedirectResponse(url=target, status_code=302)
     except Exception:
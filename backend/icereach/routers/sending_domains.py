@@ -20,7 +20,7 @@ def _out(d: SendingDomain) -> SendingDomainOut:
     return SendingDomainOut(
         id=d.id, domain=d.domain, provider=d.provider, dkim_selector=d.dkim_selector,
         spf_verified=d.spf_verified, dkim_verified=d.dkim_verified, dmarc_verified=d.dmarc_verified,
-        status=d.status, smtp_host=d.smtp_host, verify_tls=d.verify_tls,
+        status=d.status, smtp_host=d.smtp_host, smtp_connections=d.smtp_connections, verify_tls=d.verify_tls,
         reply_to=d.reply_to, reply_protocol=d.reply_protocol, reply_host=d.reply_host,
         reply_port=d.reply_port, reply_username=d.reply_username,
     )
@@ -48,7 +48,7 @@ def create_domain(body: SendingDomainIn, ctx: AuthContext = Depends(auth_context
         dkim_selector="icereach", dkim_private_key=private_pem, dkim_public_key=dkim_txt,
         smtp_host=body.smtp_host, smtp_port=body.smtp_port,
         smtp_username=body.smtp_username, smtp_password=body.smtp_password,
-        verify_tls=body.verify_tls,
+        smtp_connections=body.smtp_connections, verify_tls=body.verify_tls,
         reply_to=body.reply_to,
         reply_protocol=body.reply_protocol, reply_host=body.reply_host,
         reply_port=body.reply_port, reply_username=body.reply_username,
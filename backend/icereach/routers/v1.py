@@ -7,18 +7,21 @@ from __future__ import annotations
 
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session as DbSession
 
 from ..db import get_db
 from ..models import Contact, Message, SendingDomain, Workspace
 from ..schemas.contact import ContactOut
-from ..schemas.growth import V1ContactIn, V1EmailIn
+from ..schemas.growth import V1ContactIn, V1EmailBatchIn, V1EmailIn
 from ..security.deps import api_key_auth
+from ..services import quota, transactional
 from ..services.esp import get_provider
-from ..services.merge import html_to_text, render
-from ..services.tracking import encode_token, rewrite_html
+from ..services.queue import enqueue
+from ..services.render_plan import get_plan
+from ..services.tracking import encode_compact, link_set_id
 from ..config import settings
 
 router = APIRouter(prefix="/v1", tags=["public-api"])
@@ -46,16 +49,21 @@ def list_contacts(ws: Workspace = Depends(api_key_auth), db: DbSession = Depends
 
 
 @router.post("/emails")
-def send_transactional(body: V1EmailIn, ws: Workspace = Depends(api_key_auth), db: DbSession = Depends(get_db)):
-    from ..services import quota
-    if quota.exceeded(db, ws):
-        raise HTTPException(status_code=429, detail="Monthly send quota exceeded")
+def send_transactional(body: V1EmailIn, response: Response, ws: Workspace = Depends(api_key_auth),
+                       db: DbSession = Depends(get_db)):
+    """Send one email inside the request (200), or, with
+    ``settings.transactional_async`` on, queue it for the worker's
+    transactional lane and answer 202."""
     domain = db.scalar(select(SendingDomain).where(SendingDomain.id == body.sending_domain_id, SendingDomain.workspace_id == ws.id))
     if domain is None:
         raise HTTPException(status_code=404, detail="Sending domain not found")
     if domain.provider == "smtp" and not domain.smtp_host:
         raise HTTPException(status_code=400, detail="Sending domain has no transport configured")
 
+    allowance = quota.Allowance(db, ws)
+    if not allowance.take(1):
+        raise HTTPException(status_code=429, detail="Monthly send quota exceeded")
+
     to_email = body.to.lower()
     contact = db.scalar(select(Contact).where(Contact.workspace_id == ws.id, Contact.email == to_email))
     if contact is None:
@@ -63,29 +71,138 @@ def send_transactional(body: V1EmailIn, ws: Workspace = Depends(api_key_auth), d
         db.add(contact)
         db.flush()
 
-    msg_row = Message(workspace_id=ws.id, contact_id=contact.id, status="queued")
+    msg_row = Message(workspace_id=ws.id, contact_id=contact.id, status="queued", quota_period=allowance.period)
     db.add(msg_row)
     db.flush()
 
     row = {"name": contact.name or "", "email": contact.email, **(contact.attributes or {})}
-    html = rewrite_html(render(body.html, row), msg_row.id)
-    text = render(body.text or html_to_text(body.html), row)
+    plan = get_plan(body.subject, body.html, body.text)
+    subject, html, text = plan.render(row, msg_row.id, link_set_id(db, plan.links))
     from_email = body.from_email or f"noreply@{domain.domain}"
-    unsub = f"{settings.base_url}/u/{encode_token(msg_row.id)}"
+    unsub = f"{settings.base_url}/u/{encode_compact(msg_row.id)}"
+
+    if settings.transactional_async:
+        # Charged now (committed with the job); refunded by the job if delivery fails for good.
+        allowance.settle(1)
+        enqueue(db, ws.id, transactional.JOB_TYPE, {
+            "message_id": msg_row.id, "sending_domain_id": domain.id, "from_name": body.from_name,
+            "from_email": from_email, "to": to_email, "subject": subject, "html": html, "text": text,
+            "list_unsub_url": unsub,
+        })
+        response.status_code = status.HTTP_202_ACCEPTED
+        return {"id": msg_row.id, "message_id": None, "status": "queued"}
 
     provider = get_provider(domain)
     try:
         provider.open()
         msg_row.message_id = provider.send(from_name=body.from_name, from_email=from_email, to_email=to_email,
-                                           subject=render(body.subject, row), html=html, text=text, list_unsub_url=unsub)
+                                           subject=subject, html=html, text=text, list_unsub_url=unsub)
         msg_row.status = "sent"
         msg_row.sent_at = datetime.utcnow()
     except Exception as exc:  # noqa: BLE001
         msg_row.status = "failed"
         msg_row.error = str(exc)
+        allowance.settle(0)
         db.commit()
         raise HTTPException(status_code=502, detail=f"Send failed: {exc}")
     finally:
         provider.close()
+    allowance.settle(1)
     db.commit()
     return {"id": msg_row.id, "message_id": msg_row.message_id, "status": msg_row.status}
+
+
+def _resolve_contacts(db: DbSession, workspace_id: int, emails: set[str]) -> dict[str, Contact]:
+    """Contacts for ``emails`` by address: one SELECT, plus one INSERT for the new ones."""
+    def load() -> dict[str, Contact]:
+        return {c.email: c for c in db.scalars(
+            select(Contact).where(Contact.workspace_id == workspace_id, Contact.email.in_(emails)))}
+
+    found = load()
+    missing = sorted(emails - found.keys())
+    if missing:
+        try:
+            with db.begin_nested():  # a concurrent request may create some of them first
+                db.execute(insert(Contact), [
+                    {"workspace_id": workspace_id, "email": e, "status": "subscribed", "source": "transactional"}
+                    for e in missing
+                ])
+        except IntegrityError:
+            pass
+        found = load()
+    return found
+
+
+@router.post("/emails/batch")
+def send_transactional_batch(body: V1EmailBatchIn, response: Response, ws: Workspace = Depends(api_key_auth),
+                             db: DbSession = Depends(get_db)):
+    """Send up to 500 emails in one call; returns one result per email, in order.
+
+    Contacts are resolved and ``Message`` rows inserted in bulk, quota is
+    reserved once for the lot (emails past the limit are rejected), and
+    delivery goes out as one provider batch per sending domain — inside the
+    request, or queued for the worker's transactional lane (202) when
+    ``settings.transactional_async`` is on.
+    """
+    emails = body.emails
+    domains = {d.id: d for d in db.scalars(select(SendingDomain).where(
+        SendingDomain.workspace_id == ws.id, SendingDomain.id.in_({e.sending_domain_id for e in emails})))}
+    results: list[dict] = [{"index": i} for i in range(len(emails))]
+    accepted = []
+    for i, e in enumerate(emails):
+        domain = domains.get(e.sending_domain_id)
+        if domain is None:
+            results[i].update(status="rejected", error="Sending domain not found")
+        elif domain.provider == "smtp" and not domain.smtp_host:
+            results[i].update(status="rejected", error="Sending domain has no transport configured")
+        else:
+            accepted.append(i)
+
+    allowance = quota.Allowance(db, ws)
+    granted = allowance.take(len(accepted))
+    for i in accepted[granted:]:
+        results[i].update(status="rejected", error="Monthly send quota exceeded")
+    accepted = accepted[:granted]
+    if not accepted:
+        allowance.settle(0)
+        db.commit()
+        return {"data": results}
+
+    contacts = _resolve_contacts(db, ws.id, {emails[i].to.lower() for i in accepted})
+    ids = db.scalars(
+        insert(Message).returning(Message.id, sort_by_parameter_order=True),
+        [{"workspace_id": ws.id, "contact_id": contacts[emails[i].to.lower()].id, "status": "queued",
+          "quota_period": allowance.period} for i in accepted],
+    ).all()
+
+    items = []
+    for i, msg_id in zip(accepted, ids):
+        e, domain = emails[i], domains[emails[i].sending_domain_id]
+        contact = contacts[e.to.lower()]
+        row = {"name": contact.name or "", "email": contact.email, **(contact.attributes or {})}
+        plan = get_plan(e.subject, e.html, e.text)
+        subject, html, text = plan.render(row, msg_id, link_set_id(db, plan.links))
+        items.append({"message_id": msg_id, "sending_domain_id": domain.id, "from_name": e.from_name,
+                      "from_email": e.from_email or f"noreply@{domain.domain}", "to": contact.email,
+                      "subject": subject, "html": html, "text": text,
+                      "list_unsub_url": f"{settings.base_url}/u/{encode_compact(msg_id)}"})
+        results[i].update(id=msg_id)
+
+    if settings.transactional_async:
+        allowance.settle(len(items))
+        enqueue(db, ws.id, transactional.BATCH_JOB_TYPE, {"items": items})
+        for i in accepted:
+            results[i].update(status="queued")
+        response.status_code = status.HTTP_202_ACCEPTED
+        return {"data": results}
+
+    allowance.settle(len(items))  # failures are refunded by deliver()
+    db.commit()
+    providers = transactional.WarmProviders()
+    try:
+        sent, _ = transactional.deliver(db, ws.id, items, providers)
+    finally:
+        providers.close_all()
+    for i, item in zip(accepted, items):
+        results[i].update(sent[item["message_id"]])
+    return {"data": results}
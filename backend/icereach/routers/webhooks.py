@@ -97,7 +97,9 @@ def _normalize(provider: str, body: Any) -> list[tuple[str, str, str]]:
             if etype:
                 # SendGrid's sg_message_id is "<X-Message-Id>.<recv-time>.<...>"; we store
                 # the base X-Message-Id at send time, so key on the leading segment.
-                sg_id = (ev.get("sg_message_id", "") or "").split(".")[0]
+                # Batched sends share one X-Message-Id and store the per-recipient
+                # icereach_id custom arg instead, which events echo back top-level.
+                sg_id = ev.get("icereach_id") or (ev.get("sg_message_id", "") or "").split(".")[0]
                 out.append((etype, ev.get("email", ""), sg_id))
     return out
 
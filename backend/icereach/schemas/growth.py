@@ -54,3 +54,7 @@ class V1EmailIn(BaseModel):
     sending_domain_id: int
     from_name: str = ""
     from_email: str | None = None
+
+
+class V1EmailBatchIn(BaseModel):
+    emails: list[V1EmailIn] = Field(min_length=1, max_length=500)
@@ -11,6 +11,7 @@ class SendingDomainIn(BaseModel):
     smtp_port: int = 587
     smtp_username: str = ""
     smtp_password: str = ""
+    smtp_connections: int = Field(default=1, ge=1, le=32)
     verify_tls: bool = True
     # Reply-To address + reply tracking mailbox (optional).
     reply_to: str = ""
@@ -27,6 +28,7 @@ class SendingDomainUpdate(BaseModel):
     smtp_port: int | None = None
     smtp_username: str | None = None
     smtp_password: str | None = None
+    smtp_connections: int | None = Field(default=None, ge=1, le=32)
     verify_tls: bool | None = None
     reply_to: str | None = None
     reply_protocol: str | None = None
@@ -47,6 +49,7 @@ class SendingDomainOut(BaseModel):
     dmarc_verified: bool
     status: str
     smtp_host: str
+    smtp_connections: int = 1
     # Reply settings (password intentionally never returned).
     reply_to: str = ""
     reply_protocol: str = ""
@@ -0,0 +1,149 @@
+"""Asyncio worker: many I/O-bound jobs interleaved on one event loop.
+
+    PYTHONPATH=backend python -m icereach.services.aioworker
+
+Runs up to ``settings.worker_async_concurrency`` jobs at once in one process.
+``async def`` handlers are awaited on the loop, so a job waiting on a mailbox,
+a relay or DNS costs a coroutine rather than a thread; sync handlers (most of
+them) run on a pool of ``settings.worker_async_threads`` threads. Those threads
+live as long as the worker, and so do the provider connections they keep warm
+(see :mod:`icereach.services.transactional`).
+
+An async handler gets the same ``(db, job, progress)`` as a sync one. The
+session is synchronous: it is fine for quick reads, but anything slow belongs
+in ``await asyncio.to_thread(...)`` with a session of its own. Claims, leases,
+retries and dead-lettering are exactly those of :func:`icereach.services.queue.run_job`.
+SIGTERM drains: no new claims, in-flight jobs finish, then the worker exits.
+
+It stands in for the sync worker entirely: idle, the loop runs the same
+:func:`~icereach.services.queue.idle_tick` (automation journeys, reply
+polling) on a thread, and the ``settings.worker_lanes`` threads (the
+transactional lane with its warm connections among them) start next to it,
+as in ``python -m icereach.services.queue``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import inspect
+import signal
+from collections.abc import Callable, Collection
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..db import SessionLocal
+from ..models import Job
+from . import queue
+
+
+def _claim(limit: int, types: Optional[Collection[str]], exclude: Collection[str]) -> list[tuple[int, str, int]]:
+    """Claim a batch: ``(id, type, attempts)`` per job, the attempt identifying this claim."""
+    with SessionLocal() as db:
+        return [(job.id, job.type, job.attempts) for job in queue.claim_batch(db, limit, types, exclude)]
+
+
+def _claimed(db: Session, job_id: int, attempt: int) -> Optional[Job]:
+    """The job, unless it was reaped and claimed again (by another attempt) since."""
+    job = db.get(Job, job_id)
+    return job if job is not None and job.attempts == attempt else None
+
+
+def _tick(on_idle: Callable[[Session], None]) -> None:
+    with SessionLocal() as db:
+        try:
+            on_idle(db)
+        except Exception:  # noqa: BLE001 — never let a tick kill the worker
+            db.rollback()
+
+
+def _run_sync(job_id: int, attempt: int) -> None:
+    with SessionLocal() as db:
+        if (job := _claimed(db, job_id, attempt)) is not None:
+            queue.run_job(db, job)
+
+
+async def _run(job_id: int, job_type: str, attempt: int) -> None:
+    """Run one claimed job: awaited if its handler is async, else on the thread pool."""
+    handler = queue.HANDLERS.get(job_type)
+    if not inspect.iscoroutinefunction(handler):
+        await asyncio.to_thread(_run_sync, job_id, attempt)
+        return
+    with SessionLocal() as db:
+        job = await asyncio.to_thread(_claimed, db, job_id, attempt)
+        progress = None if job is None else await asyncio.to_thread(queue.begin, db, job)
+        if progress is None:
+            return
+        try:
+            result = await handler(db, job, progress)
+            await asyncio.to_thread(queue.finish, db, job, progress, result)
+        except Exception as exc:  # noqa: BLE001 — handlers may raise anything
+            await asyncio.to_thread(queue.finish, db, job, progress, error=exc)
+
+
+async def serve(concurrency: int, poll_interval: float = 1.0, types: Optional[Collection[str]] = None,
+                exclude: Collection[str] = (), stop: Optional[asyncio.Event] = None,
+                max_idle_loops: Optional[int] = None,
+                on_idle: Optional[Callable[[Session], None]] = None) -> None:
+    """Claim and run jobs, up to ``concurrency`` at a time, until ``stop`` is set.
+
+    Filters, ``on_idle`` and idle waiting are those of
+    :func:`icereach.services.queue.run_worker` (``on_idle`` runs on a thread);
+    ``max_idle_loops`` is for tests.
+    """
+    stop = stop or asyncio.Event()
+    listener = queue.backend().listener()
+    running: set[asyncio.Task] = set()
+    idle = 0
+    try:
+        while not stop.is_set():
+            free = concurrency - len(running)
+            if free <= 0:
+                await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                continue
+            claimed = await asyncio.to_thread(_claim, free, types, exclude)
+            if not claimed:
+                if on_idle is not None:
+                    await asyncio.to_thread(_tick, on_idle)
+                idle += 1
+                if max_idle_loops is not None and idle >= max_idle_loops:
+                    break
+                await asyncio.to_thread(listener.wait, poll_interval)
+                continue
+            idle = 0
+            for job_id, job_type, attempt in claimed:
+                task = asyncio.create_task(_run(job_id, job_type, attempt))
+                running.add(task)
+                task.add_done_callback(running.discard)
+        if running:
+            await asyncio.wait(running)  # drain
+    finally:
+        listener.close()
+
+
+async def _main(lanes: dict[str, int]) -> None:
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(settings.worker_async_threads, thread_name_prefix="aioworker"))
+    stop = asyncio.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+    print(f"iceReach asyncio worker starting... ({settings.worker_async_concurrency} jobs at once, "
+          f"{settings.worker_async_threads} threads for sync handlers; + lanes {lanes}, automation ticks, reaper)")
+    await serve(settings.worker_async_concurrency, stop=stop, on_idle=queue.idle_tick(),
+                exclude=queue.lane_types("transactional") if lanes.get("transactional") else ())
+
+
+def main() -> None:
+    queue.load_handlers()
+    lanes = queue._start_lanes()
+    queue.start_reaper(settings.job_reap_interval)
+    asyncio.run(_main(lanes))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    # Run inside the canonical module; see the same guard in queue.py.
+    from icereach.services.aioworker import main as _entry
+
+    _entry()
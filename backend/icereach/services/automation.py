@@ -29,11 +29,12 @@ from ..models import (
     Suppression,
     Template,
 )
+from . import quota
 from .esp import get_provider
-from .merge import html_to_text, render
-from .queue import register
+from .queue import register, register_reaper
+from .render_plan import get_plan
 from .segments import build_filter
-from .tracking import encode_token, rewrite_html, unsubscribe_footer_html, unsubscribe_footer_text
+from .tracking import encode_compact, link_set_id, unsubscribe_footer_html, unsubscribe_footer_text
 
 
 def _steps(db: DbSession, automation_id: int) -> list[AutomationStep]:
@@ -119,7 +120,7 @@ def _send_step(db: DbSession, run: AutomationRun, automation: Automation, step:
     else:
         subject = cfg.get("subject", "")
         html = cfg.get("html", "")
-        text = cfg.get("text", "") or html_to_text(html)
+        text = cfg.get("text", "")
 
     msg_row = Message(
         workspace_id=automation.workspace_id, automation_id=automation.id,
@@ -129,10 +130,9 @@ def _send_step(db: DbSession, run: AutomationRun, automation: Automation, step:
     db.flush()
 
     row = {"name": contact.name or "", "email": contact.email, **(contact.attributes or {})}
-    subj = render(subject, row)
-    body_html = rewrite_html(render(html, row), msg_row.id)
-    body_text = render(text, row)
-    unsub = f"{settings.base_url}/u/{encode_token(msg_row.id)}"
+    plan = get_plan(subject, html, text)
+    subj, body_html, body_text = plan.render(row, msg_row.id, link_set_id(db, plan.links))
+    unsub = f"{settings.base_url}/u/{encode_compact(msg_row.id)}"
     body_html += unsubscribe_footer_html(unsub)
     body_text += unsubscribe_footer_text(unsub)
 
@@ -148,10 +148,32 @@ def _send_step(db: DbSession, run: AutomationRun, automation: Automation, step:
         msg_row.sent_at = datetime.utcnow()
     finally:
         provider.close()
+    quota.record(db, automation.workspace_id)
     # NOTE: no commit here — the caller commits the sent Message together with the
     # run.position advance so the cursor can never lag behind a recorded send.
 
 
+def _lease_end() -> datetime:
+    return datetime.utcnow() + timedelta(seconds=settings.job_lease_seconds)
+
+
+def _renew(db: DbSession, run: AutomationRun) -> bool:
+    """Extend this worker's claim on a ``running`` run; False if the reaper took it back meanwhile."""
+    from sqlalchemy import update
+    until = _lease_end()
+    res = db.execute(
+        update(AutomationRun)
+        .where(AutomationRun.id == run.id, AutomationRun.status == "running",
+               AutomationRun.leased_until == run.leased_until)
+        .values(leased_until=until)
+    )
+    db.commit()
+    if res.rowcount != 1:
+        return False
+    run.leased_until = until
+    return True
+
+
 def advance_run(db: DbSession, run: AutomationRun) -> None:
     """Advance a single run through as many steps as are due this tick."""
     automation = db.get(Automation, run.automation_id)
@@ -160,6 +182,11 @@ def advance_run(db: DbSession, run: AutomationRun) -> None:
     # by advance_due_runs (status 'running').
     try:
         while run.status in ("active", "running") and run.next_run_at <= datetime.utcnow():
+            # A claimed run's lease is renewed before every step, and the step is
+            # skipped if the claim was lost (another worker may be on it now).
+            if run.status == "running" and not _renew(db, run):
+                db.expire(run)
+                return
             if run.position >= len(steps):
                 run.status = "done"
                 db.commit()
@@ -215,20 +242,43 @@ def advance_due_runs(db: DbSession, limit: int = 200) -> int:
         .order_by(AutomationRun.next_run_at)
         .limit(limit)
     ).all()
-    runs = []
+    advanced = 0
     for cand in candidates:
-        # Atomically claim (active -> running); skip if another worker won the race.
+        # Claim each run (active -> running) only when its turn comes, so its
+        # lease starts then rather than with the whole batch's; skip it if
+        # another worker won the race.
         res = db.execute(
             update(AutomationRun).where(AutomationRun.id == cand.id, AutomationRun.status == "active")
-            .values(status="running")
+            .values(status="running", leased_until=_lease_end())
         )
         db.commit()
         if res.rowcount == 1:
             db.refresh(cand)
-            runs.append(cand)
-    for run in runs:
-        advance_run(db, run)
-    return len(runs)
+            advance_run(db, cand)
+            advanced += 1
+    return advanced
+
+
+@register_reaper
+def reap_stale_runs(db: DbSession) -> int:
+    """Hand runs whose claim expired (the advancing worker died) back as ``active``.
+
+    The step they were on runs again, so a ``send`` may repeat if the worker
+    died between sending and recording it.
+    """
+    from sqlalchemy import and_, or_, update
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=settings.job_lease_seconds)
+    res = db.execute(
+        update(AutomationRun)
+        .where(AutomationRun.status == "running", or_(
+            AutomationRun.leased_until < now,
+            and_(AutomationRun.leased_until.is_(None), AutomationRun.updated_at < stale),  # claimed before leases
+        ))
+        .values(status="active", leased_until=None)
+    )
+    db.commit()
+    return res.rowcount
 
 
 @register("advance_automations")
@@ -12,15 +12,26 @@ This module owns the cryptographic primitives only:
   ``v=DKIM1`` DNS TXT value.
 * :func:`sign_message` — produce a ``DKIM-Signature`` header for a raw
   RFC 822 message using ``dkimpy``.
+* :class:`DkimSigner` — the bulk-send signing service: parsed keys are cached
+  per (domain, selector), the RSA operation runs in OpenSSL (via
+  ``cryptography``) instead of dkimpy's pure-Python arithmetic, batches can be
+  spread over a process pool, and throughput/latency are recorded.
+  Its ``relaxed/simple`` signatures verify with ``dkimpy``.
 """
 
 from __future__ import annotations
 
 import base64
+import hashlib
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
 
 import dkim as dkimpy
-from cryptography.hazmat.primitives import serialization
-from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
 
 # RSA-2048 is the spec-mandated key size (§8.2); also the floor most mailbox
 # providers accept for DKIM today.
@@ -108,3 +119,146 @@ def sign_message(
         signature_algorithm=b"rsa-sha256",
     )
     return signature
+
+
+# --- Bulk signing service ----------------------------------------------------
+
+_WSP_RUN = re.compile(rb"[ \t]+")
+
+# Parsed private keys, per (domain, selector, PEM digest) so a rotated key is
+# never served from a stale entry. Each pool process keeps its own copy.
+_key_cache: dict[tuple[str, str, bytes], rsa.RSAPrivateKey] = {}
+
+
+def _private_key(domain: str, selector: str, private_key_pem: str) -> rsa.RSAPrivateKey:
+    pem = private_key_pem.encode("ascii")
+    cache_key = (domain, selector, hashlib.sha256(pem).digest())
+    key = _key_cache.get(cache_key)
+    if key is None:
+        key = serialization.load_pem_private_key(pem, password=None)
+        _key_cache[cache_key] = key
+    return key
+
+
+def _relaxed_header(raw: bytes) -> tuple[bytes, bytes]:
+    """Split one (possibly folded) header and canonicalize it (RFC 6376 §3.4.2)."""
+    name, _, value = raw.partition(b":")
+    value = _WSP_RUN.sub(b" ", value.replace(b"\r\n", b"")).strip()
+    return name.strip().lower(), value
+
+
+def _signature_header(message_bytes: bytes, domain: str, selector: str,
+                      key: rsa.RSAPrivateKey) -> bytes:
+    """Build a ``DKIM-Signature`` header (rsa-sha256, relaxed/simple) for CRLF wire bytes."""
+    head, sep, body = message_bytes.partition(b"\r\n\r\n")
+    if not sep:
+        head, body = message_bytes.rstrip(b"\r\n"), b""
+    # simple body canonicalization: trailing empty lines collapse to one CRLF.
+    body = body.rstrip(b"\r\n") + b"\r\n" if body.rstrip(b"\r\n") else b"\r\n"
+    bh = base64.b64encode(hashlib.sha256(body).digest())
+
+    # Unfold into header fields; when a name repeats, the last instance is signed.
+    fields: dict[bytes, bytes] = {}
+    for raw in re.split(rb"\r\n(?![ \t])", head):
+        name, value = _relaxed_header(raw)
+        fields[name] = value
+    signed = [h.lower() for h in _SIGNED_HEADERS if h.lower() in fields]
+
+    tags = (
+        b"v=1; a=rsa-sha256; c=relaxed/simple; d=" + domain.encode("ascii")
+        + b"; s=" + selector.encode("ascii") + b"; t=" + str(int(time.time())).encode("ascii")
+        + b";\r\n h=" + b":".join(signed) + b";\r\n bh=" + bh + b";\r\n b="
+    )
+    data = b"".join(h + b":" + fields[h] + b"\r\n" for h in signed)
+    data += b"dkim-signature:" + _relaxed_header(b"DKIM-Signature: " + tags)[1]
+    sig = key.sign(data, padding.PKCS1v15(), hashes.SHA256())
+    return b"DKIM-Signature: " + tags + base64.b64encode(sig) + b"\r\n"
+
+
+def _sign_batch(messages: list[bytes], domain: str, selector: str, private_key_pem: str) -> list[bytes]:
+    """Sign ``messages``, returning each as signature + message (pool-process entry point)."""
+    key = _private_key(domain, selector, private_key_pem)
+    return [_signature_header(m, domain, selector, key) + m for m in messages]
+
+
+class DkimSigner:
+    """DKIM signing for bulk sends, with cached keys and optional process pool.
+
+    With ``processes=0`` signing happens in the calling thread. With N > 0,
+    :meth:`sign_many` splits a batch across a :class:`ProcessPoolExecutor` of N
+    workers, so signing scales past the GIL. Use :func:`get_signer` for the
+    process-wide instance configured by ``settings.dkim_sign_processes``.
+    """
+
+    def __init__(self, processes: int = 0) -> None:
+        self.processes = max(0, processes)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._signed = 0
+        self._seconds = 0.0
+
+    def _record(self, count: int, started: float) -> None:
+        with self._lock:
+            self._signed += count
+            self._seconds += time.perf_counter() - started
+
+    def sign(self, message_bytes: bytes, domain: str, selector: str, private_key_pem: str) -> bytes:
+        """Sign one message in the calling thread; returns signature + message."""
+        started = time.perf_counter()
+        key = _private_key(domain, selector, private_key_pem)
+        signed = _signature_header(message_bytes, domain, selector, key) + message_bytes
+        self._record(1, started)
+        return signed
+
+    def sign_many(self, messages: list[bytes], domain: str, selector: str, private_key_pem: str) -> list[bytes]:
+        """Sign a batch of wire messages; results are in input order."""
+        started = time.perf_counter()
+        if self.processes and len(messages) > 1:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(max_workers=self.processes)
+            size = -(-len(messages) // self.processes)
+            chunks = [messages[i:i + size] for i in range(0, len(messages), size)]
+            futures = [self._pool.submit(_sign_batch, c, domain, selector, private_key_pem) for c in chunks]
+            signed = [m for f in futures for m in f.result()]
+        else:
+            signed = _sign_batch(messages, domain, selector, private_key_pem)
+        self._record(len(messages), started)
+        return signed
+
+    def stats(self) -> dict:
+        """Messages signed so far, wall time spent, throughput and mean latency."""
+        with self._lock:
+            signed, seconds = self._signed, self._seconds
+        return {
+            "signed": signed,
+            "seconds": round(seconds, 6),
+            "per_second": round(signed / seconds, 1) if seconds else 0.0,
+            "avg_ms": round(seconds / signed * 1000, 3) if signed else 0.0,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+
+
+_signer: Optional[DkimSigner] = None
+_signer_lock = threading.Lock()
+
+
+def get_signer() -> DkimSigner:
+    """The process-wide :class:`DkimSigner` (pool sized by ``settings.dkim_sign_processes``)."""
+    global _signer
+    with _signer_lock:
+        if _signer is None:
+            from ..config import settings
+
+            processes = settings.dkim_sign_processes
+            if processes < 0:  # -1 = one per core
+                import os
+
+                processes = os.cpu_count() or 1
+            _signer = DkimSigner(processes)
+        return _signer
@@ -3,13 +3,24 @@
 A uniform interface over transports so campaigns/automations don't care whether
 delivery is raw SMTP or an ESP HTTP API. The caller renders + tracks the HTML and
 computes the unsubscribe URL; the provider only delivers.
+
+Bulk callers hand whole batches to :meth:`EmailProvider.send_batch`; the SMTP
+provider fans those out over a pool of relay connections (one per worker
+thread, ``SendingDomain.smtp_connections`` of them); the HTTP providers keep
+one keep-alive client per ``open()``/``close()`` and use their ESP's batch API.
 """
 
 from __future__ import annotations
 
+import re
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+from queue import SimpleQueue
+
 import httpx
 
-from .smtp import SmtpSession, build_message, dkim_sign_message
+from .dkim import get_signer
+from .smtp import SmtpSession, WireTemplate, build_message, dkim_sign_message
 
 
 class EmailProvider:
@@ -23,6 +34,21 @@ class EmailProvider:
              reply_to: str | None = None) -> str:
         raise NotImplementedError
 
+    def send_batch(self, messages: list[dict]) -> list[str | Exception]:
+        """Deliver several messages (each a dict of :meth:`send` kwargs).
+
+        Returns one result per message, in order: the provider message id, or the
+        exception that message failed with — one bad recipient never aborts the
+        rest of the batch.
+        """
+        results: list[str | Exception] = []
+        for m in messages:
+            try:
+                results.append(self.send(**m))
+            except Exception as exc:  # noqa: BLE001 — reported per message
+                results.append(exc)
+        return results
+
     def close(self) -> None:
         """Close any persistent connection."""
 
@@ -32,27 +58,117 @@ class SmtpProvider(EmailProvider):
 
     def __init__(self, domain):
         self.domain = domain
-        self.session = SmtpSession(
-            domain.smtp_host, domain.smtp_port, domain.smtp_username, domain.smtp_password,
-            verify=getattr(domain, "verify_tls", True),
-        )
+        self.connections = max(1, getattr(domain, "smtp_connections", 1) or 1)
+        self.sessions = [
+            SmtpSession(
+                domain.smtp_host, domain.smtp_port, domain.smtp_username, domain.smtp_password,
+                verify=getattr(domain, "verify_tls", True),
+            )
+            for _ in range(self.connections)
+        ]
+        self.session = self.sessions[0]
+        self._pool: ThreadPoolExecutor | None = None
+        self._idle: SimpleQueue[SmtpSession] = SimpleQueue()
 
     def open(self) -> None:
+        # Connect the first session eagerly so a bad relay/credentials fail the
+        # job up front; the rest connect lazily on their first send, in parallel.
         self.session.connect()
+        if self.connections > 1:
+            self._pool = ThreadPoolExecutor(max_workers=self.connections, thread_name_prefix="smtp")
+            for session in self.sessions:
+                self._idle.put(session)
 
-    def send(self, *, from_name, from_email, to_email, subject, html, text, list_unsub_url=None, reply_to=None) -> str:
+    def _build(self, *, from_name, from_email, to_email, subject, html, text,
+               list_unsub_url=None, reply_to=None) -> tuple[str, str, object, str]:
+        """Build one message: ``(envelope from, envelope to, payload, Message-ID)``."""
         extra = {"Reply-To": reply_to} if reply_to else None
         msg = build_message(from_name, from_email, to_email, subject, html, text,
                             list_unsub_url=list_unsub_url, extra_headers=extra)
+        return from_email, to_email, msg, msg["Message-ID"] or ""
+
+    def _build_wire(self, templates: dict, *, from_name, from_email, to_email, subject, html, text,
+                    list_unsub_url=None, reply_to=None) -> tuple[str, str, bytes, str]:
+        """Like :meth:`_build`, but straight to wire bytes via a per-sender :class:`WireTemplate`."""
+        tpl = templates.get((from_name, from_email))
+        if tpl is None:
+            tpl = templates[(from_name, from_email)] = WireTemplate(from_name, from_email)
+        extra = {"Reply-To": reply_to} if reply_to else None
+        wire, message_id = tpl.build(to_email, subject, html, text,
+                                     list_unsub_url=list_unsub_url, extra_headers=extra)
+        return from_email, to_email, wire, message_id
+
+    def send(self, **kwargs) -> str:
+        from_email, to_email, msg, message_id = self._build(**kwargs)
         if self.domain.dkim_verified:
-            wire = dkim_sign_message(msg, self.domain.domain, self.domain.dkim_selector, self.domain.dkim_private_key)
-            self.session.send(from_email, to_email, wire)
-        else:
-            self.session.send(from_email, to_email, msg)
-        return msg["Message-ID"] or ""
+            msg = dkim_sign_message(msg, self.domain.domain, self.domain.dkim_selector, self.domain.dkim_private_key)
+        self.session.send(from_email, to_email, msg)
+        return message_id
+
+    def send_batch(self, messages: list[dict]) -> list[str | Exception]:
+        """Build and DKIM-sign the batch up front, then deliver it over the pool.
+
+        Messages are built as wire bytes through a :class:`WireTemplate` per
+        sender (identical to :func:`build_message` output, without the
+        per-message ``EmailMessage`` round trip).
+
+        Signing goes through :func:`icereach.services.dkim.get_signer` as one
+        batch (spread over its process pool when configured). Delivery is spread
+        over the connection pool; each worker thread checks a session out for
+        one message at a time, so a connection is never shared mid-transaction,
+        and each session keeps its own reconnect-and-retry on
+        :class:`smtplib.SMTPServerDisconnected`. Results stay in input order.
+        """
+        results: list[str | Exception | None] = [None] * len(messages)
+        built: list[tuple[int, str, str, bytes, str]] = []
+        templates: dict = {}
+        for i, m in enumerate(messages):
+            try:
+                built.append((i, *self._build_wire(templates, **m)))
+            except Exception as exc:  # noqa: BLE001 — reported per message
+                results[i] = exc
+        if built and self.domain.dkim_verified:
+            try:
+                wires = get_signer().sign_many(
+                    [wire for _, _, _, wire, _ in built],
+                    self.domain.domain, self.domain.dkim_selector, self.domain.dkim_private_key,
+                )
+            except Exception as exc:  # noqa: BLE001 — e.g. an unusable key fails the whole batch
+                for i, *_ in built:
+                    results[i] = exc
+                return results
+            built = [(i, frm, to, wire, mid) for (i, frm, to, _, mid), wire in zip(built, wires)]
+
+        def deliver(session: SmtpSession, item: tuple) -> None:
+            i, from_email, to_email, payload, message_id = item
+            try:
+                session.send(from_email, to_email, payload)
+                results[i] = message_id
+            except Exception as exc:  # noqa: BLE001 — reported per message
+                results[i] = exc
+
+        if self._pool is None:
+            for item in built:
+                deliver(self.session, item)
+            return results
+
+        def pooled(item: tuple) -> None:
+            session = self._idle.get()
+            try:
+                deliver(session, item)
+            finally:
+                self._idle.put(session)
+
+        list(self._pool.map(pooled, built))
+        return results
 
     def close(self) -> None:
-        self.session.close()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+            self._idle = SimpleQueue()
+        for session in self.sessions:
+            session.close()
 
 
 def _unsub_headers(list_unsub_url: str | None) -> dict:
@@ -61,14 +177,45 @@ def _unsub_headers(list_unsub_url: str | None) -> dict:
     return {"List-Unsubscribe": f"<{list_unsub_url}>", "List-Unsubscribe-Post": "List-Unsubscribe=One-Click"}
 
 
-class ResendProvider(EmailProvider):
-    name = "resend"
-    API = "https://api.resend.com/emails"
+class _HttpProvider(EmailProvider):
+    """ESP over an HTTP API: one keep-alive connection pool per open()/close().
+
+    Outside that lifecycle (a one-off send) requests fall back to a one-shot
+    ``httpx.post``.
+    """
 
     def __init__(self, domain):
         self.api_key = domain.api_key
+        self._client: httpx.Client | None = None
 
-    def send(self, *, from_name, from_email, to_email, subject, html, text, list_unsub_url=None, reply_to=None) -> str:
+    def open(self) -> None:
+        self._client = httpx.Client(
+            headers={"Authorization": f"Bearer {self.api_key}"}, timeout=30,
+            limits=httpx.Limits(max_keepalive_connections=4, keepalive_expiry=60),
+        )
+
+    def _post(self, url: str, payload) -> httpx.Response:
+        if self._client is None:
+            r = httpx.post(url, json=payload, headers={"Authorization": f"Bearer {self.api_key}"}, timeout=30)
+        else:
+            r = self._client.post(url, json=payload)
+        r.raise_for_status()
+        return r
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+
+class ResendProvider(_HttpProvider):
+    name = "resend"
+    API = "https://api.resend.com/emails"
+    BATCH_API = "https://api.resend.com/emails/batch"
+    BATCH_SIZE = 100  # Resend's per-request cap
+
+    @staticmethod
+    def _payload(*, from_name, from_email, to_email, subject, html, text, list_unsub_url=None, reply_to=None) -> dict:
         headers = _unsub_headers(list_unsub_url)
         if reply_to:
             headers["Reply-To"] = reply_to
@@ -79,33 +226,155 @@ class ResendProvider(EmailProvider):
         }
         if reply_to:
             payload["reply_to"] = reply_to
-        r = httpx.post(self.API, json=payload, headers={"Authorization": f"Bearer {self.api_key}"}, timeout=30)
-        r.raise_for_status()
-        return (r.json() or {}).get("id", "")
+        return payload
+
+    def send(self, **kwargs) -> str:
+        return (self._post(self.API, self._payload(**kwargs)).json() or {}).get("id", "")
+
+    def send_batch(self, messages: list[dict]) -> list[str | Exception]:
+        """One ``/emails/batch`` call per :attr:`BATCH_SIZE` messages.
 
+        The response lists one id per email, in request order. A rejected call
+        fails every message in it.
+        """
+        results: list[str | Exception] = []
+        for start in range(0, len(messages), self.BATCH_SIZE):
+            chunk = messages[start:start + self.BATCH_SIZE]
+            try:
+                data = (self._post(self.BATCH_API, [self._payload(**m) for m in chunk]).json() or {}).get("data") or []
+                if len(data) != len(chunk):
+                    raise RuntimeError(f"Resend batch returned {len(data)} ids for {len(chunk)} emails")
+                results += [(d or {}).get("id", "") for d in data]
+            except Exception as exc:  # noqa: BLE001 — reported per message
+                results += [exc] * len(chunk)
+        return results
 
-class SendGridProvider(EmailProvider):
+
+# Rendered bodies are cut at these delimiters to line recipients' copies up
+# against each other; per-recipient differences (merge values, tracking tokens)
+# land in the pieces between them.
+_HTML_PIECES = re.compile(r'([<>"])')
+_TEXT_PIECES = re.compile(r"(\n)")
+
+
+def _factor(docs: list[str], pieces: re.Pattern) -> tuple[list[str], list[int], list[list[str] | None]]:
+    """Split ``docs`` against the first one: ``(base pieces, varying positions, values)``.
+
+    ``values[i]`` holds doc ``i``'s piece at each varying position, or None when
+    the doc does not line up with the first (a different number of pieces).
+    """
+    split = [pieces.split(d) for d in docs]
+    base = split[0]
+    aligned = [p if len(p) == len(base) else None for p in split]
+    varying = sorted({
+        k for p in aligned if p is not None for k, (a, b) in enumerate(zip(base, p)) if a != b
+    })
+    return base, varying, [None if p is None else [p[k] for k in varying] for p in aligned]
+
+
+class SendGridProvider(_HttpProvider):
     name = "sendgrid"
     API = "https://api.sendgrid.com/v3/mail/send"
+    BATCH_SIZE = 1000  # personalizations per request
+    SUBSTITUTIONS_LIMIT = 10000  # bytes of substitutions per personalization
 
-    def __init__(self, domain):
-        self.api_key = domain.api_key
+    @staticmethod
+    def _envelope(from_name, from_email, reply_to) -> dict:
+        data = {"from": {"email": from_email, "name": from_name or from_email}}
+        if reply_to:
+            data["reply_to"] = {"email": reply_to}
+        return data
 
     def send(self, *, from_name, from_email, to_email, subject, html, text, list_unsub_url=None, reply_to=None) -> str:
         data = {
             "personalizations": [{"to": [{"email": to_email}]}],
-            "from": {"email": from_email, "name": from_name or from_email},
+            **self._envelope(from_name, from_email, reply_to),
             "subject": subject,
             "content": [{"type": "text/plain", "value": text or " "}, {"type": "text/html", "value": html}],
         }
-        if reply_to:
-            data["reply_to"] = {"email": reply_to}
         headers = _unsub_headers(list_unsub_url)
         if headers:
             data["headers"] = headers
-        r = httpx.post(self.API, json=data, headers={"Authorization": f"Bearer {self.api_key}"}, timeout=30)
-        r.raise_for_status()
-        return r.headers.get("X-Message-Id", "")
+        return self._post(self.API, data).headers.get("X-Message-Id", "")
+
+    def send_batch(self, messages: list[dict]) -> list[str | Exception]:
+        """Send messages sharing a sender as one request of personalizations.
+
+        Each recipient's copy differs from the others only in a few places, so
+        the first copy becomes the shared content and every other copy is
+        expressed as substitutions on it (plus its own subject and headers). A
+        copy that does not line up with the first, or whose substitutions exceed
+        :attr:`SUBSTITUTIONS_LIMIT`, is sent on its own.
+
+        SendGrid returns one ``X-Message-Id`` per request, so each batched
+        personalization carries a generated ``icereach_id`` custom arg instead;
+        that id is what's returned (and what event webhooks echo back).
+        """
+        results: list[str | Exception | None] = [None] * len(messages)
+        groups: dict[tuple, list[int]] = {}
+        for i, m in enumerate(messages):
+            groups.setdefault((m["from_name"], m["from_email"], m.get("reply_to")), []).append(i)
+        for (from_name, from_email, reply_to), indexes in groups.items():
+            for start in range(0, len(indexes), self.BATCH_SIZE):
+                self._send_chunk(messages, indexes[start:start + self.BATCH_SIZE],
+                                 self._envelope(from_name, from_email, reply_to), results)
+        return results
+
+    def _send_chunk(self, messages: list[dict], indexes: list[int], envelope: dict, results: list) -> None:
+        chunk = [messages[i] for i in indexes]
+        html_base, html_slots, html_values = _factor([m["html"] for m in chunk], _HTML_PIECES)
+        text_base, text_slots, text_values = _factor([m["text"] or " " for m in chunk], _TEXT_PIECES)
+        # Substitution keys must not occur anywhere in the content they apply to.
+        nonce = secrets.token_hex(4)
+        html_keys = [f"%{nonce}h{n}%" for n in range(len(html_slots))]
+        text_keys = [f"%{nonce}t{n}%" for n in range(len(text_slots))]
+
+        batched: list[tuple[int, str, dict]] = []
+        for i, m, hv, tv in zip(indexes, chunk, html_values, text_values):
+            subs = None
+            if hv is not None and tv is not None:
+                subs = dict(zip(html_keys, hv)) | dict(zip(text_keys, tv))
+                if sum(len(k) + len(v.encode("utf-8")) for k, v in subs.items()) > self.SUBSTITUTIONS_LIMIT:
+                    subs = None
+            if subs is None or len(indexes) == 1:
+                try:
+                    results[i] = self.send(**m)
+                except Exception as exc:  # noqa: BLE001 — reported per message
+                    results[i] = exc
+                continue
+            ref = secrets.token_urlsafe(16)
+            personalization = {
+                "to": [{"email": m["to_email"]}], "subject": m["subject"], "custom_args": {"icereach_id": ref},
+            }
+            if subs:
+                personalization["substitutions"] = subs
+            headers = _unsub_headers(m.get("list_unsub_url"))
+            if headers:
+                personalization["headers"] = headers
+            batched.append((i, ref, personalization))
+        if not batched:
+            return
+
+        for k, key in zip(html_slots, html_keys):
+            html_base[k] = key
+        for k, key in zip(text_slots, text_keys):
+            text_base[k] = key
+        data = {
+            "personalizations": [p for _, _, p in batched],
+            **envelope,
+            # Per-personalization subjects override this; the API still wants one.
+            "subject": batched[0][2]["subject"],
+            "content": [{"type": "text/plain", "value": "".join(text_base)},
+                        {"type": "text/html", "value": "".join(html_base)}],
+        }
+        try:
+            self._post(self.API, data)
+        except Exception as exc:  # noqa: BLE001 — a rejected request fails all of it
+            for i, _, _ in batched:
+                results[i] = exc
+            return
+        for i, ref, _ in batched:
+            results[i] = ref
 
 
 _PROVIDERS = {"smtp": SmtpProvider, "resend": ResendProvider, "sendgrid": SendGridProvider}
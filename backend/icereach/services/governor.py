@@ -0,0 +1,200 @@
+"""Send-rate governor: token buckets per sending domain and per mailbox provider.
+
+Mailbox providers throttle by *who hosts the mailbox*, not by the recipient's
+domain name: every Google Workspace domain is Gmail as far as rate limits go.
+Recipient domains are therefore grouped by the registrable domain of their
+primary MX host (``aspmx.l.google.com`` -> ``google.com``), via the cached
+:func:`icereach.services.validation.resolve_mx_hosts`.
+
+Each group gets a token bucket whose rate adapts AIMD-style: every accepted
+message adds a little rate back (up to ``settings.send_rate_per_mx_max``), and a
+throttling 4xx (421/450/451/452, or HTTP 429) halves it (down to
+``settings.send_rate_per_mx_min``). The sending domain has its own fixed-rate
+bucket (``settings.send_rate_per_domain``, 0 = unpaced) for relay/ESP limits,
+halved the same way when the relay itself pushes back.
+
+A recipient whose group could not get a token within
+``settings.send_defer_max_wait`` seconds is not sent at all but *postponed*:
+retried shortly, without using up an attempt. One the server answered with any
+temporary (4xx) failure is *deferred*: retried later, with backoff, instead of
+being marked failed.
+
+State is per process and outlives jobs, so a worker keeps what it learned about
+each provider from one campaign to the next.
+"""
+
+from __future__ import annotations
+
+import smtplib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import httpx
+
+from ..config import settings
+from .validation import resolve_mx_hosts
+
+# Reply codes mailbox providers use for "slow down".
+THROTTLE_CODES = frozenset({421, 450, 451, 452})
+
+# Recipient domains whose provider group is remembered (least recently used go first).
+GROUP_CACHE_SIZE = 4096
+
+# Outcome classes for a failed send.
+THROTTLED = "throttled"
+TRANSIENT = "transient"
+PERMANENT = "permanent"
+
+
+class TokenBucket:
+    """Reservation-style token bucket: tokens may go negative, meaning "queued".
+
+    ``reserve`` returns how long the caller must wait before its token is due,
+    so callers pace themselves without polling.
+    """
+
+    __slots__ = ("rate", "burst", "tokens", "stamp")
+
+    def __init__(self, rate: float, burst: Optional[float] = None) -> None:
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self.tokens = self.burst
+        self.stamp = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        if now > self.stamp:
+            self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+
+    def reserve(self, now: float) -> float:
+        """Take one token; seconds until it is actually available (0 = now)."""
+        self._refill(now)
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def cancel(self) -> None:
+        """Give back a reservation that won't be used."""
+        self.tokens = min(self.burst, self.tokens + 1)
+
+
+def _registrable(host: str) -> str:
+    """``mx1.mail.protection.outlook.com`` -> ``outlook.com`` (``x.co.uk`` keeps 3 labels)."""
+    labels = host.lower().rstrip(".").split(".")
+    if len(labels) >= 3 and len(labels[-1]) == 2 and len(labels[-2]) <= 3:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+
+def classify(exc: Exception) -> str:
+    """Sort a per-message send failure into throttled / transient / permanent."""
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in exc.recipients.values()]
+        if any(c in THROTTLE_CODES for c in codes):
+            return THROTTLED
+        return TRANSIENT if codes and all(400 <= c < 500 for c in codes) else PERMANENT
+    if isinstance(exc, smtplib.SMTPResponseException):
+        if exc.smtp_code in THROTTLE_CODES:
+            return THROTTLED
+        return TRANSIENT if 400 <= exc.smtp_code < 500 else PERMANENT
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        if status == 429:
+            return THROTTLED
+        return TRANSIENT if status >= 500 else PERMANENT
+    if isinstance(exc, (smtplib.SMTPServerDisconnected, httpx.TransportError, OSError)):
+        return TRANSIENT
+    return PERMANENT
+
+
+def relay_level(exc: Exception) -> bool:
+    """Whether pushback came from the relay/ESP itself rather than the recipient's MX."""
+    return not isinstance(exc, smtplib.SMTPRecipientsRefused)
+
+
+class Governor:
+    """Process-wide pacing state: one bucket per sending domain and per MX group."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._domains: dict[int, TokenBucket] = {}
+        self._groups: dict[str, TokenBucket] = {}
+        self._group_of: OrderedDict[str, str] = OrderedDict()
+
+    def group(self, email: str) -> str:
+        """The mailbox-provider group a recipient address belongs to."""
+        domain = email.rpartition("@")[2].lower()
+        with self._lock:
+            group = self._group_of.get(domain)
+            if group is not None:
+                self._group_of.move_to_end(domain)
+                return group
+        # Outside the lock: an MX lookup may go to DNS.
+        hosts = resolve_mx_hosts(domain) if settings.send_mx_grouping else []
+        group = _registrable(hosts[0]) if hosts else domain
+        with self._lock:
+            self._group_of[domain] = group
+            while len(self._group_of) > GROUP_CACHE_SIZE:
+                self._group_of.popitem(last=False)
+        return group
+
+    def _domain_bucket(self, domain_id: int) -> Optional[TokenBucket]:
+        if not settings.send_rate_per_domain:
+            return None
+        bucket = self._domains.get(domain_id)
+        if bucket is None:
+            bucket = self._domains[domain_id] = TokenBucket(settings.send_rate_per_domain)
+        return bucket
+
+    def _group_bucket(self, group: str) -> TokenBucket:
+        bucket = self._groups.get(group)
+        if bucket is None:
+            bucket = self._groups[group] = TokenBucket(settings.send_rate_per_mx)
+        return bucket
+
+    def reserve(self, domain_id: int, group: str, now: Optional[float] = None) -> Optional[float]:
+        """Reserve a send slot; seconds to wait, or None to defer the recipient."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            buckets = [self._group_bucket(group)]
+            if (bucket := self._domain_bucket(domain_id)) is not None:
+                buckets.append(bucket)
+            wait = max(b.reserve(now) for b in buckets)
+            if wait > settings.send_defer_max_wait:
+                for b in buckets:
+                    b.cancel()
+                return None
+            return wait
+
+    def accepted(self, group: str) -> None:
+        """Additive increase: a delivered message earns its group a bit more rate."""
+        with self._lock:
+            bucket = self._group_bucket(group)
+            bucket.rate = min(settings.send_rate_per_mx_max, bucket.rate + settings.send_rate_step)
+            bucket.burst = max(1.0, bucket.rate)
+
+    def throttled(self, domain_id: int, group: str, exc: Exception) -> None:
+        """Multiplicative decrease for whichever side pushed back."""
+        with self._lock:
+            bucket = self._domain_bucket(domain_id) if relay_level(exc) else None
+            if bucket is not None:
+                floor = settings.send_rate_per_domain / 16
+            else:  # recipient-side, or an unpaced relay: slow the provider group
+                bucket, floor = self._group_bucket(group), settings.send_rate_per_mx_min
+            bucket.rate = max(floor, bucket.rate / 2)
+            bucket.burst = max(1.0, bucket.rate)
+            bucket.tokens = min(bucket.tokens, 0.0)
+
+    def rate(self, group: str) -> float:
+        with self._lock:
+            return self._group_bucket(group).rate
+
+    def reset(self) -> None:
+        with self._lock:
+            self._domains.clear()
+            self._groups.clear()
+            self._group_of.clear()
+
+
+governor = Governor()
@@ -226,7 +226,7 @@ def _rows_from_dataframe(df) -> list[dict]:
     return cleaned
 
 
-@register("import_contacts")
+@register("import_contacts", lane="bulk")
 def run_import_job(
     db: Session,
     job: Any,
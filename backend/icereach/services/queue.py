@@ -2,65 +2,254 @@
 
 Evolves the legacy in-memory JobManager into a durable, workspace-scoped queue
 that survives restarts and supports multiple worker processes. Jobs are claimed
-atomically (optimistic update), retried with backoff, and sent to a dead-letter
-state after max attempts (with an alert hook).
+atomically (on Postgres in batches with ``FOR UPDATE SKIP LOCKED``, elsewhere by
+optimistic update), retried with backoff, and sent to a dead-letter state after
+max attempts (with an alert hook). On Postgres, enqueueing NOTIFYs idle workers
+so they start at once instead of on their next poll.
+
+Jobs are claimed most urgent first. Every job type belongs to a lane
+(``LANES``: transactional > interactive > bulk) that sets its default
+``priority``; among workspaces with jobs waiting at the top priority, the one
+using the least of its weighted share of running jobs
+(``Workspace.queue_weight``) goes next, so one tenant's 500k-recipient send
+can't starve another's. A worker may also reserve threads for a lane
+(``settings.worker_lanes``), so interactive work never queues behind bulk jobs
+holding every general thread.
+
+A handler may fan out with :func:`enqueue_children`: it adds child jobs
+(``parent_id`` = its own id, ``pending_children`` = their number) and returns.
+The parent then parks as ``waiting`` instead of ``done``; each child that
+reaches a terminal state (done, or dead-lettered) atomically decrements the
+counter and rolls its progress up into the parent, and the last one re-queues
+the parent so its handler runs again to fan in (:func:`child_totals` sums the
+children's results). Alternatively the children wait on a continuation job of
+another type, and the handler that spawned them just finishes.
+
+Claims are leases: a running job holds its claim until ``leased_until``
+(``settings.job_lease_seconds`` after the claim), and each progress write
+renews it — the heartbeat (writes are coalesced; see :class:`_Progress`). A
+reaper thread re-queues jobs whose lease ran out, i.e. whose worker died or
+hung, as a failed attempt; a worker that finds its lease gone stops without
+touching the job again. Each claim counts an attempt, so a claim is told apart
+from a later one on the same job, also for jobs still waiting in a claimed
+batch (a job starts only if its claim still holds). Other modules hand back
+their own stale claims via ``@register_reaper``.
 """
 
 from __future__ import annotations
 
+import asyncio
+import atexit
+import inspect
+import os
+import socket
+import tempfile
+import threading
 import time
-from collections.abc import Callable
+from collections.abc import Callable, Collection, Iterable
 from datetime import datetime, timedelta
+from select import select as select_fds
 from typing import Any, Optional
 
-from sqlalchemy import select, update
-from sqlalchemy.orm import Session
+from sqlalchemy import Integer, and_, cast, create_engine, event, func, or_, select, text, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, aliased
 
-from ..db import SessionLocal
-from ..models import Job
+from ..config import settings
+from ..db import SessionLocal, engine
+from ..models import Job, Workspace
 
 MAX_ATTEMPTS = 5
 
-# type -> handler(db, job, progress_cb)
-HANDLERS: dict[str, Callable[[Session, Job, Callable[[float, str], None]], Optional[dict]]] = {}
+# Postgres NOTIFY channel idle workers LISTEN on (see notify / Listener).
+CHANNEL = "icereach_jobs"
+
+# lane -> priority its job types are enqueued with (higher is claimed first)
+LANES = {"transactional": 100, "interactive": 50, "bulk": 0}
+DEFAULT_LANE = "interactive"
+
+# type -> handler(db, job, progress_cb); may be ``async def``
+HANDLERS: dict[str, Callable[[Session, Job, Callable[[float, str], None]], Any]] = {}
+# type -> lane
+LANE_OF: dict[str, str] = {}
 # alert hooks invoked when a job is dead-lettered
 DLQ_HOOKS: list[Callable[[Job], None]] = []
+# reapers(db) -> claims handed back, run with the queue's own (see reap)
+REAPERS: list[Callable[[Session], int]] = []
+
 
+class LeaseLost(Exception):
+    """The running job's lease expired and the reaper took it back."""
+
+
+def register(job_type: str, lane: str = DEFAULT_LANE):
+    """Decorator: register a handler for a job type, in one of ``LANES``."""
+    if lane not in LANES:
+        raise ValueError(f"Unknown lane '{lane}'")
 
-def register(job_type: str):
-    """Decorator: register a handler for a job type."""
     def deco(fn):
         HANDLERS[job_type] = fn
+        LANE_OF[job_type] = lane
         return fn
     return deco
 
 
+def register_reaper(fn):
+    """Decorator: run ``fn(db)`` on every reaper pass to hand back stale claims."""
+    REAPERS.append(fn)
+    return fn
+
+
+def priority_of(job_type: str) -> int:
+    """Default priority for a job type: its lane's."""
+    return LANES[LANE_OF.get(job_type, DEFAULT_LANE)]
+
+
+def lane_types(lane: str) -> tuple[str, ...]:
+    """Registered job types in ``lane``."""
+    return tuple(t for t, ln in LANE_OF.items() if ln == lane)
+
+
 def enqueue(db: Session, workspace_id: int, job_type: str, payload: dict[str, Any] | None = None,
-            run_after: Optional[datetime] = None) -> Job:
+            run_after: Optional[datetime] = None, priority: Optional[int] = None) -> Job:
     job = Job(
         workspace_id=workspace_id,
         type=job_type,
         status="queued",
         payload=payload or {},
         run_after=run_after or datetime.utcnow(),
+        priority=priority_of(job_type) if priority is None else priority,
     )
     db.add(job)
+    if job.run_after <= datetime.utcnow():
+        notify(db)
     db.commit()
     db.refresh(job)
     return job
 
 
-def claim_next(db: Session) -> Optional[Job]:
-    """Atomically claim one due, queued job. Returns None if none available."""
+def enqueue_children(db: Session, parent: Job, job_type: str, payloads: Iterable[dict[str, Any]],
+                     then: Optional[tuple[str, dict[str, Any]]] = None) -> Job:
+    """Fan out: queue a ``job_type`` child per payload and commit. Returns the job they report to.
+
+    Without ``then``, that is ``parent`` (which must be running): it parks when
+    its handler returns and runs again once every child has finished. With
+    ``then=(type, payload)`` it is a new continuation job, queued once the
+    children have all finished (at once if there are none), while ``parent``
+    completes as usual. Children inherit the parent's priority.
+    """
+    payloads = list(payloads)
+    target = parent
+    if then is not None:
+        target = Job(workspace_id=parent.workspace_id, type=then[0], payload=then[1], priority=parent.priority,
+                     status="waiting" if payloads else "queued", run_after=datetime.utcnow())
+        db.add(target)
+        db.flush()
     now = datetime.utcnow()
-    candidate = db.scalars(
-        select(Job).where(Job.status == "queued", Job.run_after <= now).order_by(Job.run_after).limit(1)
-    ).first()
+    db.add_all(Job(workspace_id=parent.workspace_id, type=job_type, status="queued", payload=payload,
+                   run_after=now, priority=parent.priority, parent_id=target.id) for payload in payloads)
+    # In SQL, not on the (possibly stale) ORM object: a child of an earlier
+    # fan-out may have finished and decremented the counter since it was loaded.
+    db.execute(update(Job).where(Job.id == target.id)
+               .values(pending_children=Job.pending_children + len(payloads)))
+    notify(db)
+    db.commit()
+    db.refresh(target)
+    return target
+
+
+def child_results(db: Session, job: Job) -> list[tuple[str, Optional[dict]]]:
+    """``(status, result)`` of each of ``job``'s children, in the order they were queued."""
+    return [tuple(row) for row in db.execute(
+        select(Job.status, Job.result).where(Job.parent_id == job.id).order_by(Job.id)
+    ).all()]
+
+
+def child_totals(db: Session, job: Job) -> dict[str, int]:
+    """Fan-in helper: the numeric fields of ``job``'s done children's results, summed.
+
+    Also counts ``children`` and ``failed_children`` (dead-lettered ones).
+    """
+    totals = {"children": 0, "failed_children": 0}
+    for status, result in child_results(db, job):
+        totals["children"] += 1
+        if status != "done":
+            totals["failed_children"] += 1
+            continue
+        for key, value in (result or {}).items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+def _children(db: Session, job: Job) -> int:
+    return db.scalar(select(func.count(Job.id)).where(Job.parent_id == job.id)) or 0
+
+
+def _is_postgres(bind) -> bool:
+    return bind.dialect.name == "postgresql"
+
+
+def notify(db: Session) -> None:
+    """Wake idle workers once the caller's transaction commits (see :meth:`QueueBackend.notify`).
+
+    Call it whenever a job becomes claimable now; jobs due later are found by polling.
+    """
+    _backend.notify(db)
+
+
+def _next_pick(db: Session, types: Optional[Collection[str]], exclude: Collection[str]) -> Optional[list]:
+    """Filter selecting where the next claim comes from, or None when nothing is due.
+
+    The highest priority waiting, from the workspace furthest below its fair
+    share (see the module docstring).
+    """
+    now = datetime.utcnow()
+    due = [Job.status == "queued", Job.run_after <= now]
+    if types is not None:
+        due.append(Job.type.in_(types))
+    if exclude:
+        due.append(Job.type.not_in(exclude))
+    top = db.scalar(select(func.max(Job.priority)).where(*due))
+    if top is None:
+        return None
+    due.append(Job.priority == top)
+    heads = dict(db.execute(
+        select(Job.workspace_id, func.min(Job.run_after)).where(*due).group_by(Job.workspace_id)
+    ).all())
+    if len(heads) > 1:
+        running = dict(db.execute(
+            select(Job.workspace_id, func.count(Job.id))
+            .where(Job.status == "running", Job.workspace_id.in_(heads)).group_by(Job.workspace_id)
+        ).all())
+        weights = dict(db.execute(select(Workspace.id, Workspace.queue_weight).where(Workspace.id.in_(heads))).all())
+        workspace_id = min(heads, key=lambda w: (running.get(w, 0) / max(1, weights.get(w) or 1), heads[w]))
+    else:
+        workspace_id = next(iter(heads))
+    return [*due, Job.workspace_id == workspace_id]
+
+
+def _lease_end() -> datetime:
+    return datetime.utcnow() + timedelta(seconds=settings.job_lease_seconds)
+
+
+def _held(job: Job) -> tuple:
+    """Filter matching ``job`` only while this run still holds its claim.
+
+    Each claim counts an attempt, so a job reaped and claimed again by another
+    worker no longer matches the attempt number this one claimed it with.
+    """
+    return Job.id == job.id, Job.status == "running", Job.attempts == job.attempts
+
+
+def _claim_optimistic(db: Session, pick: list) -> Optional[Job]:
+    candidate = db.scalars(select(Job).where(*pick).order_by(Job.run_after).limit(1)).first()
     if candidate is None:
         return None
     # Optimistic claim: only succeeds if still queued (guards against double-claim).
     res = db.execute(
-        update(Job).where(Job.id == candidate.id, Job.status == "queued").values(status="running", progress=0)
+        update(Job).where(Job.id == candidate.id, Job.status == "queued")
+        .values(status="running", progress=0, attempts=Job.attempts + 1, leased_until=_lease_end())
     )
     db.commit()
     if res.rowcount == 1:
@@ -69,47 +258,455 @@ def claim_next(db: Session) -> Optional[Job]:
     return None  # lost the race to another worker
 
 
-def _progress_cb(db: Session, job: Job):
-    def cb(percent: float, message: str = ""):
-        job.progress = max(0, min(100, int(percent)))
+def _claim_skip_locked(db: Session, pick: list, limit: int) -> list[Job]:
+    # Rows another worker is claiming right now are skipped, not waited on.
+    jobs = db.scalars(
+        select(Job).where(*pick).order_by(Job.run_after).limit(limit).with_for_update(skip_locked=True)
+    ).all()
+    if jobs:
+        db.execute(update(Job).where(Job.id.in_([j.id for j in jobs]))
+                   .values(status="running", progress=0, attempts=Job.attempts + 1, leased_until=_lease_end()))
+    db.commit()
+    for job in jobs:
+        db.refresh(job)
+    return list(jobs)
+
+
+def claim_batch(db: Session, limit: int, types: Optional[Collection[str]] = None,
+                exclude: Collection[str] = ()) -> list[Job]:
+    """Atomically claim up to ``limit`` due, queued jobs, in the order to run them.
+
+    On Postgres one ``SELECT ... FOR UPDATE SKIP LOCKED`` claims the batch, so
+    competing workers never collide; elsewhere jobs are claimed one at a time
+    with an optimistic UPDATE. ``types`` restricts the claim to those job
+    types; ``exclude`` skips some.
+    """
+    pick = _next_pick(db, types, exclude)
+    if pick is None:
+        return []
+    if _backend.skip_locked:
+        return _claim_skip_locked(db, pick, max(1, limit))
+    claimed: list[Job] = []
+    while pick is not None and len(claimed) < limit:
+        job = _claim_optimistic(db, pick)
+        if job is None:
+            break
+        claimed.append(job)
+        if len(claimed) < limit:
+            pick = _next_pick(db, types, exclude)
+    return claimed
+
+
+def claim_next(db: Session, types: Optional[Collection[str]] = None,
+               exclude: Collection[str] = ()) -> Optional[Job]:
+    """Atomically claim one due, queued job (see :func:`claim_batch`). Returns None if none available."""
+    claimed = claim_batch(db, 1, types, exclude)
+    return claimed[0] if claimed else None
+
+
+class Listener:
+    """Lets an idle worker sleep until a job is enqueued.
+
+    On Postgres it LISTENs on a dedicated connection, so :func:`notify` wakes
+    it at once; elsewhere (or if that connection fails) it just sleeps.
+    Works with psycopg 3 and psycopg2.
+    """
+
+    def __init__(self, bind=None) -> None:
+        self.bind = bind if bind is not None else engine
+        self._raw = None
+        self._conn = None
+
+    def _connect(self) -> None:
+        self._raw = self.bind.raw_connection()
+        conn = self._conn = self._raw.driver_connection
+        if hasattr(conn, "add_notify_handler"):  # psycopg 3
+            conn.autocommit = True
+            conn.execute(f"LISTEN {CHANNEL}")
+        else:  # psycopg2
+            conn.set_isolation_level(0)
+            conn.cursor().execute(f"LISTEN {CHANNEL}")
+
+    def _drain(self) -> None:
+        if hasattr(self._conn, "add_notify_handler"):
+            self._conn.execute("SELECT 1")  # consumes the pending notifications
+        else:
+            self._conn.poll()
+            self._conn.notifies.clear()
+
+    def wait(self, timeout: float) -> bool:
+        """Block up to ``timeout`` seconds; True if woken by a notification."""
+        if not _is_postgres(self.bind):
+            time.sleep(timeout)
+            return False
+        try:
+            if self._conn is None:
+                self._connect()
+            ready, _, _ = select_fds([self._conn.fileno()], [], [], timeout)
+            if ready:
+                self._drain()
+            return bool(ready)
+        except Exception:  # noqa: BLE001 — fall back to plain polling until it reconnects
+            self.close()
+            time.sleep(timeout)
+            return False
+
+    def close(self) -> None:
+        if self._raw is not None:
+            try:
+                self._raw.invalidate()  # LISTEN state must not go back to the pool
+            except Exception:  # noqa: BLE001
+                pass
+        self._raw = self._conn = None
+
+
+class QueueBackend:
+    """Where the ``jobs`` table lives, and how workers claim from it and get woken.
+
+    Everything else — priorities, fair share, leases, fan-out — is the same SQL
+    on every backend; sessions reach the backend's engine through a per-mapper
+    bind on ``SessionLocal`` (see :func:`use_backend`). This one is the default:
+    jobs in the application database, claimed with ``SKIP LOCKED`` and woken by
+    LISTEN/NOTIFY on Postgres.
+    """
+
+    name = "sql"
+
+    def __init__(self, bind: Engine) -> None:
+        self.engine = bind
+        self.skip_locked = _is_postgres(bind)
+
+    def install(self) -> None:
+        """Prepare the store (the app database's schema is Alembic's business)."""
+
+    def notify(self, db: Session) -> None:
+        if self.skip_locked:
+            db.execute(text(f"NOTIFY {CHANNEL}"))
+
+    def listener(self):
+        return Listener(self.engine)
+
+
+class _Wakeups:
+    """In-process stand-in for LISTEN/NOTIFY: a generation counter under a condition."""
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self.generation = 0
+
+    def bump(self) -> None:
+        with self._cond:
+            self.generation += 1
+            self._cond.notify_all()
+
+    def wait(self, seen: int, timeout: float) -> int:
+        with self._cond:
+            self._cond.wait_for(lambda: self.generation != seen, timeout)
+            return self.generation
+
+
+class _LocalListener:
+    def __init__(self, wakeups: _Wakeups) -> None:
+        self.wakeups = wakeups
+        self.seen = wakeups.generation
+
+    def wait(self, timeout: float) -> bool:
+        seen, self.seen = self.seen, self.wakeups.wait(self.seen, timeout)
+        return self.seen != seen
+
+    def close(self) -> None:
+        pass
+
+
+class SqliteQueueBackend(QueueBackend):
+    """Jobs in a SQLite file of their own (WAL), so queue churn never takes the app database's write lock.
+
+    Every statement on it is its own transaction (the queue's writes are all
+    single-statement compare-and-set updates), so a worker holds the file's
+    write lock only for a statement at a time, and a reader never works from
+    a stale snapshot. Workers in this process are woken at once; other
+    processes sharing the file find new jobs by polling.
+    """
+
+    name = "sqlite-wal"
+
+    def __init__(self, url: str) -> None:
+        bind = create_engine(url, isolation_level="AUTOCOMMIT",
+                             connect_args={"check_same_thread": False, "timeout": 30})
+
+        @event.listens_for(bind, "connect")
+        def _pragmas(dbapi_conn, _):
+            cur = dbapi_conn.cursor()
+            cur.execute("PRAGMA journal_mode=WAL")
+            cur.execute("PRAGMA synchronous=NORMAL")
+            cur.close()
+
+        super().__init__(bind)
+        self.wakeups = _Wakeups()
+
+    def install(self) -> None:
+        Job.__table__.create(self.engine, checkfirst=True)
+
+    def notify(self, db: Session) -> None:
+        db.info["queue_wakeup"] = self.wakeups  # bumped by _wake_after_commit
+
+    def listener(self):
+        return _LocalListener(self.wakeups)
+
+
+class MemoryQueueBackend(SqliteQueueBackend):
+    """Jobs kept by this process alone, for tests and single-node setups.
+
+    The store is a private SQLite file in shared memory (``/dev/shm`` where
+    there is one), deleted at exit: jobs don't survive a restart, and only
+    workers in this process can run them (the API starts its own; see
+    :func:`start_embedded`).
+    """
+
+    name = "memory"
+
+    def __init__(self) -> None:
+        shm = "/dev/shm" if os.path.isdir("/dev/shm") else None
+        fd, self.path = tempfile.mkstemp(prefix="icereach-queue-", suffix=".db", dir=shm)
+        os.close(fd)
+        atexit.register(self._remove)
+        super().__init__(f"sqlite:///{self.path}")
+
+    def _remove(self) -> None:
+        self.engine.dispose()
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(self.path + suffix)
+            except OSError:
+                pass
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_after_commit(db: Session) -> None:
+    wakeups = db.info.pop("queue_wakeup", None)
+    if wakeups is not None:
+        wakeups.bump()
+
+
+def _make_backend(name: str) -> QueueBackend:
+    if name == "sql":
+        return QueueBackend(engine)
+    if name == "sqlite-wal":
+        return SqliteQueueBackend(settings.queue_database_url)
+    if name == "memory":
+        return MemoryQueueBackend()
+    raise ValueError(f"Unknown queue backend '{name}'")
+
+
+def use_backend(new: QueueBackend) -> QueueBackend:
+    """Switch every session's ``jobs`` to ``new``'s store; returns the backend it replaces."""
+    global _backend
+    old = _backend
+    new.install()
+    SessionLocal.configure(binds={} if new.engine is engine else {Job: new.engine})
+    _backend = new
+    return old
+
+
+def backend() -> QueueBackend:
+    return _backend
+
+
+_backend: QueueBackend = QueueBackend(engine)
+if settings.queue_backend != "sql":
+    use_backend(_make_backend(settings.queue_backend))
+
+
+def _roll_up_progress(db: Session, parent_id: int) -> None:
+    """Set a parent's progress to the mean of its children's (uncommitted)."""
+    child = aliased(Job)
+    mean = select(cast(func.coalesce(func.avg(child.progress), 0), Integer)).where(child.parent_id == parent_id)
+    db.execute(update(Job).where(Job.id == parent_id).values(progress=mean.scalar_subquery()))
+
+
+class _Progress:
+    """A handler's progress callback, coalescing writes.
+
+    A call is written (and the job's lease renewed — the heartbeat) only once
+    ``settings.job_progress_interval`` seconds have passed since the last write,
+    the percentage moved ``settings.job_progress_step`` points, or it reaches
+    100. Otherwise it is staged on the ``Job`` row, so the handler's own next
+    commit carries it for free. Parents get the roll-up on writes only.
+    """
+
+    def __init__(self, db: Session, job: Job) -> None:
+        self.db = db
+        self.job = job
+        self.percent = job.progress
+        self.message = job.message
+        self.staged = False
+        self._written = (self.percent, time.monotonic())
+        self.children = _children(db, job)  # a run that adds more has fanned out
+
+    def __call__(self, percent: float, message: str = "") -> None:
+        self.percent = max(0, min(100, int(percent)))
         if message:
-            job.message = message[:500]
-        db.commit()
-    return cb
+            self.message = message[:500]
+        self.staged = True
+        last_percent, last_at = self._written
+        if (self.percent >= 100 or self.percent - last_percent >= settings.job_progress_step
+                or time.monotonic() - last_at >= settings.job_progress_interval):
+            self.flush()
+        else:
+            self.job.progress, self.job.message = self.percent, self.message
+
+    def flush(self) -> None:
+        """Write what is staged now, renewing the lease; LeaseLost if the reaper took the job."""
+        if not self.staged:
+            return
+        job = self.job
+        values: dict[str, Any] = {"progress": self.percent, "message": self.message, "leased_until": _lease_end()}
+        if self.db.execute(update(Job).where(*_held(job)).values(**values)).rowcount == 0:
+            self.db.rollback()
+            raise LeaseLost(f"Job {job.id} lost its lease")
+        if job.parent_id is not None:
+            _roll_up_progress(self.db, job.parent_id)
+        self.db.commit()
+        self._written = (self.percent, time.monotonic())
+        self.staged = False
+
+
+def _child_finished(db: Session, job: Job) -> None:
+    """Count a terminal child against its parent; the last one re-queues the parent."""
+    if job.parent_id is None:
+        return
+    parent_id = job.parent_id
+    db.execute(update(Job).where(Job.id == parent_id).values(pending_children=Job.pending_children - 1))
+    _roll_up_progress(db, parent_id)
+    db.execute(
+        update(Job)
+        .where(Job.id == parent_id, Job.status == "waiting", Job.pending_children <= 0)
+        .values(status="queued", run_after=datetime.utcnow())
+    )
+    notify(db)
+    db.commit()
 
 
-def run_job(db: Session, job: Job) -> None:
-    """Execute a claimed job through its handler, with retry/backoff and DLQ."""
-    handler = HANDLERS.get(job.type)
-    if handler is None:
+def _park(db: Session, job: Job, result: dict) -> None:
+    """Finish a fanning-out handler's run: wait for its children (or, if they all
+    finished already, go straight back on the queue to fan in)."""
+    waiting = db.execute(
+        update(Job).where(Job.id == job.id, Job.pending_children > 0)
+        .values(status="waiting", result=result, error=None, leased_until=None)
+    )
+    if waiting.rowcount == 0:
+        db.execute(update(Job).where(Job.id == job.id).values(
+            status="queued", run_after=datetime.utcnow(), result=result, error=None, leased_until=None,
+        ))
+        notify(db)
+    db.commit()
+    db.refresh(job)
+
+
+def _worker_id() -> str:
+    """``host:pid`` of this worker process (recorded on the jobs it runs)."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def begin(db: Session, job: Job) -> Optional[_Progress]:
+    """Start a claimed job's run; its progress callback, or None if it is not to run here.
+
+    The first step of running a job outside :func:`run_job` (the asyncio worker
+    awaits its handlers itself): ``begin``, call the handler, :func:`finish`.
+
+    The claim is checked and the lease renewed in one conditional UPDATE: a job
+    that waited in a claimed batch past its lease may have been reaped and
+    claimed by another worker since, and is then skipped. A job that isn't
+    claimed (run inline) is claimed here. Jobs nothing handles are dead-lettered.
+    """
+    now = datetime.utcnow()
+    if job.status == "running":
+        start = update(Job).where(*_held(job))
+    else:
+        start = update(Job).where(Job.id == job.id, Job.status == job.status).values(attempts=Job.attempts + 1)
+    started = db.execute(start.values(status="running", started_at=now, worker=_worker_id(),
+                                      leased_until=_lease_end()))
+    db.commit()
+    if started.rowcount == 0:
+        db.refresh(job)
+        return None
+    if job.type not in HANDLERS:
         job.status = "failed"
         job.error = f"No handler registered for job type '{job.type}'"
+        job.finished_at = now
         db.commit()
+        _child_finished(db, job)
         _fire_dlq(job)
-        return
+        return None
+    return _Progress(db, job)
 
-    job.attempts += 1
+
+def _succeed(db: Session, job: Job, progress: _Progress, result: Any) -> None:
+    result = result if isinstance(result, dict) else {"ok": True}
+    # Counting children, not pending ones: they may all be finished already.
+    if _children(db, job) > progress.children:
+        _park(db, job, result)
+        return
+    done = db.execute(update(Job).where(*_held(job)).values(
+        status="done", progress=100, result=result, error=None, leased_until=None, finished_at=datetime.utcnow(),
+    ))
     db.commit()
-    try:
-        result = handler(db, job, _progress_cb(db, job))
-        job.status = "done"
-        job.progress = 100
-        job.result = result if isinstance(result, dict) else {"ok": True}
-        job.error = None
+    if done.rowcount == 1:
+        _child_finished(db, job)
+
+
+def _fail(db: Session, job: Job, progress: _Progress, exc: Exception) -> None:
+    """Retry a failed run with backoff, or dead-letter it once out of attempts."""
+    attempt = job.attempts
+    db.rollback()
+    job = db.get(Job, job.id)
+    if job.status != "running" or job.attempts != attempt:
+        return  # reaped while failing: the job is back on the queue (or dead-lettered) already
+    job.error = str(exc)
+    if progress.staged:  # rolled back with the handler's work; keep where it got to
+        job.progress, job.message = progress.percent, progress.message
+    if job.attempts >= MAX_ATTEMPTS:
+        job.status = "failed"
+        job.finished_at = datetime.utcnow()
         db.commit()
+        _child_finished(db, job)
+        _fire_dlq(job)
+    else:
+        backoff = min(300, 2 ** job.attempts)
+        job.status = "queued"
+        job.run_after = datetime.utcnow() + timedelta(seconds=backoff)
+        db.commit()
+
+
+def finish(db: Session, job: Job, progress: _Progress, result: Any = None,
+           error: Optional[Exception] = None) -> None:
+    """End a run started with :func:`begin`: record the handler's ``result``, or
+    retry/dead-letter the job after its ``error`` (nothing, if it lost its lease)."""
+    if isinstance(error, LeaseLost):
+        db.rollback()  # reaped: the job is back on the queue (or dead-lettered) already
+    elif error is not None:
+        _fail(db, job, progress, error)
+    else:
+        _succeed(db, job, progress, result)
+
+
+def run_job(db: Session, job: Job) -> None:
+    """Execute a claimed job through its handler, with retry/backoff and DLQ.
+
+    An ``async def`` handler runs to completion on an event loop of its own
+    here; the asyncio worker (:mod:`icereach.services.aioworker`) interleaves
+    them instead.
+    """
+    progress = begin(db, job)
+    if progress is None:
+        return
+    try:
+        result = HANDLERS[job.type](db, job, progress)
+        if inspect.isawaitable(result):
+            result = asyncio.run(result)
+        finish(db, job, progress, result)
     except Exception as exc:  # noqa: BLE001 — handlers may raise anything
-        db.rollback()
-        job = db.get(Job, job.id)
-        job.error = str(exc)
-        if job.attempts >= MAX_ATTEMPTS:
-            job.status = "failed"
-            db.commit()
-            _fire_dlq(job)
-        else:
-            backoff = min(300, 2 ** job.attempts)
-            job.status = "queued"
-            job.run_after = datetime.utcnow() + timedelta(seconds=backoff)
-            db.commit()
+        finish(db, job, progress, error=exc)
 
 
 def _fire_dlq(job: Job) -> None:
@@ -120,19 +717,86 @@ def _fire_dlq(job: Job) -> None:
             pass
 
 
+def reap_expired(db: Session) -> int:
+    """Re-queue running jobs whose lease expired (their worker died or hung).
+
+    The lost run counts as a failed attempt: the job backs off like any other
+    failure and dead-letters once it is out of attempts. Jobs claimed before
+    leases existed (``leased_until`` NULL) expire a lease after their last update.
+    """
+    now = datetime.utcnow()
+    lease = timedelta(seconds=settings.job_lease_seconds)
+    expired = or_(Job.leased_until < now, and_(Job.leased_until.is_(None), Job.updated_at < now - lease))
+    reaped = 0
+    for job in db.scalars(select(Job).where(Job.status == "running", expired)).all():
+        error = "Lease expired (worker lost)"
+        dead = job.attempts >= MAX_ATTEMPTS
+        values = {"status": "failed", "error": error, "finished_at": now} if dead else {
+            "status": "queued", "error": error, "run_after": now + timedelta(seconds=min(300, 2 ** job.attempts)),
+        }
+        # Conditional: a heartbeat may have renewed the lease since the SELECT.
+        res = db.execute(update(Job).where(Job.id == job.id, Job.status == "running", expired)
+                         .values(leased_until=None, **values))
+        db.commit()
+        if res.rowcount == 0:
+            continue
+        reaped += 1
+        db.refresh(job)
+        if dead:
+            _child_finished(db, job)
+            _fire_dlq(job)
+    return reaped
+
+
+def reap(db: Session) -> int:
+    """One reaper pass: expired job leases, then every ``@register_reaper``."""
+    total = 0
+    for fn in (reap_expired, *REAPERS):
+        try:
+            total += fn(db) or 0
+        except Exception:  # noqa: BLE001 — one failing reaper must not stop the others
+            db.rollback()
+    return total
+
+
+def start_reaper(interval: float) -> threading.Thread:
+    """Run :func:`reap` every ``interval`` seconds in a daemon thread.
+
+    Every worker runs one; the conditional updates make concurrent passes safe.
+    """
+    def loop() -> None:
+        while True:
+            time.sleep(interval)
+            with SessionLocal() as db:
+                reap(db)
+
+    thread = threading.Thread(target=loop, name="reaper", daemon=True)
+    thread.start()
+    return thread
+
+
 def run_worker(poll_interval: float = 1.0, max_idle_loops: Optional[int] = None,
-               on_idle: Optional[Callable[[Session], None]] = None) -> None:
+               on_idle: Optional[Callable[[Session], None]] = None,
+               types: Optional[Collection[str]] = None, exclude: Collection[str] = (),
+               batch: Optional[int] = None, stop: Optional[threading.Event] = None,
+               on_job: Optional[Callable[[Job], None]] = None) -> None:
     """Worker loop: claim and run jobs until interrupted (or idle limit hit, for tests).
 
     `on_idle(db)` runs on idle cycles — used to advance time-based work (automation
-    journeys) without an external scheduler.
+    journeys) without an external scheduler. `types`/`exclude` filter which job
+    types this loop claims, up to `batch` (default ``settings.queue_claim_batch``)
+    at a time (see :func:`claim_batch`). Idle, it waits up to `poll_interval`
+    for a :func:`notify`. Once `stop` is set the loop returns after the job it is
+    running, without claiming more; `on_job(job)` runs after each job.
     """
+    batch = batch or settings.queue_claim_batch
+    listener = _backend.listener()
     idle = 0
-    while True:
+    while stop is None or not stop.is_set():
         db = SessionLocal()
         try:
-            job = claim_next(db)
-            if job is None:
+            jobs = claim_batch(db, batch, types, exclude)
+            if not jobs:
                 if on_idle is not None:
                     try:
                         on_idle(db)
@@ -140,13 +804,52 @@ def run_worker(poll_interval: float = 1.0, max_idle_loops: Optional[int] = None,
                         db.rollback()
                 idle += 1
                 if max_idle_loops is not None and idle >= max_idle_loops:
+                    listener.close()
                     return
-                time.sleep(poll_interval)
+                listener.wait(poll_interval)
                 continue
             idle = 0
-            run_job(db, job)
+            for i, job in enumerate(jobs):
+                if stop is not None and stop.is_set():
+                    # Draining: hand back the rest of the batch unstarted (and the attempts
+                    # claiming them counted), as far as these claims still hold.
+                    db.execute(update(Job).where(or_(*(and_(*_held(j)) for j in jobs[i:])))
+                               .values(status="queued", attempts=Job.attempts - 1, leased_until=None))
+                    db.commit()
+                    break
+                run_job(db, job)
+                if on_job is not None:
+                    on_job(job)
         finally:
             db.close()
+    listener.close()
+
+
+def start_lane(types: Collection[str], poll_interval: float,
+               on_idle: Optional[Callable[[Session], None]] = None, batch: Optional[int] = None) -> threading.Thread:
+    """Run a dedicated worker loop for ``types`` in a daemon thread.
+
+    Reserves capacity: latency-sensitive jobs never queue behind long ones (a
+    campaign send holds the main loop for minutes).
+    """
+    thread = threading.Thread(
+        target=run_worker,
+        kwargs={"poll_interval": poll_interval, "on_idle": on_idle, "types": tuple(types), "batch": batch},
+        name=f"lane-{'+'.join(types)}", daemon=True,
+    )
+    thread.start()
+    return thread
+
+
+def _parse_lanes(spec: str) -> dict[str, int]:
+    """``"transactional:1,interactive:2"`` -> threads reserved per lane."""
+    lanes: dict[str, int] = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        lane, _, n = part.partition(":")
+        if lane not in LANES:
+            raise ValueError(f"Unknown lane '{lane}' in worker_lanes")
+        lanes[lane] = int(n or 1)
+    return lanes
 
 
 def _worker_kwargs_from_env() -> dict:
@@ -161,25 +864,29 @@ def _worker_kwargs_from_env() -> dict:
     return kwargs
 
 
-def main() -> None:
-    """Worker entrypoint: import handler modules so they register, then loop.
+def load_handlers() -> None:
+    """Import the handler modules so they register, and make sure the schema exists.
 
-    Handlers register into THIS module's ``HANDLERS`` dict via ``@register``.
-    Crucially this must run inside the canonical ``icereach.services.queue``
-    module — see the ``__main__`` guard below for why.
+    Handlers register into THIS module's ``HANDLERS`` dict via ``@register``, so
+    this must run inside the canonical ``icereach.services.queue`` module — see
+    the ``__main__`` guard below for why.
     """
-    from . import dsn, importer, sender  # noqa: F401 — register handlers on import
+    from . import dsn, importer, sender, transactional  # noqa: F401 — register handlers on import
     from . import automation, replies  # noqa: F401
 
     # Dev convenience, mirroring the API: ensure the schema exists so the worker
     # doesn't crash with "no such table: jobs" when it starts before the API (or
     # against a fresh DB). Production uses Alembic; create_all is a no-op once the
     # tables are there. Importing the handlers above pulls in every model first.
-    from ..db import Base, engine
+    from ..db import Base
     Base.metadata.create_all(engine)
 
-    # On idle cycles: advance automation journeys (~30s) and poll reply
-    # mailboxes for new replies (~120s — cheap UIDL check, only new mail fetched).
+
+def idle_tick() -> Callable[[Session], None]:
+    """An ``on_idle`` hook advancing automation journeys (~30s) and polling reply
+    mailboxes for new replies (~120s — cheap UIDL check, only new mail fetched)."""
+    from . import automation, replies
+
     _last_auto = [0.0]
     _last_reply = [0.0]
 
@@ -191,9 +898,59 @@ def main() -> None:
         if now - _last_reply[0] >= 120:
             _last_reply[0] = now
             replies.poll_all(db)
+    return _tick
+
 
-    print("iceReach worker starting... (send_campaign, import_contacts, poll_dsn, poll_replies, +automation ticks)")
-    run_worker(on_idle=_tick, **_worker_kwargs_from_env())
+def lane_loop_kwargs(lane: str) -> dict[str, Any]:
+    """``run_worker`` options for a thread reserved to ``lane``.
+
+    The transactional lane polls every few milliseconds and keeps warm provider
+    connections, so it has its jobs to itself when it runs.
+    """
+    if lane == "transactional":
+        from . import transactional
+        return {"poll_interval": settings.transactional_poll_interval, "on_idle": transactional.sweep,
+                "batch": settings.transactional_claim_batch}
+    return {"poll_interval": settings.worker_lane_poll_interval}
+
+
+def main() -> None:
+    """Worker entrypoint: register the handlers, then loop (one process; see
+    :mod:`icereach.services.supervisor` for a pool of them)."""
+    load_handlers()
+    lanes = _start_lanes()
+    start_reaper(settings.job_reap_interval)
+
+    print(f"iceReach worker starting... (general loop + lanes {lanes}; +automation ticks, reaper)")
+    run_worker(on_idle=idle_tick(), exclude=lane_types("transactional") if lanes.get("transactional") else (),
+               **_worker_kwargs_from_env())
+
+
+def _start_lanes() -> dict[str, int]:
+    """Start the threads reserved per lane, next to a general loop (which takes
+    any lane, most urgent first)."""
+    lanes = _parse_lanes(settings.worker_lanes)
+    for lane, threads in lanes.items():
+        for _ in range(threads):
+            kwargs = lane_loop_kwargs(lane)
+            start_lane(lane_types(lane), kwargs.pop("poll_interval"), **kwargs)
+    return lanes
+
+
+def start_embedded() -> None:
+    """Run the whole worker in daemon threads of this process.
+
+    For the memory backend, whose jobs only this process can see: the API
+    starts it alongside itself.
+    """
+    load_handlers()
+    lanes = _start_lanes()
+    start_reaper(settings.job_reap_interval)
+    threading.Thread(
+        target=run_worker, name="worker", daemon=True,
+        kwargs={"on_idle": idle_tick(),
+                "exclude": lane_types("transactional") if lanes.get("transactional") else ()},
+    ).start()
 
 
 if __name__ == "__main__":  # pragma: no cover
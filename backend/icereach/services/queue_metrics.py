@@ -0,0 +1,186 @@
+"""Queue metrics: depth, lag, throughput and run/wait latency per job type.
+
+A :func:`snapshot` is a handful of aggregate queries over the jobs table (in
+whichever store the queue backend keeps it), never a scan into Python:
+
+* depth  — queued jobs by type and priority, split into due and scheduled
+  (future ``run_after``: retry backoff, send-time delays), and the age of the
+  oldest due one per type (the lag to autoscale workers on);
+* state  — running, waiting on children, queued for a retry, and dead-lettered
+  jobs per type, and the running jobs (and expired leases) per worker;
+* window — jobs that finished (done or dead-lettered) in the last
+  ``window`` seconds: jobs/s, and run time (handler start to finish) and wait
+  time (due to handler start) as cumulative histograms over ``BUCKETS`` with
+  p50/p95/p99 interpolated from them, as Prometheus' ``histogram_quantile``
+  does.
+
+Times cover each job's latest run (``Job.started_at`` / ``finished_at``,
+recorded by :mod:`icereach.services.queue`). :func:`prometheus` renders a
+snapshot in the Prometheus text format; every series is a gauge over the
+current state or the window.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import DateTime, case, func, literal, select
+from sqlalchemy.orm import Session
+
+from ..models import Job
+
+# Upper bounds (seconds) of the run/wait time histogram buckets; +Inf is implied.
+BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _seconds(dialect: str, start, end):
+    """SQL expression: seconds from ``start`` to ``end``."""
+    if dialect == "sqlite":
+        return (func.julianday(end) - func.julianday(start)) * 86400.0
+    return func.extract("epoch", end - start)
+
+
+def _count(cond):
+    return func.coalesce(func.sum(case((cond, 1), else_=0)), 0)
+
+
+def _quantile(q: float, buckets: list[int], count: int, longest: float) -> float:
+    """Estimate the ``q`` quantile from cumulative bucket counts (linear within a bucket)."""
+    if not count:
+        return 0.0
+    rank = q * count
+    lower, below = 0.0, 0
+    for le, cumulative in zip((*BUCKETS, longest), (*buckets, count)):
+        if cumulative >= rank:
+            upper = min(le, longest)  # this bucket holds a job, so longest > lower
+            return lower + (upper - lower) * (rank - below) / (cumulative - below)
+        lower, below = le, cumulative
+    return longest
+
+
+def _histogram(row, prefix: str, count: int) -> dict[str, Any]:
+    buckets = [int(row[f"{prefix}_le_{i}"]) for i in range(len(BUCKETS))]
+    longest = float(row[f"{prefix}_max"] or 0.0)
+    return {
+        "sum": float(row[f"{prefix}_sum"] or 0.0),
+        "max": longest,
+        "buckets": {str(le): n for le, n in zip(BUCKETS, buckets)},
+        **{f"p{round(q * 100)}": _quantile(q, buckets, count, longest) for q in QUANTILES},
+    }
+
+
+def snapshot(db: Session, window: float = 300.0) -> dict[str, Any]:
+    """Queue metrics now, with throughput and latencies over the last ``window`` seconds."""
+    now = datetime.utcnow()
+    since = now - timedelta(seconds=window)
+    at = literal(now, DateTime())
+    dialect = db.get_bind(Job).dialect.name
+    types: dict[str, dict[str, Any]] = defaultdict(lambda: {
+        "queued": 0, "due": 0, "lag_seconds": 0.0, "running": 0, "waiting": 0, "retrying": 0,
+        "dead_lettered": 0, "done": 0, "failed": 0, "jobs_per_second": 0.0,
+    })
+
+    due = Job.run_after <= at
+    depth = []
+    for row in db.execute(
+        select(Job.type, Job.priority, func.count().label("queued"), _count(due).label("due"),
+               func.max(case((due, _seconds(dialect, Job.run_after, at)))).label("lag"))
+        .where(Job.status == "queued").group_by(Job.type, Job.priority)
+        .order_by(Job.priority.desc(), Job.type)
+    ):
+        lag = max(0.0, float(row.lag or 0.0))
+        depth.append({"type": row.type, "priority": row.priority, "queued": row.queued, "due": int(row.due),
+                      "lag_seconds": lag})
+        t = types[row.type]
+        t["queued"] += row.queued
+        t["due"] += int(row.due)
+        t["lag_seconds"] = max(t["lag_seconds"], lag)
+
+    for row in db.execute(
+        select(Job.type, _count(Job.status == "running").label("running"),
+               _count(Job.status == "waiting").label("waiting"),
+               _count((Job.status == "queued") & (Job.attempts > 0)).label("retrying"),
+               _count(Job.status == "failed").label("dead_lettered"))
+        .where(Job.status.in_(("running", "waiting", "queued", "failed"))).group_by(Job.type)
+    ):
+        types[row.type].update(running=int(row.running), waiting=int(row.waiting),
+                               retrying=int(row.retrying), dead_lettered=int(row.dead_lettered))
+
+    workers = [
+        {"worker": row.worker or "unknown", "running": row.running, "expired_leases": int(row.expired)}
+        for row in db.execute(
+            select(Job.worker, func.count().label("running"), _count(Job.leased_until < at).label("expired"))
+            .where(Job.status == "running").group_by(Job.worker).order_by(Job.worker)
+        )
+    ]
+
+    run = _seconds(dialect, Job.started_at, Job.finished_at)
+    wait = _seconds(dialect, Job.run_after, Job.started_at)
+    columns = []
+    for prefix, seconds in (("run", run), ("wait", wait)):
+        columns += [func.sum(seconds).label(f"{prefix}_sum"), func.max(seconds).label(f"{prefix}_max")]
+        columns += [_count(seconds <= le).label(f"{prefix}_le_{i}") for i, le in enumerate(BUCKETS)]
+    for row in db.execute(
+        select(Job.type, func.count().label("finished"), _count(Job.status == "done").label("done"), *columns)
+        .where(Job.finished_at >= since, Job.started_at.is_not(None)).group_by(Job.type)
+    ).mappings():
+        finished = row["finished"]
+        t = types[row["type"]]
+        t.update(done=int(row["done"]), failed=finished - int(row["done"]), jobs_per_second=finished / window,
+                 run_seconds=_histogram(row, "run", finished), wait_seconds=_histogram(row, "wait", finished))
+
+    return {
+        "generated_at": now.isoformat(),
+        "window_seconds": window,
+        "lag_seconds": max((t["lag_seconds"] for t in types.values()), default=0.0),
+        "jobs_per_second": sum(t["jobs_per_second"] for t in types.values()),
+        "depth": depth,
+        "types": dict(sorted(types.items())),
+        "workers": workers,
+    }
+
+
+def _label(value: Any) -> str:
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def prometheus(snap: dict[str, Any]) -> str:
+    """A :func:`snapshot` in the Prometheus text exposition format."""
+    lines: list[str] = []
+
+    def metric(name: str, help_: str, samples: list[tuple[dict[str, Any], float]]) -> None:
+        lines.append(f"# HELP icereach_{name} {help_}")
+        lines.append(f"# TYPE icereach_{name} gauge")
+        for labels, value in samples:
+            rendered = ",".join(f'{k}="{_label(v)}"' for k, v in labels.items())
+            lines.append(f"icereach_{name}{{{rendered}}} {value:g}" if rendered else f"icereach_{name} {value:g}")
+
+    types = snap["types"]
+    window = f"{snap['window_seconds']:g}s"
+    metric("queue_lag_seconds", "Age of the oldest due queued job.", [({}, snap["lag_seconds"])])
+    metric("queue_depth", "Queued jobs that are due.",
+           [({"type": d["type"], "priority": d["priority"]}, d["due"]) for d in snap["depth"]])
+    metric("queue_scheduled", "Queued jobs not due yet (backoff, delays).",
+           [({"type": d["type"], "priority": d["priority"]}, d["queued"] - d["due"]) for d in snap["depth"]])
+    metric("queue_type_lag_seconds", "Age of the oldest due queued job of a type.",
+           [({"type": k}, t["lag_seconds"]) for k, t in types.items()])
+    for state, help_ in (("running", "Jobs running."), ("waiting", "Jobs waiting on their children."),
+                         ("retrying", "Jobs queued again after a failed attempt."),
+                         ("dead_lettered", "Jobs failed for good (dead-letter state).")):
+        metric(f"jobs_{state}", help_, [({"type": k}, t[state]) for k, t in types.items()])
+    metric("jobs_per_second", f"Jobs finished (done or dead-lettered) per second over the last {window}.",
+           [({"type": k}, t["jobs_per_second"]) for k, t in types.items()])
+    metric("jobs_finished", f"Jobs finished over the last {window}, by outcome.",
+           [({"type": k, "status": s}, t[s]) for k, t in types.items() for s in ("done", "failed")])
+    for kind, help_ in (("run", "Handler run time"), ("wait", "Time from due to handler start")):
+        metric(f"job_{kind}_seconds", f"{help_} of jobs finished over the last {window}, by quantile.",
+               [({"type": k, "quantile": f"{q:g}"}, t[f"{kind}_seconds"][f"p{round(q * 100)}"])
+                for k, t in types.items() if f"{kind}_seconds" in t for q in QUANTILES])
+    metric("worker_running_jobs", "Jobs each worker process (host:pid) is running.",
+           [({"worker": w["worker"]}, w["running"]) for w in snap["workers"]])
+    metric("worker_expired_leases", "Running jobs whose lease expired, by worker (reaped next pass).",
+           [({"worker": w["worker"]}, w["expired_leases"]) for w in snap["workers"]])
+    return "\n".join(lines) + "\n"
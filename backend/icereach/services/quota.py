@@ -1,33 +1,221 @@
-"""Monthly send quotas (per workspace)."""
+"""Monthly send quotas (per workspace), kept as a usage counter per month.
+
+One :class:`~icereach.models.SendUsage` row per workspace and calendar month
+holds ``sent`` (sends charged to the month) and ``reserved`` (allowance held by
+sends still in flight). Allowance is granted by a conditional UPDATE that only
+succeeds while ``sent + reserved`` stays within the limit, so concurrent workers
+and API processes can never overshoot it, and reading usage is one row lookup.
+
+Senders :meth:`Allowance.take` allowance in blocks as they go,
+:meth:`Allowance.charge` what they have used with each batch of outcomes they
+write, and :meth:`Allowance.settle` at the end, returning the rest. What an
+allowance holds is recorded in a :class:`~icereach.models.QuotaReservation`
+row tied to its job run; should the worker die, :func:`reap_reservations`
+releases it once the run has lost its claim. A deferred message stays charged
+(to the period in its ``quota_period``) while it waits for its retry;
+:func:`refund_messages` gives it back if it ends up failing.
+"""
 
 from __future__ import annotations
 
-from datetime import datetime
+from collections.abc import Iterable
+from datetime import datetime, timedelta
 from typing import Optional
 
-from sqlalchemy import func, select
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from ..models import Message, Workspace
+from ..config import settings
+from ..models import Job, Message, QuotaReservation, SendUsage, Workspace
+from .queue import register_reaper
+
+
+def period(now: Optional[datetime] = None) -> str:
+    """The usage period (UTC calendar month) ``now`` falls in, as ``YYYY-MM``."""
+    return (now or datetime.utcnow()).strftime("%Y-%m")
+
+
+def _row(workspace_id: int, per: str) -> list:
+    return [SendUsage.workspace_id == workspace_id, SendUsage.period == per]
+
+
+def _ensure(db: Session, workspace_id: int, per: str) -> None:
+    if db.scalar(select(SendUsage.id).where(*_row(workspace_id, per))) is not None:
+        return
+    try:
+        with db.begin_nested():  # another process may open the month first
+            db.execute(insert(SendUsage).values(workspace_id=workspace_id, period=per, sent=0, reserved=0))
+    except IntegrityError:
+        pass
 
 
 def sent_this_month(db: Session, workspace_id: int) -> int:
-    now = datetime.utcnow()
-    start = datetime(now.year, now.month, 1)
-    return db.scalar(
-        select(func.count(Message.id)).where(
-            Message.workspace_id == workspace_id, Message.status == "sent", Message.sent_at >= start
-        )
-    ) or 0
+    return db.scalar(select(SendUsage.sent).where(*_row(workspace_id, period()))) or 0
 
 
 def remaining(db: Session, workspace: Workspace) -> Optional[int]:
     """Remaining sends this month, or None when the workspace is unlimited."""
     if not workspace.monthly_send_limit:
         return None
-    return max(0, workspace.monthly_send_limit - sent_this_month(db, workspace.id))
+    used = db.scalar(select(SendUsage.sent + SendUsage.reserved).where(*_row(workspace.id, period()))) or 0
+    return max(0, workspace.monthly_send_limit - used)
 
 
 def exceeded(db: Session, workspace: Workspace) -> bool:
     rem = remaining(db, workspace)
     return rem is not None and rem <= 0
+
+
+def reserve(db: Session, workspace: Workspace, n: int, per: Optional[str] = None,
+            reservation: Optional[int] = None) -> int:
+    """Reserve up to ``n`` sends in ``per`` (default: this month); returns how many were granted.
+
+    What is granted is added to the ``reservation`` row, if given, in the same
+    transaction. Commits, so the usage row is locked only for the UPDATE itself.
+    """
+    per = per or period()
+    _ensure(db, workspace.id, per)
+    limit = workspace.monthly_send_limit
+    while n > 0:
+        stmt = update(SendUsage).where(*_row(workspace.id, per)).values(reserved=SendUsage.reserved + n)
+        if limit:
+            stmt = stmt.where(SendUsage.sent + SendUsage.reserved + n <= limit)
+        if db.execute(stmt).rowcount:
+            break
+        used = db.scalar(select(SendUsage.sent + SendUsage.reserved).where(*_row(workspace.id, per))) or 0
+        n = min(n, max(0, limit - used))
+    if reservation is not None and n:
+        db.execute(update(QuotaReservation).where(QuotaReservation.id == reservation)
+                   .values(held=QuotaReservation.held + n))
+    db.commit()
+    return n
+
+
+def settle(db: Session, workspace_id: int, reserved: int, used: int, per: Optional[str] = None) -> None:
+    """Charge ``used`` of a ``reserved`` block to the month and release the whole block.
+
+    Written inside the caller's transaction; the caller commits.
+    """
+    db.execute(update(SendUsage).where(*_row(workspace_id, per or period())).values(
+        sent=SendUsage.sent + used, reserved=SendUsage.reserved - reserved,
+    ))
+
+
+def record(db: Session, workspace_id: int, n: int = 1) -> None:
+    """Charge ``n`` sends that went out without a reservation (automation steps). Caller commits."""
+    per = period()
+    _ensure(db, workspace_id, per)
+    db.execute(update(SendUsage).where(*_row(workspace_id, per)).values(sent=SendUsage.sent + n))
+
+
+def refund(db: Session, workspace_id: int, n: int, per: Optional[str] = None) -> None:
+    """Give back ``n`` sends charged to ``per`` (default: this month) that ended up failing. Caller commits."""
+    if n > 0:
+        db.execute(update(SendUsage).where(*_row(workspace_id, per or period())).values(
+            sent=case((SendUsage.sent > n, SendUsage.sent - n), else_=0),
+        ))
+
+
+def refund_messages(db: Session, workspace_id: int, ids: Iterable[int]) -> None:
+    """Refund the ``failed`` messages among ``ids``, each to the period it was charged to. Caller commits."""
+    ids = list(ids)
+    for start in range(0, len(ids), 500):
+        for per, n in db.execute(
+            select(Message.quota_period, func.count(Message.id))
+            .where(Message.id.in_(ids[start:start + 500]), Message.status == "failed")
+            .group_by(Message.quota_period)
+        ).all():
+            refund(db, workspace_id, n, per)
+
+
+def _release(db: Session, reservation: int) -> None:
+    """Drop a reservation row and return what it still held. Caller commits."""
+    row = db.execute(delete(QuotaReservation).where(QuotaReservation.id == reservation).returning(
+        QuotaReservation.workspace_id, QuotaReservation.period, QuotaReservation.held,
+    )).first()
+    if row is not None and row.held:
+        db.execute(update(SendUsage).where(*_row(row.workspace_id, row.period))
+                   .values(reserved=SendUsage.reserved - row.held))
+
+
+@register_reaper
+def reap_reservations(db: Session) -> int:
+    """Release allowance held by job runs that no longer hold their claim (their worker died),
+    and by API requests older than a job lease."""
+    rows = db.execute(select(QuotaReservation.id, QuotaReservation.job_id, QuotaReservation.job_attempt,
+                             QuotaReservation.created_at)).all()
+    job_ids = {r.job_id for r in rows if r.job_id is not None}
+    # Two queries, not a join: the jobs table may live in another database.
+    live = set(db.execute(select(Job.id, Job.attempts).where(
+        Job.id.in_(job_ids), Job.status == "running",
+    )).all()) if job_ids else set()
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.job_lease_seconds)
+    stale = [r.id for r in rows if ((r.job_id, r.job_attempt) not in live if r.job_id is not None
+                                    else r.created_at < cutoff)]
+    for reservation in stale:
+        _release(db, reservation)
+        db.commit()
+    return len(stale)
+
+
+class Allowance:
+    """One sender's running reservation against its workspace's monthly quota.
+
+    :meth:`take` hands out allowance for each page of recipients, reserving a
+    further block of at least ``block`` sends whenever what it holds runs out.
+    The reservation is recorded for ``job`` (the running job, if any) so it can
+    be reaped should the worker die holding it.
+    """
+
+    def __init__(self, db: Session, workspace: Workspace, block: int = 1, job: Optional[Job] = None) -> None:
+        self.db = db
+        self.workspace = workspace
+        self.block = max(1, block)
+        self.period = period()
+        self.job = job
+        self.reservation: Optional[int] = None
+        self.held = 0
+        self.taken = 0
+        self.charged = 0
+
+    def take(self, n: int) -> int:
+        """Claim up to ``n`` sends; fewer (possibly 0) once the quota runs out."""
+        short = n - (self.held - self.taken)
+        if short > 0:
+            if self.reservation is None:
+                row = QuotaReservation(workspace_id=self.workspace.id, period=self.period, held=0,
+                                       job_id=self.job.id if self.job else None,
+                                       job_attempt=self.job.attempts if self.job else None)
+                self.db.add(row)
+                self.db.flush()  # committed with the first reserve
+                self.reservation = row.id
+            self.held += reserve(self.db, self.workspace, max(short, self.block), self.period, self.reservation)
+        granted = min(n, self.held - self.taken)
+        self.taken += granted
+        return granted
+
+    def charge(self, used: int) -> None:
+        """Charge the sends used so far (``used`` in total) that aren't yet. Caller commits,
+        with the outcomes they stand for."""
+        n = used - self.charged
+        if n <= 0:
+            return
+        self.charged = used
+        # Out of the reservation, unless the reaper already released it (then only count the sends).
+        held = self.reservation is not None and self.db.execute(
+            update(QuotaReservation).where(QuotaReservation.id == self.reservation, QuotaReservation.held >= n)
+            .values(held=QuotaReservation.held - n)
+        ).rowcount
+        values = {"sent": SendUsage.sent + n}
+        if held:
+            values["reserved"] = SendUsage.reserved - n
+        self.db.execute(update(SendUsage).where(*_row(self.workspace.id, self.period)).values(**values))
+
+    def settle(self, used: int) -> None:
+        """Charge the ``used`` sends and return the rest of the held allowance. Caller commits."""
+        self.charge(used)
+        if self.reservation is not None:
+            _release(self.db, self.reservation)
+        self.reservation = None
+        self.held = self.taken = self.charged = 0
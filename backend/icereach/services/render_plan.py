@@ -0,0 +1,179 @@
+"""Compiled render plans: merge tags and click tracking resolved once per content.
+
+Rendering a message the naive way re-runs the merge regex over subject, HTML and
+text, re-scans the HTML for anchors and (when there is no text part) re-parses
+the HTML into plaintext — for every recipient, on identical content. A
+:class:`RenderPlan` does that work once: each part is compiled into a tuple of
+static string fragments and slots (a merge tag, or a tracked link whose target
+may itself contain merge tags), so per-recipient rendering is a join.
+
+Output is identical to the classic pipeline
+``rewrite_html(render(html, row), message_id)`` / ``render(text or
+html_to_text(html), row)`` for every template whose anchors are written in the
+template itself (merge values are substituted, never re-scanned for anchors).
+
+Static link targets are also collected into :attr:`RenderPlan.links`; once the
+caller has stored them as a link set (:func:`~icereach.services.tracking.link_set_id`)
+it can render with compact, index-based tracking tokens.
+
+Plans are cached process-wide by a hash of their content, so campaigns,
+automation steps and ``/v1/emails`` all share compiled plans.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Union
+
+from ..config import settings
+from .merge import _MERGE_RE, html_to_text
+from .tracking import _ANCHOR_HREF, _PASSTHROUGH_SCHEME, _click_url, _open_pixel, encode_compact
+
+# Compiled plans kept per process (LRU). Plans are small: fragments of the source.
+PLAN_CACHE_SIZE = 256
+
+
+class _Merge:
+    """A ``{key}`` slot; renders ``row[key]`` or the literal tag when missing."""
+
+    __slots__ = ("key",)
+
+    def __init__(self, key: str) -> None:
+        self.key = key
+
+
+class _Link:
+    """A tracked ``href`` slot whose target is itself a compiled fragment list.
+
+    ``index`` is the target's position in the plan's static link table, or None
+    when the target depends on merge tags (and so must be signed per recipient).
+    """
+
+    __slots__ = ("target", "index")
+
+    def __init__(self, target: tuple, index: int | None = None) -> None:
+        self.target = target
+        self.index = index
+
+
+Parts = tuple[Union[str, _Merge, _Link], ...]
+
+
+def _compile_merge(content: str) -> Parts:
+    parts: list = []
+    pos = 0
+    for m in _MERGE_RE.finditer(content):
+        if m.start() > pos:
+            parts.append(content[pos:m.start()])
+        parts.append(_Merge(m.group(1)))
+        pos = m.end()
+    if pos < len(content):
+        parts.append(content[pos:])
+    return tuple(parts)
+
+
+def _compile_html(html: str) -> tuple[Parts, tuple[str, ...]]:
+    parts: list = []
+    links: list[str] = []
+    pos = 0
+    for m in _ANCHOR_HREF.finditer(html):
+        parts += _compile_merge(html[pos:m.start(3)])  # text before + `<a ... href="`
+        target = _compile_merge(m.group(3))
+        if len(target) == 1 and target[0].__class__ is str:
+            url = target[0]
+            if not url.strip() or _PASSTHROUGH_SCHEME.match(url):
+                parts.append(url)  # never tracked, whoever the recipient
+            else:
+                parts.append(_Link(target, len(links)))
+                links.append(url)
+        else:
+            parts.append(_Link(target))
+        pos = m.end(3)
+    parts += _compile_merge(html[pos:])
+    return tuple(parts), tuple(links)
+
+
+def _merge(parts: Parts, row: dict) -> str:
+    out = []
+    for p in parts:
+        if p.__class__ is str:
+            out.append(p)
+        elif p.key in row:
+            out.append(str(row[p.key]))
+        else:
+            out.append("{" + p.key + "}")
+    return "".join(out)
+
+
+class RenderPlan:
+    """Subject, tracked HTML and text of one piece of content, compiled for reuse."""
+
+    __slots__ = ("subject", "html", "text", "links")
+
+    def __init__(self, subject: str, html: str, text: str = "") -> None:
+        self.subject = _compile_merge(subject)
+        self.html, self.links = _compile_html(html)
+        self.text = _compile_merge(text or html_to_text(html))
+
+    def render(self, row: dict, message_id: int, link_set: int | None = None) -> tuple[str, str, str]:
+        """Return ``(subject, html, text)`` for one recipient.
+
+        The HTML has click tracking bound to ``message_id`` and the open pixel
+        appended. With ``link_set=None`` the tokens are the signed-JSON kind, exactly
+        as :func:`icereach.services.tracking.rewrite_html` produces; with the id of
+        the link set storing :attr:`links` (0 if there are none) static links and
+        the pixel use compact tokens instead.
+        """
+        compact = link_set is not None
+        base = settings.base_url
+        html = []
+        for p in self.html:
+            if p.__class__ is str:
+                html.append(p)
+            elif p.__class__ is _Merge:
+                html.append(str(row[p.key]) if p.key in row else "{" + p.key + "}")
+            elif compact and p.index is not None:
+                html.append(f"{base}/t/c/{encode_compact(message_id, link_set, p.index)}")
+            else:
+                target = _merge(p.target, row)
+                if not target.strip() or _PASSTHROUGH_SCHEME.match(target):
+                    html.append(target)
+                else:
+                    html.append(_click_url(message_id, target))
+        if compact:
+            html.append(f'<img src="{base}/t/o/{encode_compact(message_id)}.png" width="1" height="1" alt="" />')
+        else:
+            html.append(_open_pixel(message_id))
+        return _merge(self.subject, row), "".join(html), _merge(self.text, row)
+
+
+_cache: OrderedDict[bytes, RenderPlan] = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def content_key(subject: str, html: str, text: str = "") -> bytes:
+    """Hash identifying a (subject, html, text) triple; the plan cache key."""
+    h = hashlib.sha256()
+    for part in (subject, html, text):
+        data = part.encode("utf-8")
+        h.update(len(data).to_bytes(8, "big"))
+        h.update(data)
+    return h.digest()
+
+
+def get_plan(subject: str, html: str, text: str = "") -> RenderPlan:
+    """Return the compiled plan for this content, compiling it on first use."""
+    key = content_key(subject, html, text)
+    with _cache_lock:
+        plan = _cache.get(key)
+        if plan is not None:
+            _cache.move_to_end(key)
+            return plan
+    plan = RenderPlan(subject, html, text)
+    with _cache_lock:
+        _cache[key] = plan
+        while len(_cache) > PLAN_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return plan
@@ -21,6 +21,7 @@ even a full re-scan can't double-count the "replies" metric.
 
 from __future__ import annotations
 
+import asyncio
 import email
 import re
 from email import policy
@@ -30,6 +31,7 @@ from sqlalchemy import select
 from sqlalchemy.orm import Session as DbSession
 
 from ..config import settings
+from ..db import SessionLocal
 from ..models import Event, Message, SendingDomain
 from .queue import register
 
@@ -237,8 +239,18 @@ def poll_all(db: DbSession) -> int:
     return total
 
 
+def _poll_one(domain_id: int) -> int:
+    with SessionLocal() as db:
+        try:
+            return poll_domain(db, db.get(SendingDomain, domain_id))
+        except Exception:  # noqa: BLE001 — a flaky mailbox must not fail the others
+            db.rollback()
+            return 0
+
+
 @register("poll_replies")
-def poll_replies(db: DbSession, job, progress) -> dict:
-    """Queue handler: poll all reply mailboxes once."""
-    recorded = poll_all(db)
-    return {"recorded": recorded}
+async def poll_replies(db: DbSession, job, progress) -> dict:
+    """Queue handler: poll all reply mailboxes once, concurrently (one thread per mailbox)."""
+    ids = db.scalars(select(SendingDomain.id).where(SendingDomain.reply_protocol != "")).all()
+    recorded = await asyncio.gather(*(asyncio.to_thread(_poll_one, domain_id) for domain_id in ids))
+    return {"recorded": sum(recorded)}
@@ -2,53 +2,157 @@
 
 Registered as the 'send_campaign' queue handler. Idempotent: one Message per
 (campaign, contact) — re-running a partially-sent campaign resumes safely.
+
+The audience is streamed in keyset pages of lightweight :class:`Recipient`
+records, so worker memory does not grow with list/segment size. Each page gets
+its Message rows reserved in one multi-row INSERT; delivery outcomes are then
+written back in bulk UPDATEs every ``settings.send_commit_interval`` messages.
+Sends are paced by the :mod:`~icereach.services.governor`; recipients it
+postpones (or that get a temporary 4xx) are re-driven individually by
+``retry_deferred`` jobs once their ``next_attempt_at`` comes round.
+A crash can therefore re-send at most one commit interval of messages on resume
+(the same at-least-once trade-off as before, widened from one to N).
+
+Large campaigns are split into ``send_campaign_chunk`` jobs over contact id
+ranges so several workers can send one campaign in parallel; the
+``send_campaign`` job plans them and, once they have all finished, fans in.
+Each sending job draws on the monthly quota through its own
+:class:`~icereach.services.quota.Allowance`, a block at a time.
 """
 
 from __future__ import annotations
 
+import heapq
 import random
-from datetime import datetime
+import time
+from collections.abc import Callable, Iterator
+from datetime import datetime, timedelta
+from typing import Optional
 
-from sqlalchemy import select
+from sqlalchemy import func, insert, select, update
 from sqlalchemy.orm import Session as DbSession
 
 from ..config import settings
+from ..db import SessionLocal
 from ..models import (
     Campaign,
     CampaignVariant,
     Contact,
+    Job,
     ListMembership,
     Message,
+    Segment,
     SendingDomain,
     Suppression,
+    Workspace,
 )
+from . import quota
 from .esp import get_provider
-from .merge import html_to_text, render
-from .queue import register
-from .segments import evaluate as evaluate_segment
-from .tracking import encode_token, rewrite_html, unsubscribe_footer_html, unsubscribe_footer_text
+from .governor import PERMANENT, THROTTLED, classify, governor
+from .queue import DLQ_HOOKS, LeaseLost, child_totals, enqueue, enqueue_children, register, register_reaper
+from .render_plan import get_plan
+from .segments import build_filter
+from .tracking import encode_compact, link_set_id, unsubscribe_footer_html, unsubscribe_footer_text
+
+
+# Contacts fetched per keyset page. Each page is a plain column projection, so
+# memory stays flat no matter how large the list or segment is.
+RECIPIENT_PAGE_SIZE = 1000
+
+
+class Recipient:
+    """The slice of a Contact the send loop needs (no ORM identity, no session)."""
+
+    __slots__ = ("id", "email", "name", "attributes")
+
+    def __init__(self, id: int, email: str, name: Optional[str], attributes: Optional[dict]) -> None:
+        self.id = id
+        self.email = email
+        self.name = name
+        self.attributes = attributes
 
 
-def _recipients(db: DbSession, campaign: Campaign) -> list[Contact]:
+def _pending_filter(campaign: Campaign) -> list:
+    """Anti-joins dropping contacts already messaged by this campaign or suppressed.
+
+    Pushing both checks into the audience query keeps resumed sends to a few
+    queries per page and never loads the suppression list into memory.
+    """
+    # Rows still 'queued' were reserved by an interrupted attempt but never
+    # delivered, so they count as pending (and are reused, not duplicated).
+    already_sent = select(Message.id).where(
+        Message.campaign_id == campaign.id, Message.contact_id == Contact.id, Message.status != "queued",
+    )
+    suppressed = select(Suppression.id).where(
+        Suppression.workspace_id == campaign.workspace_id, Suppression.email == Contact.email,
+    )
+    return [~already_sent.exists(), ~suppressed.exists()]
+
+
+def _audience_filter(db: DbSession, campaign: Campaign, pending: bool = False) -> Optional[list]:
+    """WHERE clauses selecting the campaign's subscribed audience, or None if it has none.
+
+    Status filtering happens in SQL for both lists and segments, so unsubscribed
+    or cleaned contacts are never pulled into Python. With ``pending`` the
+    :func:`_pending_filter` anti-joins are added too.
+    """
+    scope = [Contact.workspace_id == campaign.workspace_id, Contact.status == "subscribed"]
+    if pending:
+        scope += _pending_filter(campaign)
     if campaign.list_id is not None:
-        rows = db.scalars(
-            select(Contact)
-            .join(ListMembership, ListMembership.contact_id == Contact.id)
-            .where(
-                ListMembership.list_id == campaign.list_id,
-                ListMembership.status == "subscribed",
-                Contact.workspace_id == campaign.workspace_id,
-                Contact.status == "subscribed",
-            )
-        ).all()
-        return list(rows)
+        members = select(ListMembership.contact_id).where(
+            ListMembership.list_id == campaign.list_id,
+            ListMembership.status == "subscribed",
+        )
+        return [*scope, Contact.id.in_(members)]
     if campaign.segment_id is not None:
-        from ..models import Segment
         seg = db.get(Segment, campaign.segment_id)
         if seg is None:
-            return []
-        return [c for c in evaluate_segment(db, campaign.workspace_id, seg.rules) if c.status == "subscribed"]
-    return []
+            return None
+        return [*scope, build_filter(seg.rules)]
+    return None
+
+
+def count_recipients(db: DbSession, campaign: Campaign, pending: bool = False,
+                     id_range: Optional[tuple[int, int]] = None) -> int:
+    clauses = _audience_filter(db, campaign, pending)
+    if clauses is None:
+        return 0
+    if id_range is not None:
+        clauses.append(Contact.id.between(*id_range))
+    return db.scalar(select(func.count(Contact.id)).where(*clauses)) or 0
+
+
+def iter_recipients(db: DbSession, campaign: Campaign, page_size: int = RECIPIENT_PAGE_SIZE,
+                    pending: bool = False, id_range: Optional[tuple[int, int]] = None) -> Iterator[list[Recipient]]:
+    """Yield the audience in pages of :class:`Recipient`, keyset-paginated by contact id.
+
+    Rows are selected as columns rather than ``Contact`` entities, so nothing lands
+    in the session identity map and each page is garbage once the caller moves on.
+    Keyset (``id > last``) rather than OFFSET keeps every page an index range scan.
+    With ``pending`` only contacts still owed a message (not yet sent, not
+    suppressed) are yielded; ``id_range`` (inclusive) limits it to one chunk.
+    """
+    clauses = _audience_filter(db, campaign, pending)
+    if clauses is None:
+        return
+    last_id = 0
+    if id_range is not None:
+        clauses.append(Contact.id <= id_range[1])
+        last_id = id_range[0] - 1
+    while True:
+        rows = db.execute(
+            select(Contact.id, Contact.email, Contact.name, Contact.attributes)
+            .where(*clauses, Contact.id > last_id)
+            .order_by(Contact.id)
+            .limit(page_size)
+        ).all()
+        if not rows:
+            return
+        yield [Recipient(*r) for r in rows]
+        last_id = rows[-1][0]
+        if len(rows) < page_size:
+            return
 
 
 def _pick_variant(variants: list[CampaignVariant]) -> CampaignVariant:
@@ -56,9 +160,59 @@ def _pick_variant(variants: list[CampaignVariant]) -> CampaignVariant:
     return random.choices(variants, weights=weights, k=1)[0]
 
 
-def send_campaign(db: DbSession, job, progress) -> dict:
-    campaign = db.get(Campaign, job.payload["campaign_id"])
-    if campaign is None or campaign.workspace_id != job.workspace_id:
+def _allocate(db: DbSession, campaign: Campaign, variants: list[CampaignVariant],
+              page: list[Recipient], per: str) -> list[tuple[Recipient, int, CampaignVariant]]:
+    """Reserve a ``queued`` Message row, charged to usage period ``per``, for every recipient in ``page``.
+
+    Rows left ``queued`` by an interrupted earlier attempt are reused (keeping
+    their variant); the rest are created with ONE multi-row INSERT ... RETURNING
+    so tracking tokens get their ids without a flush per recipient.
+    """
+    by_variant = {v.id: v for v in variants}
+    reused = {
+        contact_id: (msg_id, by_variant.get(variant_id) or _pick_variant(variants))
+        for msg_id, contact_id, variant_id in db.execute(
+            select(Message.id, Message.contact_id, Message.variant_id).where(
+                Message.campaign_id == campaign.id,
+                Message.status == "queued",
+                Message.contact_id.in_([r.id for r in page]),
+            )
+        )
+    }
+    if reused:
+        db.execute(update(Message).where(Message.id.in_([m for m, _ in reused.values()]))
+                   .values(quota_period=per))
+    fresh = [r for r in page if r.id not in reused]
+    picks = [_pick_variant(variants) for _ in fresh]
+    if fresh:
+        ids = db.scalars(
+            insert(Message).returning(Message.id, sort_by_parameter_order=True),
+            [
+                {"workspace_id": campaign.workspace_id, "campaign_id": campaign.id,
+                 "contact_id": r.id, "variant_id": v.id, "status": "queued", "quota_period": per}
+                for r, v in zip(fresh, picks)
+            ],
+        ).all()
+        reused.update((r.id, (msg_id, v)) for r, msg_id, v in zip(fresh, ids, picks))
+    return [(r, *reused[r.id]) for r in page]
+
+
+def _flush_outcomes(db: DbSession, outcomes: list[dict]) -> None:
+    """Write a batch of per-message outcomes as one bulk UPDATE and commit."""
+    if outcomes:
+        db.execute(update(Message), outcomes)
+        outcomes.clear()
+    db.commit()
+
+
+def _load(db: DbSession, job) -> tuple[Campaign, list[CampaignVariant], SendingDomain]:
+    return _load_campaign(db, job.workspace_id, job.payload["campaign_id"])
+
+
+def _load_campaign(db: DbSession, workspace_id: int,
+                   campaign_id: int) -> tuple[Campaign, list[CampaignVariant], SendingDomain]:
+    campaign = db.get(Campaign, campaign_id)
+    if campaign is None or campaign.workspace_id != workspace_id:
         raise ValueError("Campaign not found")
 
     variants = db.scalars(select(CampaignVariant).where(CampaignVariant.campaign_id == campaign.id)).all()
@@ -68,81 +222,354 @@ def send_campaign(db: DbSession, job, progress) -> dict:
     domain = db.get(SendingDomain, campaign.sending_domain_id) if campaign.sending_domain_id else None
     if domain is None or not domain.smtp_host:
         raise ValueError("Campaign has no configured sending domain / SMTP relay")
+    return campaign, variants, domain
 
-    campaign.status = "sending"
-    db.commit()
 
-    recipients = _recipients(db, campaign)
-    suppressed = {
-        s.email for s in db.scalars(
-            select(Suppression).where(Suppression.workspace_id == campaign.workspace_id)
-        ).all()
-    }
+def _reserved_batches(db: DbSession, campaign: Campaign, variants: list[CampaignVariant],
+                      id_range: Optional[tuple[int, int]], allowance: quota.Allowance,
+                      counts: dict) -> Iterator[list[tuple[Recipient, int, CampaignVariant]]]:
+    """Pending recipients with their Message rows reserved, a page at a time.
+
+    Stops once ``allowance`` runs out of monthly quota, recording the
+    recipients left over in ``counts["quota_skipped"]``.
+    """
+    reserved = 0
+    for page in iter_recipients(db, campaign, page_size=max(1, settings.send_batch_size),
+                                pending=True, id_range=id_range):
+        granted = allowance.take(len(page))
+        if granted:
+            # Commit the reservations before anything goes out: a crash from here
+            # on leaves 'queued' rows that the next attempt picks up and reuses.
+            batch = _allocate(db, campaign, variants, page[:granted], allowance.period)
+            db.commit()
+            reserved += len(batch)
+            yield batch
+        if granted < len(page):
+            counts["quota_skipped"] = max(0, counts["pending"] - reserved)
+            return  # monthly quota reached — skip the remainder
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    """Backoff before retry number ``attempts`` of a deferred message."""
+    return timedelta(seconds=settings.send_retry_backoff * 2 ** (attempts - 1))
+
+
+def _postpone_delay() -> timedelta:
+    """How long a message the governor had no slot for waits before it is tried again."""
+    return timedelta(seconds=max(1.0, settings.send_defer_max_wait))
+
+
+def _deliver(db: DbSession, campaign: Campaign, domain: SendingDomain, variants: list[CampaignVariant],
+             batches: Iterator[list[tuple[Recipient, int, CampaignVariant]]], pending: int, progress,
+             attempts: Optional[dict[int, int]] = None, counts: Optional[dict] = None,
+             charge: Optional[Callable[[int], None]] = None) -> dict:
+    """Render, pace and send reserved messages; returns ``{"sent", "deferred", "postponed", "charged"}``.
 
-    from . import quota
-    from ..models import Workspace
-    workspace = db.get(Workspace, campaign.workspace_id)
-    # Caps THIS job at the remaining monthly allowance. The single worker runs jobs
-    # sequentially so this is exact; only multi-worker deploys (out of scope, see
-    # rate-limit caveat) could overshoot — that needs a row-locked counter.
-    quota_remaining = quota.remaining(db, workspace)  # None = unlimited
+    The tallies are kept in ``counts`` when given, so they are there even if
+    this raises part-way.
+
+    Every send goes through the :mod:`~icereach.services.governor`: each
+    recipient is scheduled for when its provider group's slot comes due, and
+    scheduled sends go out in waves of whatever is due, so a throttled group
+    only delays its own recipients. One whose group can't be paced in time is
+    *postponed*: left ``deferred`` for a short while, without using up an
+    attempt or being charged, since no server has seen it. One that hits a
+    temporary failure ends up ``deferred`` with its ``next_attempt_at`` backed
+    off (``attempts`` maps message ids to attempts made before this one),
+    unless it has used up ``settings.send_retry_attempts`` retries.
+
+    A message is charged to the quota by its first attempt (sent or deferred,
+    with no attempts before it): ``counts["charged"]``. Outcomes already
+    delivered are flushed even when this raises; ``charge``, if given, is
+    called with the charged total before each flush, so the quota is charged
+    in the same transaction as the outcomes.
+    """
+    attempts = {} if attempts is None else attempts
+    # Compile each variant once per job; per-recipient rendering is then a join.
+    # Static link targets are stored once per variant content for compact tokens.
+    plans = {v.id: get_plan(v.subject, v.html, v.text) for v in variants}
+    link_sets = {vid: link_set_id(db, plan.links) for vid, plan in plans.items()}
 
     provider = get_provider(domain)
-    sent = 0
-    skipped = 0
-    total = len(recipients)
+    counts = {} if counts is None else counts
+    counts.update(sent=0, deferred=0, postponed=0, charged=0)
+    done = 0
+    commit_every = max(1, settings.send_commit_interval)
+    outcomes: list[dict] = []
+
+    def outcome(msg_id: int, status: str, message_id: Optional[str] = None, error: Optional[str] = None) -> None:
+        tries = attempts.get(msg_id, 0) + 1
+        due = None
+        if status == "deferred":
+            if tries > settings.send_retry_attempts:
+                status, error = "failed", f"{error} (gave up after {tries} attempts)"
+            else:
+                due = datetime.utcnow() + _retry_delay(tries)
+                counts["deferred"] += 1
+        elif status == "sent":
+            counts["sent"] += 1
+        if tries == 1 and status != "failed":
+            counts["charged"] += 1
+        outcomes.append({"id": msg_id, "status": status, "sent_at": datetime.utcnow() if status == "sent" else None,
+                         "message_id": message_id, "error": error, "attempts": tries, "next_attempt_at": due})
+
+    def postpone(msg_id: int, group: str) -> None:
+        counts["postponed"] += 1
+        outcomes.append({"id": msg_id, "status": "deferred", "sent_at": None, "message_id": None,
+                         "error": f"rate limited ({group})", "attempts": attempts.get(msg_id, 0),
+                         "next_attempt_at": datetime.utcnow() + _postpone_delay()})
+
+    def flush() -> None:
+        if charge is not None:
+            charge(counts["charged"])
+        _flush_outcomes(db, outcomes)
+
+    def dispatch(ready: list[tuple[int, str, dict]]) -> None:
+        for (msg_id, group, _), result in zip(ready, provider.send_batch([env for *_, env in ready])):
+            if not isinstance(result, Exception):
+                governor.accepted(group)
+                outcome(msg_id, "sent", message_id=result)
+                continue
+            kind = classify(result)
+            if kind == THROTTLED:
+                governor.throttled(domain.id, group, result)
+            # Per-recipient; keep going.
+            outcome(msg_id, "failed" if kind == PERMANENT else "deferred", error=str(result))
+        ready.clear()
+
+    # Rendered sends waiting for their slot: (due, msg_id, group, envelope).
+    scheduled: list[tuple[float, int, str, dict]] = []
+
+    def send_due(wait: bool = False) -> None:
+        """Dispatch every scheduled send that is due; with ``wait``, wait for the next one if none is."""
+        if wait and scheduled:
+            time.sleep(max(0.0, scheduled[0][0] - time.monotonic()))
+        now = time.monotonic()
+        ready: list[tuple[int, str, dict]] = []
+        while scheduled and scheduled[0][0] <= now:
+            _, msg_id, group, envelope = heapq.heappop(scheduled)
+            ready.append((msg_id, group, envelope))
+        if ready:
+            dispatch(ready)
+
     try:
         provider.open()
-        for i, contact in enumerate(recipients):
-            if quota_remaining is not None and sent >= quota_remaining:
-                skipped += 1
-                continue  # monthly quota reached — skip the remainder
-            if contact.email in suppressed:
-                skipped += 1
-                continue
-            # Idempotency: one message per (campaign, contact).
-            if db.scalar(select(Message).where(Message.campaign_id == campaign.id, Message.contact_id == contact.id)):
-                skipped += 1
-                continue
+        for batch in batches:
+            # Schedule a window, hand the provider what is due (each wave fanned out
+            # over its connection pool), then write the window's outcomes in bulk.
+            for start in range(0, len(batch), commit_every):
+                window = batch[start:start + commit_every]
+                for contact, msg_id, variant in window:
+                    group = governor.group(contact.email)
+                    wait = governor.reserve(domain.id, group)
+                    if wait is None:  # provider group saturated here: try this one shortly
+                        postpone(msg_id, group)
+                        continue
+                    row = {"name": contact.name or "", "email": contact.email, **(contact.attributes or {})}
+                    subject, html, text = plans[variant.id].render(row, msg_id, link_sets[variant.id])
+                    unsub_url = f"{settings.base_url}/u/{encode_compact(msg_id)}"
+                    # Visible unsubscribe footer (the header alone isn't always surfaced;
+                    # this is also good-practice and often legally required for bulk mail).
+                    html += unsubscribe_footer_html(unsub_url)
+                    text += unsubscribe_footer_text(unsub_url)
+                    heapq.heappush(scheduled, (time.monotonic() + wait, msg_id, group, {
+                        "from_name": campaign.from_name, "from_email": campaign.from_email,
+                        "to_email": contact.email, "subject": subject, "html": html, "text": text,
+                        "list_unsub_url": unsub_url, "reply_to": domain.reply_to or None,
+                    }))
+                send_due()
+                # Carry sends not due yet into the next window, but only so many:
+                # past that, the slow groups are all there is left to wait for.
+                while len(scheduled) > commit_every:
+                    send_due(wait=True)
+                done += len(window)
+                flush()
+                if pending:
+                    progress(min(done, pending) / pending * 100, f"Sent {counts['sent']}/{pending}")
+        while scheduled:
+            send_due(wait=True)
+            flush()
+    except Exception:
+        # Outcomes still buffered for messages that did go out are kept.
+        db.rollback()
+        flush()
+        raise
+    finally:
+        provider.close()
+    return counts
 
-            variant = _pick_variant(variants)
-            msg_row = Message(
-                workspace_id=campaign.workspace_id, campaign_id=campaign.id,
-                contact_id=contact.id, variant_id=variant.id, status="queued",
-            )
-            db.add(msg_row)
-            db.flush()  # assign id for tracking tokens
-
-            row = {"name": contact.name or "", "email": contact.email, **(contact.attributes or {})}
-            subject = render(variant.subject, row)
-            html = rewrite_html(render(variant.html, row), msg_row.id)
-            text = render(variant.text or html_to_text(variant.html), row)
-            unsub_url = f"{settings.base_url}/u/{encode_token(msg_row.id)}"
-            # Visible unsubscribe footer (the header alone isn't always surfaced;
-            # this is also good-practice and often legally required for bulk mail).
-            html += unsubscribe_footer_html(unsub_url)
-            text += unsubscribe_footer_text(unsub_url)
-            try:
-                provider_id = provider.send(
-                    from_name=campaign.from_name, from_email=campaign.from_email, to_email=contact.email,
-                    subject=subject, html=html, text=text, list_unsub_url=unsub_url,
-                    reply_to=domain.reply_to or None,
-                )
-                msg_row.status = "sent"
-                msg_row.sent_at = datetime.utcnow()
-                msg_row.message_id = provider_id
-                sent += 1
-            except Exception as exc:  # noqa: BLE001 — record per-recipient failure, keep going
-                msg_row.status = "failed"
-                msg_row.error = str(exc)
+
+def _claim_deferred(db: DbSession, campaign: Campaign, variants: list[CampaignVariant], attempts: dict[int, int],
+                    counts: dict) -> Iterator[list[tuple[Recipient, int, CampaignVariant]]]:
+    """Due deferred messages of ``campaign``, claimed (``deferred`` -> ``retrying``) a page at a time.
+
+    The conditional UPDATE makes the claim atomic, so concurrent retry passes
+    never send the same message twice. Recipients who unsubscribed or were
+    suppressed in the meantime are failed instead, and those of them charged
+    to the quota (attempted before) listed in ``counts["dropped"]``. Claimed
+    ids are recorded in ``attempts`` with their attempt counts (so the caller
+    can hand back any it didn't get to).
+    """
+    by_variant = {v.id: v for v in variants}
+    suppressed = select(Suppression.id).where(
+        Suppression.workspace_id == campaign.workspace_id, Suppression.email == Contact.email,
+    ).exists()
+    now = datetime.utcnow()
+    last_id = 0
+    while True:
+        rows = db.execute(
+            select(Message.id, Message.variant_id, Message.attempts, Contact.id, Contact.email, Contact.name,
+                   Contact.attributes, (Contact.status == "subscribed") & ~suppressed)
+            .join(Contact, Contact.id == Message.contact_id)
+            .where(Message.campaign_id == campaign.id, Message.status == "deferred",
+                   Message.next_attempt_at <= now, Message.id > last_id)
+            .order_by(Message.id)
+            .limit(max(1, settings.send_batch_size))
+        ).all()
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        gone = [r[0] for r in rows if not r[7]]
+        if gone:
+            counts["dropped"] += [msg_id for msg_id, tried in db.execute(
+                update(Message).where(Message.id.in_(gone), Message.status == "deferred")
+                .values(status="failed", error="No longer subscribed", next_attempt_at=None)
+                .returning(Message.id, Message.attempts)
+                .execution_options(synchronize_session=False)
+            ) if tried]
+        ids = set(db.scalars(
+            update(Message).where(Message.id.in_([r[0] for r in rows if r[7]]), Message.status == "deferred")
+            .values(status="retrying").returning(Message.id)
+            .execution_options(synchronize_session=False)
+        ).all())
+        db.commit()
+        attempts.update((r[0], r[2]) for r in rows if r[0] in ids)
+        yield [
+            (Recipient(cid, email, name, attrs), mid, by_variant.get(vid) or _pick_variant(variants))
+            for mid, vid, _, cid, email, name, attrs, _ in rows if mid in ids
+        ]
+
+
+def _schedule_retry(db: DbSession, workspace_id: int) -> None:
+    """Make sure a ``retry_deferred`` job runs when the workspace's next deferred message is due."""
+    due = db.scalar(select(func.min(Message.next_attempt_at)).where(
+        Message.workspace_id == workspace_id, Message.status == "deferred", Message.campaign_id.is_not(None),
+    ))
+    if due is None:
+        return
+    queued = db.scalars(select(Job).where(
+        Job.workspace_id == workspace_id, Job.type == "retry_deferred", Job.status == "queued",
+    ).limit(1)).first()
+    if queued is not None:
+        if queued.run_after > due:
+            queued.run_after = due
             db.commit()
-            if total:
-                progress((i + 1) / total * 100, f"Sent {sent}/{total}")
-        # Reflect the real outcome: if there were recipients but none went out,
-        # the campaign failed — don't paint it green as "sent".
-        campaign.status = "failed" if (total > 0 and sent == 0) else "sent"
+        return
+    enqueue(db, workspace_id, "retry_deferred", {}, run_after=due)
+
+
+def _split_audience(db: DbSession, campaign: Campaign, chunk_size: int, limit: int) -> list[tuple[int, int, int]]:
+    """Snapshot the first ``limit`` pending recipients as contact id ranges.
+
+    Returns ``(first_id, last_id, recipients)`` per chunk of up to ``chunk_size``.
+    Only ids are read, one keyset page per chunk.
+    """
+    clauses = _audience_filter(db, campaign, pending=True) or []
+    ranges: list[tuple[int, int, int]] = []
+    last_id = 0
+    while limit > 0:
+        ids = db.scalars(
+            select(Contact.id).where(*clauses, Contact.id > last_id).order_by(Contact.id).limit(min(chunk_size, limit))
+        ).all()
+        if not ids:
+            break
+        ranges.append((ids[0], ids[-1], len(ids)))
+        last_id = ids[-1]
+        limit -= len(ids)
+    return ranges
+
+
+def _send_reserved(db: DbSession, job, campaign: Campaign, variants: list[CampaignVariant], domain: SendingDomain,
+                   id_range: Optional[tuple[int, int]], pending: int, progress) -> dict:
+    """Reserve and deliver the pending recipients (of ``id_range``) within the monthly quota.
+
+    Sent and deferred messages are charged to the month as their outcomes are
+    written (postponed ones once they are first tried); the rest of the
+    allowance taken is returned, also when delivery fails part-way (or by the
+    reaper, should the worker die).
+    """
+    allowance = quota.Allowance(db, db.get(Workspace, campaign.workspace_id), settings.send_quota_block, job)
+    counts = {"pending": pending, "quota_skipped": 0, "sent": 0, "deferred": 0, "postponed": 0, "charged": 0}
+    try:
+        _deliver(db, campaign, domain, variants, _reserved_batches(db, campaign, variants, id_range, allowance, counts),
+                 pending, progress, counts=counts, charge=allowance.charge)
+    finally:
+        allowance.settle(counts["charged"])
+        db.commit()
+    return counts
+
+
+def _fan_in(db: DbSession, job) -> dict:
+    """All chunks are finished: aggregate their counts and finalize the campaign."""
+    planned = job.result or {}
+    totals = child_totals(db, job)
+    sent, deferred = totals.get("sent", 0), totals.get("deferred", 0) + totals.get("postponed", 0)
+    skipped = planned.get("skipped", 0) + totals.get("skipped", 0)
+    campaign = db.get(Campaign, job.payload["campaign_id"])
+    total = planned.get("recipients", 0)
+    if campaign is not None:
+        campaign.status = "failed" if (total > 0 and sent == 0 and not deferred) else "sent"
+        campaign.sent_at = datetime.utcnow()
+        db.commit()
+    return {"sent": sent, "skipped": skipped, "recipients": total, "chunks": totals["children"],
+            "failed_chunks": totals["failed_children"]}
+
+
+def send_campaign(db: DbSession, job, progress) -> dict:
+    """Send a campaign, fanning out to ``send_campaign_chunk`` jobs when it is large.
+
+    Up to ``settings.send_chunk_size`` pending recipients are sent inline. A
+    larger audience is snapshotted into contact id ranges, one chunk job each,
+    which any worker can claim (and which retry independently); this job then
+    waits and runs again once every chunk has finished, to aggregate the
+    per-chunk counts and finalize the campaign.
+    """
+    if db.scalar(select(Job.id).where(Job.parent_id == job.id).limit(1)) is not None:
+        return _fan_in(db, job)
+
+    campaign, variants, domain = _load(db, job)
+    campaign.status = "sending"
+    db.commit()
+
+    total = count_recipients(db, campaign)
+    # Already-messaged (idempotency: one message per campaign+contact) and
+    # suppressed contacts are excluded by the audience query itself.
+    pending = count_recipients(db, campaign, pending=True)
+    skipped = total - pending
+    chunk_size = max(1, settings.send_chunk_size)
+    try:
+        if pending > chunk_size:
+            # Quota is not capped here: each chunk reserves its own as it sends.
+            ranges = _split_audience(db, campaign, chunk_size, pending)
+            job.message = f"Sending {pending} in {len(ranges)} chunks"
+            enqueue_children(db, job, "send_campaign_chunk", (
+                {"campaign_id": campaign.id, "first_id": lo, "last_id": hi, "recipients": n} for lo, hi, n in ranges
+            ))
+            return {"recipients": total, "skipped": total - sum(n for *_, n in ranges), "chunks": len(ranges)}
+
+        counts = _send_reserved(db, job, campaign, variants, domain, None, pending, progress)
+        sent = counts["sent"]
+        skipped += counts["quota_skipped"]
+        _schedule_retry(db, campaign.workspace_id)
+        # Reflect the real outcome: if there were recipients but none went out (or
+        # is still due to, after a deferral), the campaign failed — don't paint it
+        # green as "sent".
+        held_back = counts["deferred"] + counts["postponed"]
+        campaign.status = "failed" if (total > 0 and sent == 0 and not held_back) else "sent"
         campaign.sent_at = datetime.utcnow()
         db.commit()
+    except LeaseLost:
+        raise  # another worker owns the send now
     except Exception:
         # A job-level failure (e.g. SMTP connect) must not leave the campaign
         # wedged in 'sending'; mark it failed, then let the queue retry/DLQ.
@@ -150,9 +577,137 @@ def send_campaign(db: DbSession, job, progress) -> dict:
         campaign.status = "failed"
         db.commit()
         raise
-    finally:
-        provider.close()
     return {"sent": sent, "skipped": skipped, "recipients": total}
 
 
-register("send_campaign")(send_campaign)
+def send_campaign_chunk(db: DbSession, job, progress) -> dict:
+    """Send one contact id range of a chunked campaign (see :func:`send_campaign`).
+
+    A retried chunk resumes like an interrupted campaign: recipients it already
+    messaged are skipped and reserved-but-unsent rows are reused.
+    """
+    campaign, variants, domain = _load(db, job)
+    id_range = (job.payload["first_id"], job.payload["last_id"])
+    pending = count_recipients(db, campaign, pending=True, id_range=id_range)
+    counts = _send_reserved(db, job, campaign, variants, domain, id_range, pending, progress)
+    _schedule_retry(db, campaign.workspace_id)
+    return {"sent": counts["sent"], "deferred": counts["deferred"], "postponed": counts["postponed"],
+            "skipped": job.payload["recipients"] - pending + counts["quota_skipped"],
+            "recipients": job.payload["recipients"]}
+
+
+def _within_quota(db: DbSession, batches: Iterator[list[tuple[Recipient, int, CampaignVariant]]],
+                  attempts: dict[int, int], allowance: quota.Allowance
+                  ) -> Iterator[list[tuple[Recipient, int, CampaignVariant]]]:
+    """Claimed retries, with allowance taken for those never tried (postponed only).
+
+    Those the monthly quota no longer covers are failed instead of sent.
+    """
+    for batch in batches:
+        untried = [msg_id for _, msg_id, _ in batch if not attempts[msg_id]]
+        over = set(untried[allowance.take(len(untried)):])
+        if over:
+            db.execute(update(Message).where(Message.id.in_(over), Message.status == "retrying")
+                       .values(status="failed", error="Monthly send quota exceeded", next_attempt_at=None))
+            db.commit()
+        yield [item for item in batch if item[1] not in over]
+
+
+def retry_deferred(db: DbSession, job, progress) -> dict:
+    """Re-drive the workspace's due deferred campaign messages, and only those.
+
+    Messages are claimed in pages per campaign and sent with that campaign's
+    compiled content over one provider session, so a pass costs roughly what
+    it has to resend, not an audience scan. Messages deferred again are backed
+    off further; the job re-schedules itself for the next one due. Messages
+    only postponed so far were never charged: this pass takes their quota.
+    """
+    now = datetime.utcnow()
+    due = select(Message.campaign_id, func.count(Message.id)).where(
+        Message.workspace_id == job.workspace_id, Message.status == "deferred",
+        Message.campaign_id.is_not(None), Message.next_attempt_at <= now,
+    ).group_by(Message.campaign_id)
+    campaigns = db.execute(due).all()
+    totals = {"sent": 0, "deferred": 0, "postponed": 0, "campaigns": len(campaigns)}
+    workspace = db.get(Workspace, job.workspace_id)
+    for i, (campaign_id, pending) in enumerate(campaigns):
+        try:
+            campaign, variants, domain = _load_campaign(db, job.workspace_id, campaign_id)
+        except ValueError as exc:  # content or sender removed since: these can't be retried
+            dropped = db.scalars(
+                update(Message).where(Message.campaign_id == campaign_id, Message.status == "deferred")
+                .values(status="failed", error=str(exc), next_attempt_at=None).returning(Message.id)
+                .execution_options(synchronize_session=False)
+            ).all()
+            quota.refund_messages(db, job.workspace_id, dropped)
+            db.commit()
+            continue
+        attempts: dict[int, int] = {}
+        counts = {"dropped": [], "charged": 0}
+        allowance = quota.Allowance(db, workspace, settings.send_quota_block, job)
+        try:
+            claimed = _claim_deferred(db, campaign, variants, attempts, counts)
+            _deliver(
+                db, campaign, domain, variants, _within_quota(db, claimed, attempts, allowance), pending,
+                lambda pct, msg="", i=i: progress((i + pct / 100) / len(campaigns) * 100, msg),
+                attempts=attempts, counts=counts, charge=allowance.charge,
+            )
+        except Exception:
+            # Hand back what this pass claimed but never resolved.
+            db.execute(update(Message).where(Message.id.in_(list(attempts)), Message.status == "retrying")
+                       .values(status="deferred"))
+            db.commit()
+            raise
+        finally:
+            allowance.settle(counts["charged"])
+            db.commit()
+        # Deferred messages stay charged to the quota; give back the ones that failed for good.
+        quota.refund_messages(db, job.workspace_id, [*counts["dropped"], *(m for m, n in attempts.items() if n)])
+        db.commit()
+        if counts["sent"] and campaign.status == "failed":
+            campaign.status = "sent"  # everything had been deferred; now some went out
+            db.commit()
+        totals["sent"] += counts["sent"]
+        totals["deferred"] += counts["deferred"]
+        totals["postponed"] += counts["postponed"]
+    _schedule_retry(db, job.workspace_id)
+    return totals
+
+
+@register_reaper
+def reap_stale_retries(db: DbSession) -> int:
+    """Hand back ``retrying`` messages whose workspace has no ``retry_deferred`` job running.
+
+    Such a claim belonged to a pass whose worker died (its job is re-queued by
+    the queue's own reaper); the messages go back to ``deferred``, due now.
+    """
+    # Two queries, not a subquery: the jobs table may live in another database.
+    running = db.scalars(select(Job.workspace_id).where(
+        Job.type == "retry_deferred", Job.status == "running",
+    ).distinct()).all()
+    workspaces = set(db.scalars(
+        update(Message).where(Message.status == "retrying", Message.workspace_id.not_in(running))
+        .values(status="deferred", next_attempt_at=datetime.utcnow()).returning(Message.workspace_id)
+        .execution_options(synchronize_session=False)
+    ).all())
+    db.commit()
+    for workspace_id in workspaces:
+        _schedule_retry(db, workspace_id)
+    return len(workspaces)
+
+
+def _fail_dead_campaign(job) -> None:
+    """DLQ hook: a dead-lettered send must not leave its campaign in ``sending``."""
+    if job.type != "send_campaign":
+        return
+    with SessionLocal() as db:
+        db.execute(update(Campaign).where(Campaign.id == job.payload.get("campaign_id"),
+                                          Campaign.status == "sending").values(status="failed"))
+        db.commit()
+
+
+DLQ_HOOKS.append(_fail_dead_campaign)
+
+register("send_campaign", lane="bulk")(send_campaign)
+register("send_campaign_chunk", lane="bulk")(send_campaign_chunk)
+register("retry_deferred", lane="bulk")(retry_deferred)
@@ -0,0 +1,222 @@
+"""Worker supervisor: a pool of worker processes with per-job-type concurrency.
+
+``python -m icereach.services.queue`` is one worker process. This entry point::
+
+    PYTHONPATH=backend python -m icereach.services.supervisor
+
+starts several, laid out by ``settings.worker_pools`` — comma-separated
+``name:processes`` entries, optionally ``name:processesxthreads`` for I/O-bound
+handlers that can share a process::
+
+    WORKER_POOLS=bulk:4,import_contacts:1,transactional:1x8,*:2
+
+``name`` is a job type (several joined with ``+``), a queue lane (all of its
+types), or ``*`` for everything else. A pool's loops only claim its own types,
+so ``processes x threads`` is the most of them that ever run at once on this
+host; types with a pool of their own are never claimed by a lane pool or by
+``*``. Automation ticks run in the ``*`` pool.
+
+The supervisor restarts a child that crashes (backing off if it keeps dying
+young) and recycles one, once it finishes its current jobs, after
+``settings.worker_recycle_jobs`` jobs or when its resident memory passes
+``settings.worker_recycle_rss_mb``. On SIGTERM (or Ctrl-C) it stops restarting
+and asks every child to drain: finish the job in hand, claim nothing new, and
+exit; children still busy after ``settings.worker_drain_seconds`` are killed
+(their jobs come back once their leases expire). It also runs this host's
+lease reaper.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import signal
+import threading
+import time
+from dataclasses import dataclass
+from multiprocessing.connection import wait
+from typing import Optional
+
+from ..config import settings
+from . import queue
+
+# A child that dies within this many seconds of starting is restarted with backoff.
+MIN_UPTIME = 10.0
+
+
+@dataclass(frozen=True)
+class Pool:
+    """Worker processes (``threads`` loops each) claiming ``types`` (None: any but ``exclude``)."""
+
+    name: str
+    processes: int
+    threads: int = 1
+    types: Optional[tuple[str, ...]] = None
+    exclude: tuple[str, ...] = ()
+    lane: Optional[str] = None
+
+
+def parse_pools(spec: str) -> list[Pool]:
+    """``"bulk:4,import_contacts:1,*:2"`` -> pools, with each job type in exactly one.
+
+    Handlers must be registered first (lanes resolve to their registered types).
+    """
+    entries: list[tuple[str, int, int]] = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, size = part.partition(":")
+        processes, _, threads = (size or "1").partition("x")
+        if int(processes) < 1 or int(threads or 1) < 1:
+            raise ValueError(f"Pool '{name}' needs at least one process and thread")
+        entries.append((name.strip(), int(processes), int(threads or 1)))
+
+    named = {t for name, *_ in entries if name != "*" and name not in queue.LANES for t in name.split("+")}
+    unknown = named - set(queue.HANDLERS)
+    if unknown:
+        raise ValueError(f"Unknown job type(s) in worker_pools: {', '.join(sorted(unknown))}")
+    pools: list[Pool] = []
+    claimed: set[str] = set(named)
+    for name, processes, threads in entries:
+        if name in queue.LANES:
+            types = tuple(t for t in queue.lane_types(name) if t not in named)
+            claimed.update(types)
+            pools.append(Pool(name, processes, threads, types=types, lane=name))
+        elif name != "*":
+            pools.append(Pool(name, processes, threads, types=tuple(name.split("+"))))
+    for name, processes, threads in entries:
+        if name == "*":
+            pools.append(Pool(name, processes, threads, exclude=tuple(sorted(claimed))))
+    return pools
+
+
+class _Recycler:
+    """``on_job`` hook: stop a child's loops once it has done enough jobs or grown too big."""
+
+    def __init__(self, stop: threading.Event) -> None:
+        import psutil
+
+        self.stop = stop
+        self.process = psutil.Process()
+        self.jobs = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, job) -> None:
+        with self._lock:
+            self.jobs += 1
+            done = self.jobs
+        rss_mb = self.process.memory_info().rss / 2**20
+        if (settings.worker_recycle_jobs and done >= settings.worker_recycle_jobs) or \
+                (settings.worker_recycle_rss_mb and rss_mb > settings.worker_recycle_rss_mb):
+            self.stop.set()
+
+
+def _child(pool: Pool) -> None:
+    """A worker process: ``pool.threads`` loops until SIGTERM or recycling."""
+    queue.load_handlers()
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl-C hits the whole group; the supervisor decides
+    recycle = _Recycler(stop)
+    kwargs = queue.lane_loop_kwargs(pool.lane) if pool.lane else {}
+    loops = []
+    for i in range(pool.threads):
+        loop_kwargs = dict(kwargs, types=pool.types, exclude=pool.exclude, stop=stop, on_job=recycle)
+        if pool.name == "*" and i == 0:
+            loop_kwargs["on_idle"] = queue.idle_tick()
+        loops.append(threading.Thread(target=queue.run_worker, kwargs=loop_kwargs,
+                                      name=f"{pool.name}-{i}", daemon=True))
+    for t in loops:
+        t.start()
+    for t in loops:
+        while t.is_alive():
+            t.join(0.5)  # short waits keep SIGTERM handled promptly
+
+
+class _Slot:
+    """One child process position in a pool, restarted as needed."""
+
+    def __init__(self, pool: Pool, index: int) -> None:
+        self.pool = pool
+        self.index = index
+        self.process: Optional[multiprocessing.Process] = None
+        self.started_at = 0.0
+        self.failures = 0
+        self.restart_at = 0.0
+
+
+class Supervisor:
+    def __init__(self, pools: list[Pool], drain_seconds: float) -> None:
+        # Spawned, not forked: the parent runs threads (the reaper) and holds DB connections.
+        self.ctx = multiprocessing.get_context("spawn")
+        self.slots = [_Slot(pool, i) for pool in pools for i in range(pool.processes)]
+        self.drain_seconds = drain_seconds
+        self.stopping = threading.Event()
+
+    def _spawn(self, slot: _Slot) -> None:
+        slot.process = self.ctx.Process(target=_child, args=(slot.pool,),
+                                        name=f"worker-{slot.pool.name}-{slot.index}", daemon=False)
+        slot.process.start()
+        slot.started_at = time.monotonic()
+
+    def _reaped(self, slot: _Slot) -> None:
+        """Schedule a restart for a child that exited (now on recycling, later if it keeps crashing)."""
+        code = slot.process.exitcode
+        uptime = time.monotonic() - slot.started_at
+        if code != 0 and uptime < MIN_UPTIME:
+            slot.failures += 1
+        else:
+            slot.failures = 0
+        delay = min(60.0, 2.0 ** slot.failures) if slot.failures else 0.0
+        slot.restart_at = time.monotonic() + delay
+        reason = "recycled" if code == 0 else f"exited with {code}"
+        print(f"worker {slot.process.name} (pid {slot.process.pid}) {reason}; restarting in {delay:.0f}s")
+        slot.process = None
+
+    def run(self) -> None:
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: self.stopping.set())
+        for slot in self.slots:
+            self._spawn(slot)
+        while not self.stopping.is_set():
+            running = [s.process.sentinel for s in self.slots if s.process is not None]
+            wait(running, timeout=0.5)
+            now = time.monotonic()
+            for slot in self.slots:
+                if slot.process is not None and not slot.process.is_alive():
+                    self._reaped(slot)
+                if slot.process is None and now >= slot.restart_at and not self.stopping.is_set():
+                    self._spawn(slot)
+        self.drain()
+
+    def drain(self) -> None:
+        """SIGTERM every child, wait for them to finish their jobs, then kill stragglers."""
+        alive = [s.process for s in self.slots if s.process is not None and s.process.is_alive()]
+        for p in alive:
+            p.terminate()
+        deadline = time.monotonic() + self.drain_seconds
+        for p in alive:
+            p.join(max(0.0, deadline - time.monotonic()))
+        for p in alive:
+            if p.is_alive():
+                print(f"worker {p.name} (pid {p.pid}) still busy after {self.drain_seconds:.0f}s; killing it")
+                p.kill()
+                p.join()
+
+
+def main() -> None:
+    if queue.backend().name == "memory":
+        raise SystemExit("The memory queue backend is per process; give the supervisor a shared one "
+                         "(QUEUE_BACKEND=sql or sqlite-wal).")
+    queue.load_handlers()
+    pools = parse_pools(settings.worker_pools)
+    queue.start_reaper(settings.job_reap_interval)
+    layout = ", ".join(f"{p.name}:{p.processes}x{p.threads}" for p in pools)
+    print(f"iceReach worker supervisor starting... (pools {layout})")
+    Supervisor(pools, settings.worker_drain_seconds).run()
+
+
+if __name__ == "__main__":  # pragma: no cover
+    # Same reason as in queue.py: run inside the canonical module, so the
+    # spawned children (which import `icereach.services.supervisor._child`)
+    # and the handlers share one `icereach.services.queue`.
+    from icereach.services.supervisor import main as _main
+
+    _main()
@@ -7,6 +7,12 @@ original target ``url`` so the redirect endpoint can re-verify the destination
 and avoid open-redirect abuse. Tampering with a token raises ``ValueError`` on
 decode.
 
+Bulk sends use the *compact* format instead (:func:`encode_compact`): a packed
+``(message_id, link set, link index)`` plus a truncated HMAC, with the link
+targets stored once per content in a :class:`~icereach.models.LinkSet`. That
+keeps click URLs short and skips JSON serialization per link. Both formats decode
+side by side in :func:`decode_token`, so links already sent keep working.
+
 ``rewrite_html`` prepares an outbound HTML body for sending: it rewrites every
 ``<a href>`` into a click-tracking redirect and appends a 1x1 open pixel.
 ``is_bot`` flags known link-preview bots and security scanners whose hits are
@@ -15,16 +21,36 @@ not human opens. Mailbox image proxies (Gmail/Yahoo) are treated as real opens.
 
 from __future__ import annotations
 
+import base64
+import hashlib
+import hmac
+import json
 import re
+import struct
+import threading
+from collections import OrderedDict
 
 from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
 
 from ..config import settings
+from ..models import LinkSet
 
 # Salt namespaces the serializer so tracking tokens can never be confused with
 # tokens minted elsewhere from the same secret_key.
 _SALT = "icereach.tracking"
 
+# Compact token: message id, link set id (0 = none), link index, then the first
+# _MAC_BYTES of an HMAC-SHA256 over them. 22 bytes -> 30 URL-safe characters.
+_COMPACT = struct.Struct(">QIH")
+_MAC_BYTES = 8
+_COMPACT_SALT = b"icereach.tracking.compact"
+
+# Resolved link sets kept per process; sets are immutable, so never stale.
+_LINK_CACHE_SIZE = 1024
+
 # Schemes that must pass through untouched: they are not http(s) navigations and
 # unsubscribe links are deliberately never routed through click tracking.
 _PASSTHROUGH_SCHEME = re.compile(r"^\s*(?:mailto:|tel:|#)", re.IGNORECASE)
@@ -88,18 +114,61 @@ def encode_token(message_id: int, url: str = "") -> str:
     return _serializer().dumps({"message_id": message_id, "url": url})
 
 
+def _compact_mac(payload: bytes) -> bytes:
+    key = settings.secret_key.encode("utf-8")  # read per call so test overrides apply
+    return hmac.new(key, _COMPACT_SALT + payload, hashlib.sha256).digest()[:_MAC_BYTES]
+
+
+def encode_compact(message_id: int, link_set: int = 0, link_index: int = 0) -> str:
+    """Pack ``message_id`` (and optionally a link slot) into a short signed token.
+
+    Args:
+        message_id: The id of the message this tracking event belongs to.
+        link_set: :class:`~icereach.models.LinkSet` id holding the click target;
+            0 for open pixels and unsubscribe links.
+        link_index: Position of the click target within the link set.
+
+    Returns:
+        A 30-character URL-safe token (never contains ``.``, unlike
+        :func:`encode_token` output, which is how the two are told apart).
+    """
+    payload = _COMPACT.pack(message_id, link_set, link_index)
+    return base64.urlsafe_b64encode(payload + _compact_mac(payload)).decode("ascii").rstrip("=")
+
+
+def _decode_compact(token: str) -> dict:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    except Exception as exc:  # malformed base64
+        raise ValueError("invalid tracking token") from exc
+    if len(raw) != _COMPACT.size + _MAC_BYTES:
+        raise ValueError("invalid tracking token")
+    payload, mac = raw[:_COMPACT.size], raw[_COMPACT.size:]
+    if not hmac.compare_digest(mac, _compact_mac(payload)):
+        raise ValueError("invalid tracking token")
+    message_id, link_set, link_index = _COMPACT.unpack(payload)
+    data = {"message_id": message_id, "url": ""}
+    if link_set:
+        data.update(link_set=link_set, link_index=link_index)
+    return data
+
+
 def decode_token(token: str) -> dict:
-    """Verify and decode a tracking token.
+    """Verify and decode a tracking token in either format.
 
     Args:
-        token: A token previously produced by :func:`encode_token`.
+        token: A token produced by :func:`encode_token` or :func:`encode_compact`.
 
     Returns:
-        ``{"message_id": int, "url": str}``.
+        ``{"message_id": int, "url": str}``. Compact click tokens carry the
+        target by reference instead — ``url`` is empty and ``link_set`` /
+        ``link_index`` are added; resolve them with :func:`resolve_link`.
 
     Raises:
         ValueError: If the token is tampered with, malformed, or unsigned.
     """
+    if "." not in token:
+        return _decode_compact(token)
     try:
         payload = _serializer().loads(token)
     except BadSignature as exc:  # tampered / forged token
@@ -113,6 +182,56 @@ def decode_token(token: str) -> dict:
     return {"message_id": payload["message_id"], "url": payload.get("url", "")}
 
 
+def link_set_id(db: Session, urls: tuple[str, ...] | list[str]) -> int:
+    """Return the id of the :class:`LinkSet` holding exactly ``urls``, creating it if needed.
+
+    Content-addressed, so every message rendered from the same content shares one
+    row. Returns 0 (no set) for content without trackable static links. The row
+    is written inside the caller's transaction; the caller commits.
+    """
+    if not urls:
+        return 0
+    digest = hashlib.sha256(json.dumps(list(urls)).encode("utf-8")).hexdigest()
+    found = db.scalar(select(LinkSet.id).where(LinkSet.digest == digest))
+    if found is not None:
+        return found
+    try:
+        with db.begin_nested():  # a concurrent sender may insert the same digest
+            row = LinkSet(digest=digest, urls=list(urls))
+            db.add(row)
+        return row.id
+    except IntegrityError:
+        return db.scalar(select(LinkSet.id).where(LinkSet.digest == digest))
+
+
+_link_cache: OrderedDict[int, tuple[str, ...]] = OrderedDict()
+_link_cache_lock = threading.Lock()
+
+
+def resolve_link(db: Session, link_set: int, link_index: int) -> str:
+    """Map a compact click token's ``(link_set, link_index)`` back to its target URL.
+
+    Raises:
+        ValueError: If the set or index does not exist.
+    """
+    with _link_cache_lock:
+        urls = _link_cache.get(link_set)
+        if urls is not None:
+            _link_cache.move_to_end(link_set)  # least recently clicked sets go first
+    if urls is None:
+        stored = db.scalar(select(LinkSet.urls).where(LinkSet.id == link_set))
+        if stored is None:
+            raise ValueError("unknown link set")
+        urls = tuple(stored)
+        with _link_cache_lock:
+            _link_cache[link_set] = urls
+            while len(_link_cache) > _LINK_CACHE_SIZE:
+                _link_cache.popitem(last=False)
+    if not 0 <= link_index < len(urls):
+        raise ValueError("unknown link index")
+    return urls[link_index]
+
+
 def _click_url(message_id: int, target: str) -> str:
     """Build the signed click-redirect URL for an original ``target`` link."""
     token = encode_token(message_id, target)
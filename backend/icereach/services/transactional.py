@@ -0,0 +1,183 @@
+"""Queued transactional sends: the ``send_transactional[_batch]`` jobs and their warm providers.
+
+``POST /v1/emails`` (in async mode) stores the ``Message``, renders it and
+enqueues a ``send_transactional`` job carrying the rendered content, then
+answers 202; ``POST /v1/emails/batch`` does the same for many messages with
+one ``send_transactional_batch`` job. The worker runs these jobs in a
+dedicated lane (see :func:`icereach.services.queue.start_lane`) that polls
+every few milliseconds, so a transactional email never waits behind a
+campaign.
+
+The lane keeps one open provider per sending domain between jobs, so a send
+costs one SMTP transaction (or HTTP request on a keep-alive client) instead of
+connect + STARTTLS + login. Providers are per thread, reopened when the
+domain's settings change, dropped after a transport failure and closed once
+idle for ``settings.transactional_idle_seconds``.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from datetime import datetime
+from itertools import groupby
+from typing import Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session as DbSession
+
+from ..config import settings
+from ..models import Message, SendingDomain
+from . import quota
+from .esp import EmailProvider, get_provider
+from .governor import PERMANENT, classify, relay_level
+from .queue import MAX_ATTEMPTS, register
+
+JOB_TYPE = "send_transactional"
+BATCH_JOB_TYPE = "send_transactional_batch"
+
+
+class WarmProviders:
+    """Open providers by sending domain, reused across sends by one thread."""
+
+    def __init__(self) -> None:
+        # domain id -> (settings stamp, provider, last used)
+        self._open: dict[int, tuple[Optional[datetime], EmailProvider, float]] = {}
+
+    def get(self, domain: SendingDomain) -> EmailProvider:
+        entry = self._open.get(domain.id)
+        if entry is not None and entry[0] == domain.updated_at:
+            provider = entry[1]
+        else:
+            self.discard(domain.id)  # settings changed since it was opened
+            provider = get_provider(domain)
+            provider.open()
+        self._open[domain.id] = (domain.updated_at, provider, time.monotonic())
+        return provider
+
+    def discard(self, domain_id: int) -> None:
+        entry = self._open.pop(domain_id, None)
+        if entry is not None:
+            try:
+                entry[1].close()
+            except Exception:  # noqa: BLE001 — a dead connection may fail to close
+                pass
+
+    def sweep(self, max_idle: float) -> None:
+        """Close providers unused for ``max_idle`` seconds."""
+        cutoff = time.monotonic() - max_idle
+        for domain_id in [d for d, (_, _, used) in self._open.items() if used < cutoff]:
+            self.discard(domain_id)
+
+    def close_all(self) -> None:
+        for domain_id in list(self._open):
+            self.discard(domain_id)
+
+
+_local = threading.local()
+
+
+def warm_providers() -> WarmProviders:
+    """This thread's warm providers."""
+    pool = getattr(_local, "pool", None)
+    if pool is None:
+        pool = _local.pool = WarmProviders()
+    return pool
+
+
+def sweep(db: DbSession | None = None) -> None:
+    """Lane idle hook: close this thread's providers that have gone unused."""
+    warm_providers().sweep(settings.transactional_idle_seconds)
+
+
+def deliver(db: DbSession, workspace_id: int, items: list[dict], providers: WarmProviders,
+            final: bool = True) -> tuple[dict[int, dict], Optional[Exception]]:
+    """Send the still-``queued`` messages among ``items``, one provider batch per sending domain.
+
+    Each item carries ``message_id``, ``sending_domain_id`` and the rendered
+    envelope (:meth:`~icereach.services.esp.EmailProvider.send` kwargs, with
+    ``to`` for ``to_email``). Returns a result per message resolved, and the
+    first temporary failure among those left ``queued`` for a retry — unless
+    ``final``, when every failure is final. Failed messages are refunded.
+    """
+    ids = [it["message_id"] for it in items]
+    queued = set(db.scalars(select(Message.id).where(Message.id.in_(ids), Message.status == "queued")).all())
+    todo = [it for it in items if it["message_id"] in queued]
+    domains = {d.id: d for d in db.scalars(select(SendingDomain).where(
+        SendingDomain.workspace_id == workspace_id,
+        SendingDomain.id.in_({it["sending_domain_id"] for it in todo}),
+    ))}
+    results: dict[int, dict] = {}
+    outcomes: list[dict] = []
+    retry: Optional[Exception] = None
+    for domain_id, group in groupby(sorted(todo, key=lambda it: it["sending_domain_id"]),
+                                    key=lambda it: it["sending_domain_id"]):
+        group = list(group)
+        domain = domains.get(domain_id)
+        try:
+            if domain is None:
+                raise ValueError("Sending domain not found")
+            sent = providers.get(domain).send_batch([
+                {"from_name": it["from_name"], "from_email": it["from_email"], "to_email": it["to"],
+                 "subject": it["subject"], "html": it["html"], "text": it["text"],
+                 "list_unsub_url": it.get("list_unsub_url")}
+                for it in group
+            ])
+        except Exception as exc:  # noqa: BLE001 — e.g. the relay refused the connection
+            sent = [exc] * len(group)
+        if domain is not None and any(isinstance(r, Exception) and relay_level(r) for r in sent):
+            providers.discard(domain.id)  # don't reuse a connection in an unknown state
+        for it, r in zip(group, sent):
+            mid = it["message_id"]
+            if not isinstance(r, Exception):
+                results[mid] = {"status": "sent", "message_id": r}
+                outcomes.append({"id": mid, "status": "sent", "message_id": r, "sent_at": datetime.utcnow(),
+                                 "error": None})
+            elif final or classify(r) == PERMANENT:
+                results[mid] = {"status": "failed", "error": str(r)}
+                outcomes.append({"id": mid, "status": "failed", "message_id": None, "sent_at": None,
+                                 "error": str(r)})
+            elif retry is None:
+                retry = r
+    if todo:
+        db.execute(update(Message).where(Message.id.in_([it["message_id"] for it in todo]))
+                   .values(attempts=Message.attempts + 1))
+    if outcomes:
+        db.execute(update(Message), outcomes)
+    quota.refund_messages(db, workspace_id, [mid for mid, r in results.items() if r["status"] == "failed"])
+    db.commit()
+    return results, retry
+
+
+def send_transactional(db: DbSession, job, progress) -> dict:
+    """Deliver one queued transactional message over a warm provider.
+
+    A temporary failure raises, so the queue retries the job with backoff; a
+    permanent one (or the last attempt) fails the message and refunds its quota.
+    """
+    mid = job.payload["message_id"]
+    results, retry = deliver(db, job.workspace_id, [job.payload], warm_providers(),
+                             final=job.attempts >= MAX_ATTEMPTS)
+    if retry is not None:
+        raise retry
+    if mid not in results:  # already resolved by an earlier run
+        msg = db.get(Message, mid)
+        return {"message_id": mid, "status": msg.status if msg else "missing"}
+    return {"message_id": mid, **results[mid]}
+
+
+def send_transactional_batch(db: DbSession, job, progress) -> dict:
+    """Deliver a ``/v1/emails/batch`` request's messages, one provider batch per sending domain.
+
+    Retries (with the queue's backoff) resend only the messages still queued.
+    """
+    results, retry = deliver(db, job.workspace_id, job.payload["items"], warm_providers(),
+                             final=job.attempts >= MAX_ATTEMPTS)
+    if retry is not None:
+        raise retry
+    statuses = [r["status"] for r in results.values()]
+    return {"sent": statuses.count("sent"), "failed": statuses.count("failed")}
+
+
+register(JOB_TYPE, lane="transactional")(send_transactional)
+register(BATCH_JOB_TYPE, lane="transactional")(send_transactional_batch)
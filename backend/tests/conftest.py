@@ -10,6 +10,7 @@ os.environ.setdefault("SECRET_KEY", "test-secret-key")
 os.environ.setdefault("BASE_URL", "http://testserver")
 os.environ.setdefault("GEMINI_API_KEY", "")  # AI disabled by default in tests
 os.environ.setdefault("RATE_LIMIT_PER_MINUTE", "0")  # disabled in tests (one test opts in)
+os.environ.setdefault("SEND_MX_GROUPING", "false")  # group recipients by domain: no DNS in tests
 
 import pytest  # noqa: E402
 
@@ -19,7 +20,12 @@ import icereach.models  # noqa: E402,F401  (populate metadata)
 
 @pytest.fixture(autouse=True)
 def _fresh_schema():
+    from icereach.services import tracking
+    from icereach.services.governor import governor
+
     Base.metadata.create_all(engine)
+    tracking._link_cache.clear()  # link-set ids restart with every fresh schema
+    governor.reset()
     yield
     Base.metadata.drop_all(engine)
 
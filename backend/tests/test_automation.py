@@ -151,3 +151,34 @@ def test_advance_due_runs_processes_active():
         assert len(FakeSmtp.sent) == 1
     finally:
         db.close()
+
+
+def test_due_runs_are_leased_one_at_a_time_and_stop_once_reaped(monkeypatch):
+    db = SessionLocal()
+    try:
+        ws = Workspace(name="W", slug="w-lease"); db.add(ws); db.flush()
+        c1 = Contact(workspace_id=ws.id, email="f@x.com", status="subscribed")
+        c2 = Contact(workspace_id=ws.id, email="g@x.com", status="subscribed")
+        db.add_all([c1, c2]); db.flush()
+        dom = _domain(db, ws)
+        a = _automation(db, ws, dom, [("send", {"subject": "1", "html": "1"}), ("send", {"subject": "2", "html": "2"})])
+        engine.enroll(db, a, c1)
+        engine.enroll(db, a, c2)
+        seen = []
+
+        def send(self, frm, to, msg):
+            FakeSmtp.sent.append(to)
+            with SessionLocal() as other:
+                runs = other.query(AutomationRun).order_by(AutomationRun.id).all()
+                seen.append([r.status for r in runs])
+                if to == "f@x.com" and len(FakeSmtp.sent) == 1:
+                    # The first run's lease ran out mid-step: reaped, then claimed by another worker.
+                    runs[0].leased_until = datetime.utcnow() + timedelta(hours=1)
+                    other.commit()
+
+        monkeypatch.setattr(FakeSmtp, "send", send)
+        engine.advance_due_runs(db)
+        assert seen[0] == ["running", "active"]  # the second run isn't claimed (or leased) yet
+        assert FakeSmtp.sent == ["f@x.com", "g@x.com", "g@x.com"]  # f's second step is left to its new owner
+    finally:
+        db.close()
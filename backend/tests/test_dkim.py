@@ -59,3 +59,39 @@ def test_sign_message_returns_dkim_signature_header():
     # The signing domain and selector are reflected in the header tags.
     assert b"d=example.com" in signature
     assert b"s=ir1" in signature
+
+
+def _verifies(signed: bytes, dns_txt: str) -> bool:
+    import dkim
+
+    return dkim.verify(signed, dnsfunc=lambda name, timeout=5: dns_txt.encode("ascii"))
+
+
+def test_signer_output_verifies_with_dkimpy():
+    from icereach.services.dkim import DkimSigner, _key_cache
+
+    private_pem, dns_txt = generate_keypair()
+    signer = DkimSigner()
+    signed = signer.sign(_SAMPLE_MESSAGE, "example.com", "ir1", private_pem)
+    assert signed.startswith(b"DKIM-Signature:") and signed.endswith(_SAMPLE_MESSAGE)
+    assert _verifies(signed, dns_txt)
+    assert any(k[:2] == ("example.com", "ir1") for k in _key_cache)  # parsed once, reused
+    # Any change to a signed header breaks the signature.
+    assert not _verifies(signed.replace(b"Subject: Hello", b"Subject: Hellx"), dns_txt)
+    assert signer.stats()["signed"] == 1
+
+
+def test_signer_process_pool_batch_keeps_order():
+    from icereach.services.dkim import DkimSigner
+
+    private_pem, dns_txt = generate_keypair()
+    messages = [_SAMPLE_MESSAGE.replace(b"Hello", f"Hello {i}".encode()) for i in range(6)]
+    signer = DkimSigner(processes=2)
+    try:
+        signed = signer.sign_many(messages, "example.com", "ir1", private_pem)
+    finally:
+        signer.close()
+    assert [s.endswith(m) for s, m in zip(signed, messages)] == [True] * 6
+    assert all(_verifies(s, dns_txt) for s in signed)
+    stats = signer.stats()
+    assert stats["signed"] == 6 and stats["per_second"] > 0
@@ -59,3 +59,151 @@ def test_sendgrid_returns_header_message_id(monkeypatch):
     mid = p.send(from_name="Acme", from_email="a@m.x.com", to_email="b@y.com",
                  subject="Hi", html="<p>x</p>", text="x")
     assert mid == "sg-9"
+
+
+def _mock_client(monkeypatch, handler):
+    """Route the provider's pooled httpx.Client through ``handler``; returns the request log."""
+    import httpx
+
+    requests = []
+    real_client = httpx.Client
+
+    def record(request):
+        requests.append(request)
+        return handler(request)
+
+    monkeypatch.setattr(esp.httpx, "Client", lambda **kw: real_client(transport=httpx.MockTransport(record), **kw))
+    return requests
+
+
+def _batch(n, **extra):
+    return [dict(from_name="Acme", from_email="a@m.x.com", to_email=f"r{i}@y.com", subject=f"Hi r{i}",
+                 html=f'<p>Hi r{i}</p><a href="https://t/c/tok{i}">go</a>', text=f"Hi r{i}\nbye",
+                 list_unsub_url=f"https://u/{i}", **extra) for i in range(n)]
+
+
+def test_http_provider_reuses_one_client_per_lifecycle(monkeypatch):
+    import httpx
+
+    monkeypatch.setattr(esp.httpx, "post", lambda *a, **k: (_ for _ in ()).throw(AssertionError("one-shot post")))
+    requests = _mock_client(monkeypatch, lambda req: httpx.Response(200, json={"id": "rs-1"}))
+    p = esp.get_provider(_DummyDomain("resend", "rk"))
+    p.open()
+    try:
+        for m in _batch(3):
+            assert p.send(**m) == "rs-1"
+    finally:
+        p.close()
+    assert len(requests) == 3
+    assert all(r.headers["Authorization"] == "Bearer rk" for r in requests)
+
+
+def test_resend_send_batch_uses_batch_endpoint(monkeypatch):
+    import json
+
+    import httpx
+
+    def handler(req):
+        body = json.loads(req.content)
+        return httpx.Response(200, json={"data": [{"id": f"rs-{e['to'][0]}"} for e in body]})
+
+    requests = _mock_client(monkeypatch, handler)
+    monkeypatch.setattr(esp.ResendProvider, "BATCH_SIZE", 2)
+    p = esp.get_provider(_DummyDomain("resend"))
+    p.open()
+    try:
+        results = p.send_batch(_batch(5))
+    finally:
+        p.close()
+    assert [str(r.url) for r in requests] == [esp.ResendProvider.BATCH_API] * 3
+    assert results == [f"rs-r{i}@y.com" for i in range(5)]
+
+
+def test_sendgrid_send_batch_factors_copies_into_personalizations(monkeypatch):
+    import json
+
+    import httpx
+
+    requests = _mock_client(monkeypatch, lambda req: httpx.Response(202, headers={"X-Message-Id": "sg-shared"}))
+    messages = _batch(3)
+    # Doesn't line up with the others (extra tag) -> sent on its own.
+    messages.append(dict(messages[0], to_email="odd@y.com", html="<p><b>Odd</b></p>"))
+    p = esp.get_provider(_DummyDomain("sendgrid"))
+    p.open()
+    try:
+        results = p.send_batch(messages)
+    finally:
+        p.close()
+
+    assert len(requests) == 2
+    batch = json.loads(requests[-1].content)  # lone copies go out first
+    personalizations = batch["personalizations"]
+    assert [pz["to"][0]["email"] for pz in personalizations] == ["r0@y.com", "r1@y.com", "r2@y.com"]
+    assert results[:3] == [pz["custom_args"]["icereach_id"] for pz in personalizations]
+    assert results[3] == "sg-shared"
+    # Applying each personalization's substitutions to the shared content
+    # reproduces that recipient's exact copy.
+    text, html = (c["value"] for c in batch["content"])
+    for m, pz in zip(messages, personalizations):
+        got_html, got_text = html, text
+        for key, value in pz["substitutions"].items():
+            got_html, got_text = got_html.replace(key, value), got_text.replace(key, value)
+        assert (got_html, got_text) == (m["html"], m["text"])
+        assert pz["subject"] == m["subject"]
+        assert pz["headers"]["List-Unsubscribe"] == f"<{m['list_unsub_url']}>"
+
+
+def test_sendgrid_send_batch_falls_back_over_substitution_limit(monkeypatch):
+    import httpx
+
+    requests = _mock_client(monkeypatch, lambda req: httpx.Response(202, headers={"X-Message-Id": "sg-1"}))
+    monkeypatch.setattr(esp.SendGridProvider, "SUBSTITUTIONS_LIMIT", 10)
+    p = esp.get_provider(_DummyDomain("sendgrid"))
+    p.open()
+    try:
+        results = p.send_batch(_batch(3))
+    finally:
+        p.close()
+    assert len(requests) == 3 and results == ["sg-1"] * 3
+
+
+def test_smtp_send_batch_spreads_over_connection_pool(monkeypatch):
+    import threading
+
+    sessions = []
+
+    class _Session:
+        def __init__(self, *a, **k):
+            self.sent = []
+            self.threads = set()
+            sessions.append(self)
+
+        def connect(self):
+            pass
+
+        def send(self, frm, to, msg):
+            if to == "bad@y.com":
+                raise RuntimeError("550 no such user")
+            self.threads.add(threading.get_ident())
+            self.sent.append(to)
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(esp, "SmtpSession", _Session)
+    domain = _DummyDomain("smtp")
+    domain.smtp_connections = 3
+    p = esp.get_provider(domain)
+    p.open()
+    try:
+        recipients = [f"r{i}@y.com" for i in range(12)] + ["bad@y.com"]
+        results = p.send_batch([
+            dict(from_name="A", from_email="a@m.x.com", to_email=to, subject="S", html="<p>x</p>", text="x")
+            for to in recipients
+        ])
+    finally:
+        p.close()
+    assert len(sessions) == 3
+    assert sorted(to for s in sessions for to in s.sent) == sorted(recipients[:-1])
+    assert all(isinstance(r, str) and r.startswith("<") for r in results[:-1])
+    assert isinstance(results[-1], RuntimeError)  # failure lands on its own message
@@ -0,0 +1,83 @@
+import smtplib
+import time
+
+import httpx
+import pytest
+
+from icereach.config import settings
+from icereach.services import governor as gov_mod
+from icereach.services.governor import PERMANENT, THROTTLED, TRANSIENT, Governor, TokenBucket, classify
+
+
+def test_token_bucket_paces_reservations():
+    bucket = TokenBucket(rate=2, burst=2)
+    now = bucket.stamp
+    assert [bucket.reserve(now) for _ in range(4)] == [0, 0, 0.5, 1.0]
+    assert bucket.reserve(now + 10) == 0  # refilled (up to the burst)
+
+
+def test_classify_sorts_failures():
+    assert classify(smtplib.SMTPRecipientsRefused({"a@x.com": (450, b"slow down")})) == THROTTLED
+    assert classify(smtplib.SMTPRecipientsRefused({"a@x.com": (451, b"greylisted")})) == THROTTLED
+    assert classify(smtplib.SMTPRecipientsRefused({"a@x.com": (452, b"full")})) == THROTTLED
+    assert classify(smtplib.SMTPRecipientsRefused({"a@x.com": (550, b"no such user")})) == PERMANENT
+    assert classify(smtplib.SMTPDataError(421, b"too many")) == THROTTLED
+    assert classify(smtplib.SMTPDataError(454, b"temp")) == TRANSIENT
+    assert classify(smtplib.SMTPServerDisconnected("gone")) == TRANSIENT
+    req = httpx.Request("POST", "https://api.example.com")
+    assert classify(httpx.HTTPStatusError("", request=req, response=httpx.Response(429, request=req))) == THROTTLED
+    assert classify(httpx.HTTPStatusError("", request=req, response=httpx.Response(422, request=req))) == PERMANENT
+    assert classify(ValueError("bad template")) == PERMANENT
+
+
+def test_aimd_adjusts_group_rate(monkeypatch):
+    monkeypatch.setattr(settings, "send_rate_per_mx", 10.0)
+    g = Governor()
+    g.throttled(1, "google.com", smtplib.SMTPRecipientsRefused({"a@gmail.com": (421, b"rate")}))
+    assert g.rate("google.com") == 5.0
+    for _ in range(20):
+        g.accepted("google.com")
+    assert g.rate("google.com") == pytest.approx(5.0 + 20 * settings.send_rate_step)
+    assert g.rate("outlook.com") == 10.0  # groups are independent
+
+
+def test_saturated_group_defers(monkeypatch):
+    monkeypatch.setattr(settings, "send_rate_per_mx", 1.0)
+    monkeypatch.setattr(settings, "send_defer_max_wait", 0.5)
+    g = Governor()
+    now = time.monotonic()
+    assert g.reserve(1, "x.com", now=now) == 0
+    assert g.reserve(1, "x.com", now=now) is None  # would wait 1s > 0.5s
+    assert g.reserve(1, "y.com", now=now) == 0
+
+
+def test_relay_throttle_slows_domain_bucket(monkeypatch):
+    monkeypatch.setattr(settings, "send_rate_per_domain", 8.0)
+    g = Governor()
+    g.reserve(7, "x.com")
+    g.throttled(7, "x.com", smtplib.SMTPSenderRefused(421, b"slow", "a@m.x.com"))
+    assert g._domains[7].rate == 4.0
+    assert g.rate("x.com") == settings.send_rate_per_mx
+
+
+def test_groups_recipient_domains_by_mx(monkeypatch):
+    mx = {"acme.io": ["aspmx.l.google.com"], "gmail.com": ["gmail-smtp-in.l.google.com"],
+          "corp.co.uk": ["corp-co-uk.mail.protection.outlook.co.uk"], "nomx.org": []}
+    monkeypatch.setattr(settings, "send_mx_grouping", True)
+    monkeypatch.setattr(gov_mod, "resolve_mx_hosts", lambda d: mx[d])
+    g = Governor()
+    assert g.group("a@acme.io") == g.group("b@Gmail.com") == "google.com"
+    assert g.group("c@corp.co.uk") == "outlook.co.uk"
+    assert g.group("d@nomx.org") == "nomx.org"
+
+
+def test_group_cache_keeps_the_most_recently_used_domains(monkeypatch):
+    lookups = []
+    monkeypatch.setattr(settings, "send_mx_grouping", True)
+    monkeypatch.setattr(gov_mod, "GROUP_CACHE_SIZE", 2)
+    monkeypatch.setattr(gov_mod, "resolve_mx_hosts", lambda d: lookups.append(d) or [])
+    g = Governor()
+    for email in ("a@hot.com", "b@cold.com", "c@hot.com", "d@new.com", "e@hot.com", "f@cold.com"):
+        g.group(email)
+    assert lookups == ["hot.com", "cold.com", "new.com", "cold.com"]  # hot.com stayed cached
+    assert list(g._group_of) == ["hot.com", "cold.com"]
@@ -3,7 +3,7 @@ from fastapi.testclient import TestClient
 from icereach.config import settings
 from icereach.db import SessionLocal
 from icereach.main import app
-from icereach.models import Contact
+from icereach.models import Contact, Message
 from icereach.services import esp, forms as forms_service, webhooks_out
 
 
@@ -80,6 +80,40 @@ def test_v1_api_contacts_and_email(monkeypatch):
     assert em.status_code == 200 and em.json()["status"] == "sent"
 
 
+def test_v1_email_is_queued_and_sent_over_a_warm_connection(monkeypatch):
+    from icereach.services import queue, transactional
+
+    connects = []
+
+    class CountingSmtp(_FakeSmtp):
+        def connect(self):
+            connects.append(1)
+
+    monkeypatch.setattr(esp, "SmtpSession", CountingSmtp)
+    monkeypatch.setattr(settings, "transactional_async", True)
+    c = _client("g6@x.com", "G6")
+    h = _csrf(c)
+    token = c.post("/api/api-keys", json={"name": "ci"}, headers=h).json()["token"]
+    dom = c.post("/api/sending-domains", json={"domain": "m.g6.com", "smtp_host": "smtp.g6.com"}, headers=h).json()["domain"]["id"]
+    auth = {"Authorization": f"Bearer {token}"}
+    ids = []
+    for to in ("one@x.com", "two@x.com"):
+        em = c.post("/v1/emails", json={"to": to, "subject": "Hi", "html": "<p>x</p>", "sending_domain_id": dom}, headers=auth)
+        assert em.status_code == 202 and em.json()["status"] == "queued"
+        ids.append(em.json()["id"])
+    assert connects == []  # nothing sent inside the request
+
+    db = SessionLocal()
+    try:
+        while (job := queue.claim_next(db, types=queue.lane_types("transactional"))) is not None:
+            queue.run_job(db, job)
+        assert [db.get(Message, i).status for i in ids] == ["sent", "sent"]
+        assert connects == [1]  # the second send reused the lane's open connection
+    finally:
+        transactional.warm_providers().close_all()
+        db.close()
+
+
 def test_outbound_webhook_crud_and_dispatch(monkeypatch):
     c = _client("g4@x.com", "G4")
     h = _csrf(c)
@@ -122,3 +156,108 @@ def test_ai_narrative_empty_before_generation():
     got = c.get(f"/api/campaigns/{cid}/analytics/narrative")
     assert got.status_code == 200
     assert got.json() == {"summary": "", "highlights": [], "generated_at": None}
+
+
+def test_queued_v1_email_retries_temporary_failures_and_fails_permanent_ones(monkeypatch):
+    import smtplib
+
+    from icereach.services import queue, transactional
+
+    replies = [smtplib.SMTPRecipientsRefused({"r@x.com": (451, b"later")}),
+               smtplib.SMTPRecipientsRefused({"r@x.com": (550, b"no such user")})]
+
+    class FlakySmtp(_FakeSmtp):
+        def send(self, *a, **k):
+            raise replies.pop(0)
+
+    monkeypatch.setattr(esp, "SmtpSession", FlakySmtp)
+    monkeypatch.setattr(settings, "transactional_async", True)
+    c = _client("g7@x.com", "G7")
+    h = _csrf(c)
+    token = c.post("/api/api-keys", json={"name": "ci"}, headers=h).json()["token"]
+    dom = c.post("/api/sending-domains", json={"domain": "m.g7.com", "smtp_host": "smtp.g7.com"}, headers=h).json()["domain"]["id"]
+    auth = {"Authorization": f"Bearer {token}"}
+    mid = c.post("/v1/emails", json={"to": "r@x.com", "subject": "Hi", "html": "<p>x</p>", "sending_domain_id": dom},
+                 headers=auth).json()["id"]
+
+    db = SessionLocal()
+    try:
+        job = queue.claim_next(db, types=queue.lane_types("transactional"))
+        queue.run_job(db, job)
+        db.refresh(job)
+        assert job.status == "queued" and "451" in job.error  # re-queued with backoff
+        job.run_after = job.created_at
+        db.commit()
+        queue.run_job(db, queue.claim_next(db, types=queue.lane_types("transactional")))
+        db.refresh(job)
+        msg = db.get(Message, mid)
+        assert job.status == "done" and job.result["status"] == "failed"
+        assert msg.status == "failed" and msg.attempts == 2 and "550" in msg.error
+    finally:
+        transactional.warm_providers().close_all()
+        db.close()
+
+
+def test_v1_email_batch(monkeypatch):
+    from icereach.models import Workspace
+    from icereach.services import queue, transactional
+
+    connects, sent = [], []
+
+    class CountingSmtp(_FakeSmtp):
+        def connect(self):
+            connects.append(1)
+
+        def send(self, frm, to, msg):
+            sent.append(to)
+
+    monkeypatch.setattr(esp, "SmtpSession", CountingSmtp)
+    monkeypatch.setattr(settings, "transactional_async", True)
+    c = _client("g8@x.com", "G8")
+    h = _csrf(c)
+    ws_id = c.get("/api/auth/me").json()["workspace"]["id"]
+    token = c.post("/api/api-keys", json={"name": "ci"}, headers=h).json()["token"]
+    dom = c.post("/api/sending-domains", json={"domain": "m.g8.com", "smtp_host": "smtp.g8.com"}, headers=h).json()["domain"]["id"]
+    c.post("/v1/contacts", json={"email": "known@x.com", "name": "Kim"}, headers={"Authorization": f"Bearer {token}"})
+    db = SessionLocal()
+    try:
+        db.get(Workspace, ws_id).monthly_send_limit = 3
+        db.commit()
+    finally:
+        db.close()
+    auth = {"Authorization": f"Bearer {token}"}
+    email = {"subject": "Hi {name}", "html": "<p><a href='https://x.com/r'>receipt</a></p>", "sending_domain_id": dom}
+    batch = [{**email, "to": "known@x.com"}, {**email, "to": "new@x.com"}, {**email, "to": "x@x.com", "sending_domain_id": 999},
+             {**email, "to": "NEW2@x.com"}, {**email, "to": "over@x.com"}]
+    r = c.post("/v1/emails/batch", json={"emails": batch}, headers=auth)
+    assert r.status_code == 202
+    data = r.json()["data"]
+    assert [d["status"] for d in data] == ["queued", "queued", "rejected", "queued", "rejected"]
+    assert data[2]["error"] == "Sending domain not found" and "quota" in data[4]["error"]
+
+    db = SessionLocal()
+    try:
+        assert db.query(Contact).filter(Contact.email.in_(["new@x.com", "new2@x.com"])).count() == 2
+        job = queue.claim_next(db, types=queue.lane_types("transactional"))
+        assert job.type == "send_transactional_batch"
+        queue.run_job(db, job)
+        db.refresh(job)
+        assert job.result == {"sent": 3, "failed": 0}
+        assert sorted(sent) == ["known@x.com", "new2@x.com", "new@x.com"] and connects == [1]
+        assert [db.get(Message, d["id"]).status for d in data if "id" in d] == ["sent"] * 3
+    finally:
+        transactional.warm_providers().close_all()
+        db.close()
+
+    monkeypatch.setattr(settings, "transactional_async", False)
+    r = c.post("/v1/emails/batch", json={"emails": [{**email, "to": "late@x.com"}]}, headers=auth)
+    assert r.status_code == 200 and r.json()["data"][0]["error"] == "Monthly send quota exceeded"
+
+    db = SessionLocal()
+    try:
+        db.get(Workspace, ws_id).monthly_send_limit = 0
+        db.commit()
+    finally:
+        db.close()
+    r = c.post("/v1/emails/batch", json={"emails": [{**email, "to": "late@x.com"}]}, headers=auth)
+    assert r.status_code == 200 and r.json()["data"][0]["status"] == "sent" and sent[-1] == "late@x.com"
@@ -11,9 +11,9 @@ REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
 ALEMBIC_INI = os.path.join(REPO_ROOT, "backend", "alembic.ini")
 
 EXPECTED_TABLES = {
-    "workspaces", "users", "memberships", "sessions", "api_keys",
+    "workspaces", "users", "memberships", "sessions", "api_keys", "send_usage",
     "contacts", "contact_lists", "list_memberships", "segments", "suppressions",
-    "sending_domains", "templates", "saved_blocks", "campaigns", "campaign_variants", "messages", "events",
+    "sending_domains", "templates", "saved_blocks", "campaigns", "campaign_variants", "messages", "events", "link_sets",
     "automations", "automation_steps", "automation_runs",
     "signup_forms", "outbound_webhooks",
     "jobs", "audit_logs", "ai_usage",
@@ -46,6 +46,88 @@ def test_quota_blocks_transactional_send(monkeypatch):
     assert c.post("/v1/emails", json=payload, headers=auth).status_code == 429
 
 
+def test_quota_reservations_never_overshoot_the_limit():
+    from icereach.services import quota
+
+    db = SessionLocal()
+    try:
+        ws = Workspace(name="Q", slug="q-usage", monthly_send_limit=10)
+        db.add(ws)
+        db.commit()
+        a, b = quota.Allowance(db, ws, block=6), quota.Allowance(db, ws, block=6)
+        assert a.take(2) == 2  # holds a block of 6
+        assert b.take(5) == 4  # only 4 left unheld
+        assert quota.remaining(db, ws) == 0 and a.take(5) == 4
+        a.settle(3)  # used 3 of its 6
+        b.settle(4)
+        db.commit()
+        assert quota.sent_this_month(db, ws.id) == 7 and quota.remaining(db, ws) == 3
+        quota.refund(db, ws.id, 2)
+        db.commit()
+        assert quota.remaining(db, ws) == 5
+    finally:
+        db.close()
+
+
+def test_reservation_of_a_dead_worker_is_reaped_and_its_sends_still_charged():
+    from datetime import datetime, timedelta
+
+    from icereach.models import SendUsage
+    from icereach.services import queue, quota
+
+    db = SessionLocal()
+    try:
+        ws = Workspace(name="R", slug="r-usage", monthly_send_limit=10)
+        db.add(ws)
+        db.commit()
+        queue.register("reserving")(lambda db, job, progress: {})
+        job = queue.enqueue(db, ws.id, "reserving", {})
+        queue.begin(db, queue.claim_next(db))
+        allowance = quota.Allowance(db, ws, block=6, job=job)
+        assert allowance.take(3) == 3
+        allowance.charge(2)  # flushed with its outcomes
+        db.commit()
+        assert quota.reap_reservations(db) == 0 and quota.remaining(db, ws) == 4  # run still holds its claim
+
+        job.leased_until = datetime.utcnow() - timedelta(seconds=1)  # the worker died
+        db.commit()
+        queue.reap(db)
+        usage = db.query(SendUsage).filter_by(workspace_id=ws.id).one()
+        assert (usage.sent, usage.reserved) == (2, 0)
+
+        allowance.settle(3)  # a worker that was only hung: its last send still counts, once
+        db.commit()
+        db.refresh(usage)
+        assert (usage.sent, usage.reserved) == (3, 0)
+    finally:
+        db.close()
+
+
+def test_failed_message_is_refunded_to_the_month_it_was_charged_to():
+    from icereach.models import Contact, Message, SendUsage
+    from icereach.services import quota
+
+    db = SessionLocal()
+    try:
+        ws = Workspace(name="M", slug="m-usage")
+        db.add(ws)
+        db.commit()
+        contact = Contact(workspace_id=ws.id, email="m@x.com")
+        db.add(contact)
+        db.add_all([SendUsage(workspace_id=ws.id, period="2026-09", sent=5, reserved=0),
+                    SendUsage(workspace_id=ws.id, period=quota.period(), sent=5, reserved=0)])
+        db.flush()
+        msg = Message(workspace_id=ws.id, contact_id=contact.id, status="failed", quota_period="2026-09")
+        db.add(msg)
+        db.commit()
+        quota.refund_messages(db, ws.id, [msg.id])
+        db.commit()
+        sent = dict(db.query(SendUsage.period, SendUsage.sent).filter_by(workspace_id=ws.id).all())
+        assert sent == {"2026-09": 4, quota.period(): 5}
+    finally:
+        db.close()
+
+
 def test_rate_limiter_unit():
     rl = RateLimiter()
     assert rl.allow("ip", 2, now=0.0)[0] is True
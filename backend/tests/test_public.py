@@ -72,6 +72,24 @@ def test_click_redirects_and_records():
     assert len(_events(mid, "click")) == 1
 
 
+def test_compact_click_resolves_through_link_set():
+    from icereach.services.tracking import encode_compact, link_set_id
+
+    _, _, mid = _seed_message()
+    db = SessionLocal()
+    try:
+        set_id = link_set_id(db, ("https://example.com/a", "https://example.com/b"))
+        db.commit()
+    finally:
+        db.close()
+    c = TestClient(app)
+    r = c.get(f"/t/c/{encode_compact(mid, set_id, 1)}", headers={"user-agent": "Mozilla/5.0"},
+              follow_redirects=False)
+    assert r.status_code == 302
+    assert r.headers["location"] == "https://example.com/b"
+    assert [e.url for e in _events(mid, "click")] == ["https://example.com/b"]
+
+
 def test_unsubscribe_get_is_safe_shows_confirmation_only():
     # Opening the link (or a scanner/prefetch GET) must NOT unsubscribe — it only
     # renders the confirmation page. The unsubscribe reflects only on POST.
@@ -1,3 +1,5 @@
+import pytest
+
 from icereach.models import Workspace
 from icereach.services import queue
 
@@ -63,3 +65,532 @@ def test_failing_handler_retries_then_dead_letters(db):
     assert job.status == "failed"
     assert "nope" in (job.error or "")
     assert job.id in dead
+
+
+def test_parent_waits_for_children_and_runs_again_to_fan_in(db):
+    from icereach.models import Job
+
+    ws = _ws(db)
+    runs = []
+
+    @queue.register("fan_parent")
+    def _parent(db, job, progress):
+        runs.append(job.pending_children)
+        if runs == [0]:
+            db.add_all(Job(workspace_id=job.workspace_id, type=t, status="queued", parent_id=job.id, payload={})
+                       for t in ("fan_child", "no_such_handler"))
+            job.pending_children = 2
+            db.commit()
+            return {"planned": 2}
+        return {"fanned_in": True}
+
+    @queue.register("fan_child")
+    def _child(db, job, progress):
+        progress(50)
+
+    parent = queue.enqueue(db, ws.id, "fan_parent", {})
+    queue.run_job(db, queue.claim_next(db))
+    db.refresh(parent)
+    assert parent.status == "waiting" and parent.result == {"planned": 2}
+
+    queue.run_job(db, queue.claim_next(db))  # child done
+    db.refresh(parent)
+    assert parent.status == "waiting" and parent.pending_children == 1 and parent.progress == 50
+
+    queue.run_job(db, queue.claim_next(db))  # child dead-lettered: still counts as finished
+    db.refresh(parent)
+    assert parent.status == "queued" and parent.pending_children == 0
+
+    queue.run_job(db, queue.claim_next(db))
+    db.refresh(parent)
+    assert parent.status == "done" and parent.result == {"fanned_in": True} and len(runs) == 2
+
+
+def test_claims_by_priority_then_fair_share_across_workspaces(db):
+    from datetime import datetime, timedelta
+
+    from icereach.models import Job
+
+    big = _ws(db)
+    small = Workspace(name="S", slug="s-queue")
+    db.add(small)
+    db.commit()
+
+    @queue.register("bulk_job", lane="bulk")
+    def _bulk(db, job, progress):
+        return {}
+
+    @queue.register("reset_email", lane="transactional")
+    def _reset(db, job, progress):
+        return {}
+
+    earlier = datetime.utcnow() - timedelta(minutes=5)
+    for _ in range(3):
+        queue.enqueue(db, big.id, "bulk_job", {}, run_after=earlier)
+    queue.enqueue(db, small.id, "bulk_job", {})
+    urgent = queue.enqueue(db, small.id, "reset_email", {})
+    assert urgent.priority > queue.priority_of("bulk_job")
+
+    assert queue.claim_next(db).id == urgent.id  # most urgent, though newest
+    queue.run_job(db, urgent)
+    first = queue.claim_next(db)
+    assert first.workspace_id == big.id  # nobody running yet: oldest goes first
+    # big now has a job running, so small's newer job is next.
+    assert queue.claim_next(db).workspace_id == small.id
+    assert queue.claim_next(db).workspace_id == big.id
+
+    # Weights scale a workspace's share: at weight 3, big may run 3 per small's 1.
+    big.queue_weight = 3
+    db.commit()
+    queue.enqueue(db, small.id, "bulk_job", {})
+    queue.enqueue(db, big.id, "bulk_job", {})
+    db.query(Job).filter(Job.workspace_id == small.id, Job.status == "running").update({"status": "done"})
+    db.commit()
+    assert queue.claim_next(db).workspace_id == small.id  # 0 running beats big's 3 / 3
+    assert queue.claim_next(db).workspace_id == big.id
+
+
+def test_lane_spec_parsing():
+    assert queue._parse_lanes("transactional:1, interactive:2,bulk") == {"transactional": 1, "interactive": 2, "bulk": 1}
+    with pytest.raises(ValueError):
+        queue._parse_lanes("vip:1")
+
+
+def test_claim_batch_takes_up_to_limit_in_order(db):
+    ws = _ws(db)
+    ids = [queue.enqueue(db, ws.id, "noop", {"n": n}).id for n in range(3)]
+    claimed = queue.claim_batch(db, 2)
+    assert [j.id for j in claimed] == ids[:2] and all(j.status == "running" for j in claimed)
+    assert [j.id for j in queue.claim_batch(db, 5)] == ids[2:]
+    assert queue.claim_batch(db, 5) == []
+
+
+def test_listener_falls_back_to_sleeping_off_postgres(db):
+    listener = queue.Listener()
+    queue.notify(db)  # no-op on SQLite
+    assert listener.wait(0.01) is False
+    listener.close()
+
+
+def test_reaper_requeues_job_whose_lease_expired(db):
+    from datetime import datetime, timedelta
+
+    ws = _ws(db)
+    job = queue.enqueue(db, ws.id, "noop", {})
+    claimed = queue.claim_next(db)
+    assert claimed.leased_until > datetime.utcnow() and claimed.attempts == 1
+    assert queue.reap(db) == 0  # lease still live
+
+    claimed.leased_until = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+    assert queue.reap(db) == 1
+    db.refresh(job)
+    assert job.status == "queued"
+    assert job.leased_until is None
+    assert "Lease expired" in job.error
+
+
+def test_handler_stops_when_its_lease_was_reaped(db):
+    from datetime import datetime, timedelta
+
+    ws = _ws(db)
+    after = []
+
+    @queue.register("slow_job")
+    def _slow(db, job, progress):
+        progress(10)  # heartbeat renews the lease
+        db.execute(queue.update(queue.Job).where(queue.Job.id == job.id)
+                   .values(leased_until=datetime.utcnow() - timedelta(seconds=1)))
+        db.commit()
+        queue.reap(db)  # another worker's reaper takes the job back
+        progress(50)  # raises LeaseLost
+        after.append(True)
+        return {}
+
+    job = queue.enqueue(db, ws.id, "slow_job", {})
+    queue.run_job(db, queue.claim_next(db))
+    db.refresh(job)
+    assert after == []
+    assert job.status == "queued" and job.result is None
+
+
+def test_batched_job_reaped_before_its_turn_is_not_run_twice(db, monkeypatch):
+    import threading
+    from datetime import datetime, timedelta
+
+    from icereach.db import SessionLocal
+
+    ws = _ws(db)
+    ran = []
+
+    @queue.register("batched_job")
+    def _batched(db, job, progress):
+        ran.append(job.id)
+        if len(ran) == 1:
+            # Runs past the lease of the job waiting behind it in the batch,
+            # which is reaped and claimed by another worker meanwhile.
+            db.execute(queue.update(queue.Job).where(queue.Job.status == "running", queue.Job.id != job.id)
+                       .values(leased_until=datetime.utcnow() - timedelta(seconds=1)))
+            db.commit()
+            queue.reap(db)
+            db.execute(queue.update(queue.Job).where(queue.Job.id != job.id).values(run_after=datetime.utcnow()))
+            db.commit()
+            with SessionLocal() as other:
+                assert queue.claim_next(other) is not None
+        return {}
+
+    first, second = (queue.enqueue(db, ws.id, "batched_job", {}) for _ in range(2))
+    queue.run_worker(max_idle_loops=1, poll_interval=0.01, batch=2)
+    assert ran == [first.id]  # the second job is the other worker's now
+    db.refresh(second)
+    assert second.status == "running" and second.attempts == 2
+
+
+
+def test_draining_worker_hands_back_only_the_claims_it_still_holds(db, monkeypatch):
+    import threading
+
+    from icereach.db import SessionLocal
+
+    ws = _ws(db)
+
+    @queue.register("drained_job")
+    def _drained(db, job, progress):
+        return {}
+
+    for _ in range(3):
+        queue.enqueue(db, ws.id, "drained_job", {})
+    ran, reclaimed, unstarted = queue.claim_batch(db, 3)
+    with SessionLocal() as other:  # reaped meanwhile, and claimed again by another worker
+        other.execute(queue.update(queue.Job).where(queue.Job.id == reclaimed.id).values(attempts=2))
+        other.commit()
+    batches = [[ran, reclaimed, unstarted]]
+    monkeypatch.setattr(queue, "claim_batch", lambda *a, **k: batches.pop() if batches else [])
+    stop = threading.Event()
+    queue.run_worker(max_idle_loops=1, poll_interval=0.01, stop=stop, on_job=lambda job: stop.set())
+
+    for job in (ran, reclaimed, unstarted):
+        db.refresh(job)
+    assert ran.status == "done"
+    assert reclaimed.status == "running" and reclaimed.attempts == 2  # left to the worker running it
+    assert unstarted.status == "queued" and unstarted.attempts == 0
+
+
+def test_progress_writes_are_coalesced(db):
+    from icereach.db import SessionLocal
+
+    ws = _ws(db)
+    seen = []
+
+    def stored(job_id):
+        with SessionLocal() as other:
+            job = other.get(queue.Job, job_id)
+            return job.progress, job.message
+
+    @queue.register("chatty_job")
+    def _chatty(db, job, progress):
+        progress(1, "one")
+        seen.append(stored(job.id))  # too small a step to write on its own
+        db.commit()  # ...but the handler's own commit carries it
+        seen.append(stored(job.id))
+        progress(2, "two")
+        progress(9, "nine")  # moved job_progress_step points since the last write
+        seen.append(stored(job.id))
+        return {}
+
+    job = queue.enqueue(db, ws.id, "chatty_job", {})
+    queue.run_job(db, queue.claim_next(db))
+    assert seen == [(0, ""), (1, "one"), (9, "nine")]
+    db.refresh(job)
+    assert job.status == "done" and job.progress == 100
+
+
+def test_async_handler_runs_in_the_sync_worker(db):
+    import asyncio
+
+    ws = _ws(db)
+
+    @queue.register("async_job")
+    async def _async(db, job, progress):
+        await asyncio.sleep(0)
+        return {"async": True}
+
+    job = queue.enqueue(db, ws.id, "async_job", {})
+    queue.run_job(db, queue.claim_next(db))
+    db.refresh(job)
+    assert job.status == "done" and job.result == {"async": True}
+
+
+def test_asyncio_worker_interleaves_async_jobs(db):
+    import asyncio
+
+    from icereach.services import aioworker
+
+    ws = _ws(db)
+    in_flight, peak = [0], [0]
+
+    @queue.register("wait_job")
+    async def _wait(db, job, progress):
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        await asyncio.sleep(0.05)
+        in_flight[0] -= 1
+        if job.payload.get("fail"):
+            raise RuntimeError("flaky")
+        return {}
+
+    @queue.register("sync_job")
+    def _sync(db, job, progress):
+        return {"sync": True}
+
+    jobs = [queue.enqueue(db, ws.id, "wait_job", {}) for _ in range(4)]
+    failing = queue.enqueue(db, ws.id, "wait_job", {"fail": True})
+    plain = queue.enqueue(db, ws.id, "sync_job", {})
+    asyncio.run(aioworker.serve(8, poll_interval=0.01, max_idle_loops=2))
+
+    assert peak[0] > 1  # the waits overlapped
+    for job in jobs + [plain]:
+        db.refresh(job)
+        assert job.status == "done"
+    db.refresh(failing)
+    assert failing.status == "queued" and failing.error == "flaky" and failing.attempts == 1
+
+
+def test_asyncio_worker_runs_idle_ticks_and_leaves_the_transactional_lane_to_its_threads(db, monkeypatch):
+    import asyncio
+
+    from icereach.services import aioworker
+
+    ticks, started = [], []
+
+    def _tick(tick_db):
+        ticks.append(tick_db)
+        raise RuntimeError("mailbox down")  # must not stop the worker
+
+    asyncio.run(aioworker.serve(4, poll_interval=0.01, max_idle_loops=2, on_idle=_tick))
+    assert len(ticks) == 2
+
+    async def _serve(concurrency, **kwargs):
+        started.append(kwargs)
+
+    monkeypatch.setattr(queue, "_start_lanes", lambda: {"transactional": 1})
+    monkeypatch.setattr(queue, "start_reaper", lambda interval: None)
+    monkeypatch.setattr(aioworker, "serve", _serve)
+    aioworker.main()
+    assert started[0]["exclude"] == queue.lane_types("transactional") and callable(started[0]["on_idle"])
+
+
+def test_asyncio_worker_skips_a_job_claimed_again_since(db):
+    import asyncio
+
+    from icereach.db import SessionLocal
+    from icereach.services import aioworker
+
+    ws = _ws(db)
+    ran = []
+
+    @queue.register("async_claimed")
+    async def _async(db, job, progress):
+        ran.append(job.id)
+        return {}
+
+    job = queue.enqueue(db, ws.id, "async_claimed", {})
+    [(job_id, job_type, attempt)] = aioworker._claim(1, None, ())
+    with SessionLocal() as other:  # reaped and claimed again before its task started
+        other.execute(queue.update(queue.Job).where(queue.Job.id == job_id).values(attempts=attempt + 1))
+        other.commit()
+    asyncio.run(aioworker._run(job_id, job_type, attempt))
+    db.refresh(job)
+    assert ran == [] and job.status == "running" and job.attempts == attempt + 1
+
+
+def test_enqueue_children_with_continuation_aggregates_results(db):
+    from icereach.models import Job
+
+    ws = _ws(db)
+    reduced = []
+
+    @queue.register("map_parent")
+    def _map(db, job, progress):
+        queue.enqueue_children(db, job, "map_child", ({"n": n} for n in (1, 2, 3)), then=("map_reduce", {"k": 1}))
+        return {"mapped": 3}
+
+    @queue.register("map_child")
+    def _map_child(db, job, progress):
+        if job.payload["n"] == 3:
+            raise RuntimeError("bad input")
+        return {"total": job.payload["n"] * 10, "label": "x"}
+
+    @queue.register("map_reduce")
+    def _reduce(db, job, progress):
+        reduced.append(queue.child_totals(db, job))
+        return reduced[-1]
+
+    parent = queue.enqueue(db, ws.id, "map_parent", {})
+    queue.run_job(db, queue.claim_next(db))
+    db.refresh(parent)
+    assert parent.status == "done" and parent.result == {"mapped": 3}  # no waiting on its children
+    cont = db.query(Job).filter(Job.type == "map_reduce").one()
+    assert cont.status == "waiting" and cont.pending_children == 3 and cont.payload == {"k": 1}
+
+    for _ in range(2 + queue.MAX_ATTEMPTS):  # the third child dead-letters
+        job = db.query(Job).filter(Job.type == "map_child", Job.status == "queued").first()
+        if job is None:
+            break
+        queue.run_job(db, job)
+    db.refresh(cont)
+    assert cont.status == "queued"
+    queue.run_job(db, queue.claim_next(db))
+    assert reduced == [{"children": 3, "failed_children": 1, "total": 30}]
+
+
+def test_parent_fans_in_even_if_children_finish_before_it_returns(db):
+    ws = _ws(db)
+    runs = []
+
+    @queue.register("eager_parent")
+    def _eager(db, job, progress):
+        runs.append(job.id)
+        if len(runs) == 1:
+            queue.enqueue_children(db, job, "eager_child", [{}])
+            queue.run_job(db, queue.claim_next(db, types=["eager_child"]))  # done before the parent returns
+            return {}
+        return {"fanned_in": queue.child_totals(db, job)["children"]}
+
+    @queue.register("eager_child")
+    def _eager_child(db, job, progress):
+        return {}
+
+    parent = queue.enqueue(db, ws.id, "eager_parent", {})
+    queue.run_job(db, queue.claim_next(db))
+    db.refresh(parent)
+    assert parent.status == "queued"
+    queue.run_job(db, queue.claim_next(db))
+    db.refresh(parent)
+    assert parent.status == "done" and parent.result == {"fanned_in": 1} and len(runs) == 2
+
+
+def test_second_fan_out_keeps_count_of_a_child_finished_in_between(db):
+    from icereach.db import SessionLocal
+
+    ws = _ws(db)
+    runs = []
+
+    @queue.register("twice_parent")
+    def _twice(db, job, progress):
+        runs.append(job.id)
+        if len(runs) == 1:
+            queue.enqueue_children(db, job, "twice_child", [{}])
+            with SessionLocal() as other:  # another worker finishes it; `job` here is now stale
+                queue.run_job(other, queue.claim_next(other, types=["twice_child"]))
+            queue.enqueue_children(db, job, "twice_child", [{}])
+            assert job.pending_children == 1
+            return {}
+        return {"fanned_in": queue.child_totals(db, job)["children"]}
+
+    @queue.register("twice_child")
+    def _twice_child(db, job, progress):
+        return {}
+
+    parent = queue.enqueue(db, ws.id, "twice_parent", {})
+    queue.run_job(db, queue.claim_next(db))
+    db.refresh(parent)
+    assert parent.status == "waiting" and parent.pending_children == 1
+    queue.run_job(db, queue.claim_next(db, types=["twice_child"]))
+    db.refresh(parent)
+    assert parent.status == "queued" and parent.pending_children == 0
+    queue.run_job(db, queue.claim_next(db))
+    db.refresh(parent)
+    assert parent.status == "done" and parent.result == {"fanned_in": 2}
+
+
+@pytest.mark.parametrize("store", ["memory", "sqlite-wal"])
+def test_jobs_can_live_in_a_store_of_their_own(db, tmp_path, store):
+    import time
+
+    from icereach.db import SessionLocal, engine
+    from icereach.models import Job
+
+    ws_id = _ws(db).id
+    new = queue.MemoryQueueBackend() if store == "memory" else queue.SqliteQueueBackend(f"sqlite:///{tmp_path}/q.db")
+    old = queue.use_backend(new)
+    try:
+        @queue.register("stored_job")
+        def _stored(db, job, progress):
+            progress(50, "half")
+            return {"workspace": db.get(Workspace, job.workspace_id).slug}  # app data still reachable
+
+        listener = queue.backend().listener()
+        with SessionLocal() as s:
+            job_id = queue.enqueue(s, ws_id, "stored_job", {}).id
+        t0 = time.monotonic()
+        assert listener.wait(5) and time.monotonic() - t0 < 1  # woken in-process, not by the timeout
+        with engine.connect() as conn:
+            assert conn.execute(queue.text("SELECT count(*) FROM jobs")).scalar() == 0
+
+        with SessionLocal() as s:
+            queue.run_job(s, queue.claim_next(s))
+            job = s.get(Job, job_id)
+            assert job.status == "done" and job.result == {"workspace": "w-queue"}
+    finally:
+        queue.use_backend(old)
+        new.engine.dispose()
+
+
+def test_queue_metrics_aggregate_depth_lag_throughput_and_latency(db):
+    from datetime import datetime, timedelta
+
+    from icereach.services import queue_metrics
+
+    ws = _ws(db)
+
+    @queue.register("metered")
+    def _metered(db, job, progress):
+        if job.payload.get("fail"):
+            raise RuntimeError("boom")
+        return {}
+
+    for _ in range(3):
+        queue.enqueue(db, ws.id, "metered", {})
+    queue.enqueue(db, ws.id, "metered", {"fail": True})
+    for _ in range(4):
+        queue.run_job(db, queue.claim_next(db))  # 3 done, 1 back on the queue to retry
+    late = queue.enqueue(db, ws.id, "metered", {})
+    late.run_after = datetime.utcnow() - timedelta(seconds=90)
+    db.commit()
+    queue.register("held")(lambda db, job, progress: {})
+    queue.begin(db, queue.enqueue(db, ws.id, "held", {}))  # running, still
+
+    snap = queue_metrics.snapshot(db, window=60)
+    metered = snap["types"]["metered"]
+    assert metered["done"] == 3 and metered["failed"] == 0
+    assert metered["queued"] == 2 and metered["due"] == 1 and metered["retrying"] == 1
+    assert 89 <= metered["lag_seconds"] < 120 and snap["lag_seconds"] == metered["lag_seconds"]
+    assert metered["jobs_per_second"] == pytest.approx(3 / 60)
+    run = metered["run_seconds"]
+    assert run["buckets"]["0.1"] == 3 and 0 <= run["p50"] <= run["p99"] <= run["max"] < 0.1
+    assert snap["types"]["held"]["running"] == 1
+    assert snap["workers"] == [{"worker": queue._worker_id(), "running": 1, "expired_leases": 0}]
+
+    text = queue_metrics.prometheus(snap)
+    assert "# TYPE icereach_queue_lag_seconds gauge" in text
+    assert 'icereach_queue_depth{type="metered",priority="50"} 1' in text
+    assert 'icereach_jobs_finished{type="metered",status="done"} 3' in text
+    assert 'icereach_job_run_seconds{type="metered",quantile="0.99"}' in text
+
+
+def test_queue_metrics_endpoints_need_the_metrics_token(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from icereach.config import settings
+    from icereach.main import app
+
+    c = TestClient(app)
+    assert c.get("/api/queue/metrics").status_code == 404  # no token configured: disabled
+    monkeypatch.setattr(settings, "queue_metrics_token", "s3cret")
+    assert c.get("/api/queue/metrics", headers={"Authorization": "Bearer nope"}).status_code == 401
+    r = c.get("/api/queue/metrics", headers={"Authorization": "Bearer s3cret"})
+    assert r.status_code == 200 and r.json()["window_seconds"] == 300
+    r = c.get("/api/queue/metrics/prometheus?window=60", headers={"Authorization": "Bearer s3cret"})
+    assert r.status_code == 200 and r.headers["content-type"].startswith("text/plain")
+    assert "icereach_jobs_per_second" in r.text
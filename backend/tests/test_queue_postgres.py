@@ -0,0 +1,101 @@
+"""The Postgres-only queue paths: SKIP LOCKED claims and LISTEN/NOTIFY wake-ups.
+
+Skipped unless ICEREACH_TEST_POSTGRES_URL points at a throwaway database
+(its ``jobs`` table is created and dropped here), e.g.::
+
+    ICEREACH_TEST_POSTGRES_URL=postgresql+psycopg://u:p@localhost/icereach_test pytest -m postgres
+"""
+
+import os
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine, select
+
+from icereach.db import SessionLocal
+from icereach.models import Job
+from icereach.services import queue
+
+PG_URL = os.environ.get("ICEREACH_TEST_POSTGRES_URL", "")
+
+pytestmark = [
+    pytest.mark.postgres,
+    pytest.mark.skipif(not PG_URL, reason="ICEREACH_TEST_POSTGRES_URL not set"),
+]
+
+
+@pytest.fixture
+def pg():
+    """Jobs on Postgres for the test (the rest of the app stays on SQLite)."""
+    bind = create_engine(PG_URL, pool_pre_ping=True)
+    Job.__table__.drop(bind, checkfirst=True)
+    Job.__table__.create(bind)
+    old = queue.use_backend(queue.QueueBackend(bind))
+    try:
+        assert queue.backend().skip_locked
+        yield bind
+    finally:
+        queue.use_backend(old)
+        Job.__table__.drop(bind, checkfirst=True)
+        bind.dispose()
+
+
+def _enqueue(n: int) -> list[int]:
+    with SessionLocal() as s:
+        s.add_all(Job(workspace_id=1, type="pg_job", status="queued", priority=0) for _ in range(n))
+        s.commit()
+        return list(s.scalars(select(Job.id).order_by(Job.id)))
+
+
+def test_concurrent_workers_claim_every_job_exactly_once(pg):
+    ids = _enqueue(60)
+    claims: list[list[int]] = [[] for _ in range(4)]
+    go = threading.Barrier(len(claims))
+
+    def worker(mine: list[int]) -> None:
+        go.wait()
+        with SessionLocal() as s:
+            while jobs := queue.claim_batch(s, 5):
+                mine += [j.id for j in jobs]
+
+    threads = [threading.Thread(target=worker, args=(c,)) for c in claims]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=30)
+
+    claimed = [i for c in claims for i in c]
+    assert sorted(claimed) == ids  # none lost, none claimed twice
+    with SessionLocal() as s:
+        assert set(s.scalars(select(Job.status))) == {"running"}
+
+
+def test_claim_skips_rows_locked_by_another_claim(pg):
+    first, *rest = _enqueue(3)
+    with SessionLocal() as holder, SessionLocal() as s:
+        # A claim in flight elsewhere: its row is locked until that transaction ends.
+        holder.scalars(select(Job).where(Job.id == first).with_for_update()).one()
+        t0 = time.monotonic()
+        jobs = queue.claim_batch(s, 5)
+        assert time.monotonic() - t0 < 5  # skipped the locked row rather than waiting on it
+        assert sorted(j.id for j in jobs) == rest
+        holder.rollback()
+        assert [j.id for j in queue.claim_batch(s, 5)] == [first]
+
+
+def test_notify_wakes_an_idle_listener(pg):
+    def enqueue_later() -> None:
+        with SessionLocal() as s:
+            queue.enqueue(s, 1, "pg_job", {})
+
+    listener = queue.backend().listener()
+    try:
+        assert listener.wait(0.05) is False  # LISTENing now; nothing pending
+        t0 = time.monotonic()
+        threading.Timer(0.2, enqueue_later).start()
+        assert listener.wait(10) is True
+        assert time.monotonic() - t0 < 5  # woken by the NOTIFY, not the timeout
+        assert listener.wait(0.05) is False  # drained
+    finally:
+        listener.close()
@@ -0,0 +1,45 @@
+"""Compiled render plans must match the classic render + rewrite_html pipeline."""
+
+import pytest
+
+from icereach.services import render_plan
+from icereach.services.merge import html_to_text, render
+from icereach.services.tracking import rewrite_html
+
+ROW = {"name": "Ada", "email": "ada@x.com", "code": "A&B"}
+
+
+@pytest.mark.parametrize("subject, html, text", [
+    ("Hi {name}", "<p>Hello {name} <a href='https://acme.com/?u={email}'>shop</a></p>", ""),
+    ("{missing} deal", '<a href="mailto:{email}">mail</a><a href="#top">top</a><A HREF="https://x.io">x</A>', "t {code}"),
+    ("no tags", "<p>plain</p>", ""),
+    ("", '<a href="{link}">dyn</a> {name}{name}', "{name}"),
+])
+def test_plan_matches_classic_pipeline(subject, html, text):
+    plan = render_plan.get_plan(subject, html, text)
+    for row in (ROW, {**ROW, "link": "https://y.io/{name}"}, {**ROW, "link": "tel:123"}, {}):
+        assert plan.render(row, 77) == (
+            render(subject, row),
+            rewrite_html(render(html, row), 77),
+            render(text or html_to_text(html), row),
+        )
+
+
+def test_plans_are_cached_by_content():
+    a = render_plan.get_plan("S", "<p>x</p>")
+    assert render_plan.get_plan("S", "<p>x</p>") is a
+    assert render_plan.get_plan("S", "<p>x</p>", "x") is not a
+
+
+def test_compact_render_indexes_static_links():
+    from icereach.services.tracking import decode_token
+
+    plan = render_plan.get_plan("S", '<a href="https://a.io">a</a><a href="{u}">b</a><a href="mailto:x@y">m</a>')
+    assert plan.links == ("https://a.io",)
+    _, html, _ = plan.render({"u": "https://b.io/{name}"}, 5, link_set=11)
+    tokens = [t.split('"')[0].split(".png")[0] for t in html.split("/t/")[1:]]
+    decoded = [decode_token(t[2:]) for t in tokens]
+    assert decoded[0] == {"message_id": 5, "url": "", "link_set": 11, "link_index": 0}
+    assert decoded[1] == {"message_id": 5, "url": "https://b.io/{name}"}  # merge-dependent: signed per recipient
+    assert decoded[2] == {"message_id": 5, "url": ""}  # open pixel
+    assert 'href="mailto:x@y"' in html
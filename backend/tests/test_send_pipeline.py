@@ -1,3 +1,5 @@
+from datetime import datetime, timedelta
+
 import pytest
 
 from icereach.db import SessionLocal
@@ -9,21 +11,24 @@ from icereach.models import (
     ListMembership,
     Job,
     Message,
+    SendUsage,
     SendingDomain,
     Suppression,
     Workspace,
 )
-from icereach.services import esp, sender
+from icereach.services import esp, queue, sender
 
 
 class FakeSmtp:
     sent: list = []
+    down = False  # relay unreachable
 
     def __init__(self, *a, **k):
         pass
 
     def connect(self):
-        pass
+        if FakeSmtp.down:
+            raise OSError("relay down")
 
     def send(self, frm, to, msg):
         FakeSmtp.sent.append((frm, to, msg))
@@ -35,6 +40,7 @@ class FakeSmtp:
 @pytest.fixture(autouse=True)
 def _stub_smtp(monkeypatch):
     FakeSmtp.sent = []
+    FakeSmtp.down = False
     monkeypatch.setattr(esp, "SmtpSession", FakeSmtp)
 
 
@@ -86,7 +92,7 @@ def test_send_creates_messages_with_tracking():
         msgs = db.query(Message).filter(Message.campaign_id == cid).all()
         assert len(msgs) == 2 and all(m.status == "sent" for m in msgs)
         # tracking + unsubscribe injected
-        wire = FakeSmtp.sent[0][2].as_string()
+        wire = FakeSmtp.sent[0][2].decode()
         assert "/t/o/" in wire  # open pixel
         assert "/t/c/" in wire  # click rewrite
         assert "List-Unsubscribe" in wire  # native one-click header
@@ -120,3 +126,308 @@ def test_send_skips_suppressed():
         assert result["skipped"] >= 1
     finally:
         db.close()
+
+
+def test_recipients_stream_in_keyset_pages():
+    db = SessionLocal()
+    try:
+        emails = [f"r{i}@x.com" for i in range(7)]
+        ws_id, cid, contacts = _seed(db, emails)
+        contacts[3].status = "unsubscribed"
+        db.commit()
+        camp = db.get(Campaign, cid)
+        pages = list(sender.iter_recipients(db, camp, page_size=3))
+        assert [len(p) for p in pages] == [3, 3]
+        ids = [r.id for p in pages for r in p]
+        assert ids == sorted(ids) and contacts[3].id not in ids
+        assert isinstance(pages[0][0], sender.Recipient)
+        assert sender.count_recipients(db, camp) == 6
+    finally:
+        db.close()
+
+
+def test_segment_audience_filters_status_in_sql():
+    from icereach.models import Segment
+
+    db = SessionLocal()
+    try:
+        ws_id, cid, contacts = _seed(db, ("a@x.com", "b@x.com", "c@y.com"))
+        contacts[1].status = "cleaned"
+        seg = Segment(workspace_id=ws_id, name="x.com", rules={"field": "email", "op": "contains", "value": "x.com"})
+        db.add(seg)
+        db.flush()
+        camp = db.get(Campaign, cid)
+        camp.list_id = None
+        camp.segment_id = seg.id
+        db.commit()
+        result = _run(db, ws_id, cid)
+        assert result == {"sent": 1, "skipped": 0, "recipients": 1}
+        assert [to for _, to, _ in FakeSmtp.sent] == ["a@x.com"]
+    finally:
+        db.close()
+
+
+def test_pending_audience_excludes_messaged_and_suppressed():
+    db = SessionLocal()
+    try:
+        ws_id, cid, contacts = _seed(db, ("a@x.com", "b@x.com", "c@x.com"))
+        db.add(Suppression(workspace_id=ws_id, email="b@x.com", reason="manual"))
+        db.add(Message(workspace_id=ws_id, campaign_id=cid, contact_id=contacts[0].id, status="sent"))
+        db.commit()
+        camp = db.get(Campaign, cid)
+        pending = [r.email for p in sender.iter_recipients(db, camp, pending=True) for r in p]
+        assert pending == ["c@x.com"]
+        assert sender.count_recipients(db, camp, pending=True) == 1
+        result = _run(db, ws_id, cid)
+        assert result == {"sent": 1, "skipped": 2, "recipients": 3}
+    finally:
+        db.close()
+
+
+def test_batched_send_reuses_interrupted_reservations(monkeypatch):
+    from icereach.config import settings
+
+    monkeypatch.setattr(settings, "send_batch_size", 2)
+    monkeypatch.setattr(settings, "send_commit_interval", 2)
+    db = SessionLocal()
+    try:
+        ws_id, cid, contacts = _seed(db, ("a@x.com", "b@x.com", "c@x.com"))
+        variant_id = db.query(CampaignVariant).filter_by(campaign_id=cid).one().id
+        # A reservation left 'queued' by a crashed attempt is still owed a send.
+        stale = Message(workspace_id=ws_id, campaign_id=cid, contact_id=contacts[1].id,
+                        variant_id=variant_id, status="queued")
+        db.add(stale)
+        db.commit()
+        result = _run(db, ws_id, cid)
+        assert result == {"sent": 3, "skipped": 0, "recipients": 3}
+        msgs = db.query(Message).filter(Message.campaign_id == cid).all()
+        assert len(msgs) == 3 and all(m.status == "sent" and m.sent_at for m in msgs)
+        db.refresh(stale)
+        assert stale.status == "sent"
+        assert sorted(to for _, to, _ in FakeSmtp.sent) == ["a@x.com", "b@x.com", "c@x.com"]
+    finally:
+        db.close()
+
+
+def _drain(db):
+    from icereach.services import queue
+
+    while (job := queue.claim_next(db)) is not None:
+        queue.run_job(db, job)
+
+
+def test_large_campaign_fans_out_into_chunk_jobs(monkeypatch):
+    from icereach.config import settings
+    from icereach.services import queue
+
+    monkeypatch.setattr(settings, "send_chunk_size", 2)
+    db = SessionLocal()
+    try:
+        ws_id, cid, contacts = _seed(db, [f"r{i}@x.com" for i in range(5)])
+        db.add(Suppression(workspace_id=ws_id, email="r1@x.com", reason="manual"))
+        db.commit()
+        parent = queue.enqueue(db, ws_id, "send_campaign", {"campaign_id": cid})
+
+        queue.run_job(db, queue.claim_next(db))  # plan
+        db.refresh(parent)
+        assert parent.status == "waiting" and parent.pending_children == 2
+        chunks = db.query(Job).filter(Job.parent_id == parent.id).order_by(Job.id).all()
+        assert [(c.payload["first_id"], c.payload["last_id"], c.payload["recipients"]) for c in chunks] == [
+            (contacts[0].id, contacts[2].id, 2), (contacts[3].id, contacts[4].id, 2),
+        ]
+
+        _drain(db)  # both chunks, then the fan-in
+        db.refresh(parent)
+        assert parent.status == "done" and parent.progress == 100
+        assert parent.result == {"sent": 4, "skipped": 1, "recipients": 5, "chunks": 2, "failed_chunks": 0}
+        assert db.get(Campaign, cid).status == "sent"
+        assert sorted(to for _, to, _ in FakeSmtp.sent) == ["r0@x.com", "r2@x.com", "r3@x.com", "r4@x.com"]
+    finally:
+        db.close()
+
+
+def test_failed_chunk_retries_on_its_own(monkeypatch):
+    from icereach.config import settings
+    from icereach.services import queue
+
+    monkeypatch.setattr(settings, "send_chunk_size", 2)
+    db = SessionLocal()
+    try:
+        ws_id, cid, _ = _seed(db, [f"r{i}@x.com" for i in range(4)])
+        parent = queue.enqueue(db, ws_id, "send_campaign", {"campaign_id": cid})
+        queue.run_job(db, queue.claim_next(db))
+
+        FakeSmtp.down = True
+        queue.run_job(db, queue.claim_next(db))  # first chunk fails, is re-queued with backoff
+        FakeSmtp.down = False
+        chunks = db.query(Job).filter(Job.parent_id == parent.id).order_by(Job.id).all()
+        assert [c.status for c in chunks] == ["queued", "queued"]
+        assert db.get(Campaign, cid).status == "sending"  # one chunk failing doesn't fail the campaign
+
+        db.query(Job).filter(Job.id == chunks[0].id).update({"run_after": chunks[1].run_after})
+        db.commit()
+        _drain(db)
+        db.refresh(parent)
+        assert parent.status == "done" and parent.result["sent"] == 4
+        assert chunks[0].attempts == 2 and chunks[1].attempts == 1
+    finally:
+        db.close()
+
+
+def test_chunks_draw_on_monthly_quota_in_blocks(monkeypatch):
+    from icereach.config import settings
+    from icereach.services import quota
+
+    monkeypatch.setattr(settings, "send_chunk_size", 2)
+    monkeypatch.setattr(settings, "send_quota_block", 2)
+    db = SessionLocal()
+    try:
+        ws_id, cid, _ = _seed(db, [f"r{i}@x.com" for i in range(5)])
+        ws = db.get(Workspace, ws_id)
+        ws.monthly_send_limit = 3
+        db.commit()
+        parent = queue.enqueue(db, ws_id, "send_campaign", {"campaign_id": cid})
+        _drain(db)
+        db.refresh(parent)
+        assert parent.result["sent"] == 3 and parent.result["skipped"] == 2
+        assert len(FakeSmtp.sent) == 3
+        usage = db.query(SendUsage).filter(SendUsage.workspace_id == ws_id).one()
+        assert (usage.sent, usage.reserved) == (3, 0)  # unused allowance went back
+        assert quota.sent_this_month(db, ws_id) == 3 and quota.remaining(db, ws) == 0
+    finally:
+        db.close()
+
+
+def test_throttled_recipient_is_deferred_then_retried(monkeypatch):
+    import smtplib
+
+    from icereach.services import queue
+
+    refuse = {"b@x.com"}
+
+    def send(self, frm, to, msg):
+        if to in refuse:
+            refuse.discard(to)
+            raise smtplib.SMTPRecipientsRefused({to: (450, b"4.2.1 try again later")})
+        FakeSmtp.sent.append((frm, to, msg))
+
+    monkeypatch.setattr(FakeSmtp, "send", send)
+    db = SessionLocal()
+    try:
+        ws_id, cid, contacts = _seed(db)
+        result = _run(db, ws_id, cid)
+        assert result["sent"] == 1
+        assert db.get(Campaign, cid).status == "sent"
+        deferred = db.query(Message).filter(Message.campaign_id == cid, Message.status == "deferred").one()
+        assert "450" in deferred.error
+        assert deferred.attempts == 1
+        assert (deferred.next_attempt_at - datetime.utcnow()).total_seconds() > 60  # backed off
+
+        retry = db.query(Job).filter(Job.type == "retry_deferred").one()
+        assert retry.workspace_id == ws_id and retry.run_after == deferred.next_attempt_at
+        retry.run_after = deferred.next_attempt_at = datetime.utcnow()
+        db.commit()
+        _drain(db)
+        db.refresh(deferred)
+        assert deferred.status == "sent" and deferred.attempts == 2 and deferred.next_attempt_at is None
+        assert sorted(to for _, to, _ in FakeSmtp.sent) == ["a@x.com", "b@x.com"]
+        assert db.query(Job).filter(Job.type == "retry_deferred").count() == 1  # nothing left to retry
+    finally:
+        db.close()
+
+
+def test_retry_only_redrives_due_deferred_messages():
+    db = SessionLocal()
+    try:
+        ws_id, cid, _ = _seed(db, ("a@x.com", "b@x.com", "c@x.com"))
+        _run(db, ws_id, cid)
+        msgs = db.query(Message).filter(Message.campaign_id == cid).order_by(Message.id).all()
+        now = datetime.utcnow()
+        msgs[1].status, msgs[1].attempts, msgs[1].next_attempt_at = "deferred", 1, now
+        msgs[2].status, msgs[2].attempts, msgs[2].next_attempt_at = "deferred", 1, now + timedelta(hours=1)
+        db.commit()
+        FakeSmtp.sent.clear()
+
+        job = queue.enqueue(db, ws_id, "retry_deferred", {})
+        queue.run_job(db, queue.claim_next(db))
+        db.refresh(job)
+        assert job.result == {"sent": 1, "deferred": 0, "postponed": 0, "campaigns": 1}
+        assert [to for _, to, _ in FakeSmtp.sent] == ["b@x.com"]
+        db.refresh(msgs[2])
+        assert msgs[2].status == "deferred"
+        # The job re-schedules itself for the message still waiting.
+        nxt = db.query(Job).filter(Job.type == "retry_deferred", Job.status == "queued").one()
+        assert nxt.run_after == msgs[2].next_attempt_at
+    finally:
+        db.close()
+
+
+def test_saturated_provider_group_postpones_without_using_up_attempts(monkeypatch):
+    from icereach.config import settings
+    from icereach.models import SendUsage
+
+    monkeypatch.setattr(settings, "send_rate_per_mx", 1.0)
+    monkeypatch.setattr(settings, "send_defer_max_wait", 0.0)
+    monkeypatch.setattr(settings, "send_retry_attempts", 1)
+    db = SessionLocal()
+    try:
+        ws_id, cid, _ = _seed(db, ("a@x.com", "b@x.com", "c@y.com"))
+        result = _run(db, ws_id, cid)
+        # One token per provider group: x.com's second recipient waits for a retry.
+        assert result["sent"] == 2
+        assert [to for _, to, _ in FakeSmtp.sent] == ["a@x.com", "c@y.com"]
+        postponed = db.query(Message).filter(Message.status == "deferred").one()
+        assert postponed.attempts == 0 and "rate limited" in postponed.error
+        assert (postponed.next_attempt_at - datetime.utcnow()).total_seconds() < 60  # not backed off
+        assert db.query(SendUsage).filter(SendUsage.workspace_id == ws_id).one().sent == 2  # not charged
+
+        def retry_pass() -> dict:
+            db.query(Message).filter(Message.status == "deferred").update({"next_attempt_at": datetime.utcnow()})
+            job = Job(workspace_id=ws_id, type="retry_deferred", status="running", payload={})
+            db.add(job)
+            db.commit()
+            return sender.retry_deferred(db, job, lambda *a, **k: None)
+
+        monkeypatch.setattr(settings, "send_rate_per_mx", 0.001)
+        for _ in range(settings.send_retry_attempts + 2):  # still saturated, pass after pass
+            sender.governor.reset()
+            sender.governor.reserve(0, "x.com")
+            assert retry_pass()["postponed"] == 1
+            db.refresh(postponed)
+            assert postponed.status == "deferred" and postponed.attempts == 0
+        usage = db.query(SendUsage).filter(SendUsage.workspace_id == ws_id).one()
+        assert (usage.sent, usage.reserved) == (2, 0)
+
+        monkeypatch.setattr(settings, "send_rate_per_mx", 1.0)
+        sender.governor.reset()
+        assert retry_pass()["sent"] == 1
+        db.refresh(postponed)
+        db.refresh(usage)
+        assert postponed.status == "sent" and postponed.attempts == 1
+        assert (usage.sent, usage.reserved) == (3, 0)  # charged once it went out
+    finally:
+        db.close()
+
+
+def test_paced_group_does_not_hold_up_other_groups(monkeypatch):
+    import time
+
+    from icereach.config import settings
+
+    monkeypatch.setattr(settings, "send_rate_per_mx", 2.0)  # a burst of 2, then one every 0.5s
+    at = {}
+
+    def send(self, frm, to, msg):
+        at[to] = time.monotonic()
+        FakeSmtp.sent.append((frm, to, msg))
+
+    monkeypatch.setattr(FakeSmtp, "send", send)
+    db = SessionLocal()
+    try:
+        ws_id, cid, _ = _seed(db, ("a@x.com", "b@x.com", "c@x.com", "d@y.com", "e@y.com"))
+        assert _run(db, ws_id, cid)["sent"] == 5
+        # c@x.com waits for x.com's next slot; y.com's recipients, listed after it, don't.
+        assert max(at["d@y.com"], at["e@y.com"]) < at["c@x.com"]
+        assert at["c@x.com"] - at["a@x.com"] >= 0.4
+    finally:
+        db.close()
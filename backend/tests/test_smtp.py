@@ -6,12 +6,13 @@ connection.
 """
 
 import smtplib
+from email import policy
 
 import pytest
 
 from icereach.services import smtp as smtp_mod
 from icereach.services.dkim import generate_keypair
-from icereach.services.smtp import SmtpSession, build_message, dkim_sign_message
+from icereach.services.smtp import SmtpSession, WireTemplate, build_message, dkim_sign_message
 
 
 class FakeSMTP:
@@ -126,6 +127,7 @@ def test_send_reconnects_when_noop_probe_fails():
     assert len(FakeSMTP.instances) == 1
 
     FakeSMTP.fail_noop_once = True
+    session.last_activity -= session.idle_probe  # idle long enough to be probed
     session.send("user@example.com", "b@example.org", "msg-b")
 
     assert len(FakeSMTP.instances) == 2
@@ -149,6 +151,81 @@ def test_tls_relaxed_only_when_opted_out():
     assert ctx.verify_mode == _ssl.CERT_NONE
 
 
+def test_busy_connection_skips_noop_probe(monkeypatch):
+    """Back-to-back sends don't pay a NOOP round trip; an idle gap does."""
+    probes = []
+    monkeypatch.setattr(FakeSMTP, "noop", lambda self: probes.append(1) or (250, b"ok"))
+    session = _session()
+    for rcpt in ("a@example.org", "b@example.org", "c@example.org"):
+        session.send("user@example.com", rcpt, "msg")
+    assert probes == []
+
+    session.last_activity -= session.idle_probe
+    session.send("user@example.com", "d@example.org", "msg")
+    assert probes == [1]
+
+
+class PipeliningSMTP(smtplib.SMTP):
+    """A real ``smtplib.SMTP`` with the socket replaced by a write log and
+    scripted replies, advertising PIPELINING and SIZE."""
+
+    def __init__(self, replies):
+        super().__init__()
+        self.does_esmtp = True
+        self.esmtp_features = {"pipelining": "", "size": "10240000"}
+        self.writes = []
+        self.replies = list(replies)
+
+    def send(self, s):
+        self.writes.append(s)
+
+    def getreply(self):
+        return self.replies.pop(0)
+
+
+def test_pipelined_send_batches_envelope_commands():
+    client = PipeliningSMTP([(250, b"ok"), (250, b"ok"), (354, b"go"), (250, b"queued")])
+    refused = SmtpSession._pipelined(client, "from@example.com", "to@example.org", b"Subject: x\r\n\r\n.dot\r\n")
+    assert refused == {}
+    # Envelope in one write, body (dot-stuffed, terminated) in the second.
+    assert client.writes == [
+        "MAIL FROM:<from@example.com> SIZE=20\r\nRCPT TO:<to@example.org>\r\nDATA\r\n",
+        b"Subject: x\r\n\r\n..dot\r\n.\r\n",
+    ]
+    assert client.replies == []
+
+
+def test_pipelined_send_normalizes_line_ends_of_a_str_message():
+    client = PipeliningSMTP([(250, b"ok"), (250, b"ok"), (354, b"go"), (250, b"queued")])
+    SmtpSession._pipelined(client, "from@example.com", "to@example.org", "Subject: x\n\n.dot\rend\r\n..two")
+    assert client.writes[1] == b"Subject: x\r\n\r\n..dot\r\nend\r\n...two\r\n.\r\n"
+
+
+def test_pipelined_send_raises_like_sendmail():
+    client = PipeliningSMTP([(250, b"ok"), (550, b"no such user"), (554, b"no valid recipients"), (250, b"reset")])
+    client.rset = lambda: client.getreply()
+    with pytest.raises(smtplib.SMTPRecipientsRefused) as exc:
+        SmtpSession._pipelined(client, "from@example.com", "bad@example.org", b"x")
+    assert exc.value.recipients == {"bad@example.org": (550, b"no such user")}
+    assert len(client.writes) == 1 and client.replies == []  # no body sent, RSET read
+
+
+def test_session_pipelines_when_advertised(monkeypatch):
+    clients = []
+
+    def factory(host, port, timeout=None):
+        client = PipeliningSMTP([(250, b"ok"), (250, b"ok"), (354, b"go"), (250, b"queued")])
+        client.starttls = lambda context=None: (220, b"ready")
+        client.login = lambda user, password: (235, b"ok")
+        client.sendmail = lambda *a: pytest.fail("sendmail used despite PIPELINING")
+        clients.append(client)
+        return client
+
+    monkeypatch.setattr(smtp_mod.smtplib, "SMTP", factory)
+    _session().send("from@example.com", "to@example.org", b"Subject: x\r\n\r\nhi\r\n")
+    assert len(clients[0].writes) == 2
+
+
 def test_build_message_is_multipart_with_both_parts():
     """build_message yields multipart/alternative with text + html parts."""
     msg = build_message(
@@ -271,3 +348,59 @@ def test_send_accepts_email_message_object():
     sent_payload = conn.sent[0][2]
     assert isinstance(sent_payload, bytes)
     assert b"Subject: Hello" in sent_payload
+
+
+def _classic_bytes(tpl, wire, message_id, *args, **kwargs):
+    """build_message output with the fast build's Date / Message-ID / boundary."""
+    msg = build_message(*args, **kwargs)
+    date = next(line for line in wire.split(b"\r\n") if line.startswith(b"Date: "))[6:]
+    msg.replace_header("Date", date.decode())
+    msg.replace_header("Message-ID", message_id)
+    msg.set_boundary(tpl.boundary)
+    return msg.as_bytes(policy=policy.SMTP)
+
+
+@pytest.mark.parametrize(
+    "from_name,to_email,subject,html,text",
+    [
+        ("Sender", "rcpt@example.org", "Hello", "<p>Hi</p>", "Hi"),
+        ("Séñor", "Ünï <u@example.org>", "Grüße ✓", "<p>Grüße, Ada</p>", "Grüße\nAda"),
+        ('Acme, "Inc"', "rcpt@example.org", "A subject long enough that the header has to be folded over several lines",
+         "<p>" + "x" * 200 + "</p>", "word " * 300),
+        ("Sender", "rcpt@example.org", "=?utf-8?q?lookalike?=", "<p>" + "é" * 120 + "</p>\n" * 20, "é" * 90),
+    ],
+)
+def test_wire_template_matches_build_message(from_name, to_email, subject, html, text):
+    """The fast path is byte-identical to build_message serialized with policy.SMTP."""
+    tpl = WireTemplate(from_name, "sender@example.com")
+    for unsub, extra in [(None, None), ("https://app.example.com/u/abc", {"Reply-To": "Ré <r@example.com>"})]:
+        wire, message_id = tpl.build(to_email, subject, html, text, list_unsub_url=unsub, extra_headers=extra)
+        assert wire == _classic_bytes(
+            tpl, wire, message_id, from_name, "sender@example.com", to_email, subject, html, text,
+            list_unsub_url=unsub, extra_headers=extra,
+        )
+
+
+def test_wire_template_avoids_boundary_in_body():
+    tpl = WireTemplate("Sender", "sender@example.com", boundary="collide")
+    wire, _ = tpl.build("rcpt@example.org", "Hi", "<p>--collide</p>", "--collide")
+    assert b'boundary="collide"' not in wire
+    assert wire.count(b"--collide") == 2  # only the two bodies
+
+
+def test_wire_template_rejects_header_injection():
+    with pytest.raises(ValueError):
+        WireTemplate("Sender", "sender@example.com").build("rcpt@example.org", "Hi\r\nBcc: x@y.z", "<p>Hi</p>", "Hi")
+
+
+def test_wire_template_output_dkim_verifies():
+    import dkim
+
+    from icereach.services.dkim import get_signer
+
+    private_pem, dns_txt = generate_keypair()
+    wire, _ = WireTemplate("Séñor", "sender@example.com").build(
+        "rcpt@example.org", "Grüße", "<p>" + "é" * 120 + "</p>", "Hi", list_unsub_url="https://app.example.com/u/abc",
+    )
+    signed = get_signer().sign(wire, "example.com", "ir1", private_pem)
+    assert dkim.verify(signed, dnsfunc=lambda name, timeout=5: dns_txt.encode("ascii"))
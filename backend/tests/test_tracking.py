@@ -97,3 +97,36 @@ def test_is_bot_false_for_normal_browser():
 
 def test_is_bot_false_for_empty_user_agent():
     assert tracking.is_bot("") is False
+
+
+def test_compact_token_round_trip():
+    token = tracking.encode_compact(42, 7, 3)
+    assert len(token) == 30 and "." not in token
+    assert tracking.decode_token(token) == {"message_id": 42, "url": "", "link_set": 7, "link_index": 3}
+    assert tracking.decode_token(tracking.encode_compact(9)) == {"message_id": 9, "url": ""}
+
+
+def test_tampered_compact_token_raises_value_error():
+    token = tracking.encode_compact(42, 7, 3)
+    tampered = ("B" if token[0] != "B" else "C") + token[1:]
+    with pytest.raises(ValueError):
+        tracking.decode_token(tampered)
+
+
+def test_link_sets_are_content_addressed(db):
+    urls = ("https://a.example/", "https://b.example/")
+    first = tracking.link_set_id(db, urls)
+    assert tracking.link_set_id(db, urls) == first
+    assert tracking.link_set_id(db, ()) == 0
+    assert tracking.resolve_link(db, first, 1) == "https://b.example/"
+    with pytest.raises(ValueError):
+        tracking.resolve_link(db, first, 2)
+
+
+def test_link_cache_evicts_the_least_recently_resolved_set(db, monkeypatch):
+    monkeypatch.setattr(tracking, "_LINK_CACHE_SIZE", 2)
+    hot, cold, new = (tracking.link_set_id(db, (f"https://{n}.example/",)) for n in ("hot", "cold", "new"))
+    db.commit()
+    for link_set in (hot, cold, hot, new):
+        tracking.resolve_link(db, link_set, 0)
+    assert list(tracking._link_cache) == [hot, new]
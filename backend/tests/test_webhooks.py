@@ -60,6 +60,16 @@ def test_sendgrid_bounce_marks_and_suppresses():
         db.close()
 
 
+def test_sendgrid_batched_event_maps_by_custom_arg():
+    _, _, mid = _seed("ref-abc", "r@x.com")
+    c = TestClient(app)
+    r = c.post("/webhooks/sendgrid", json=[
+        {"event": "delivered", "email": "r@x.com", "sg_message_id": "shared.filter.0", "icereach_id": "ref-abc"},
+    ])
+    assert r.json()["received"] == 1
+    assert _events(mid, "delivered") == 1
+
+
 def test_email_only_event_does_not_cross_tenant_suppress():
     # A forged event with NO provider message id must not suppress anyone
     # (the workspace-unscoped email fallback was removed).
@@ -84,3 +84,64 @@ def test_worker_creates_schema_when_missing(tmp_path):
     )
     assert r.returncode == 0, f"stdout:\n{r.stdout}\nstderr:\n{r.stderr}"
     assert "no such table" not in (r.stdout + r.stderr).lower(), r.stderr
+
+
+def test_worker_pools_give_each_type_one_pool():
+    from icereach.services import queue, supervisor
+
+    queue.load_handlers()
+    pools = {p.name: p for p in supervisor.parse_pools("bulk:4,import_contacts:1,transactional:1x8,*:2")}
+    assert "import_contacts" not in pools["bulk"].types
+    assert "send_campaign" in pools["bulk"].types
+    assert pools["import_contacts"].types == ("import_contacts",)
+    assert (pools["transactional"].processes, pools["transactional"].threads) == (1, 8)
+    assert pools["*"].types is None
+    assert {"import_contacts", "send_campaign", "send_transactional"} <= set(pools["*"].exclude)
+    assert "advance_automations" not in pools["*"].exclude
+
+
+def test_supervisor_runs_jobs_recycles_and_drains(tmp_path):
+    db_file = (tmp_path / "supervised.db").as_posix()
+    script = textwrap.dedent(
+        f"""
+        import os, signal, threading, time
+        os.environ["DATABASE_URL"] = "sqlite:///{db_file}"
+        os.environ["SECRET_KEY"] = "x"
+        os.environ["WORKER_POOLS"] = "*:1"
+        os.environ["WORKER_RECYCLE_JOBS"] = "1"
+
+        from icereach.db import Base, engine, SessionLocal
+        import icereach.models  # noqa: F401  (populate metadata)
+        Base.metadata.create_all(engine)
+
+        from icereach.models import Job
+        from icereach.services.queue import enqueue
+        with SessionLocal() as s:
+            jid = enqueue(s, 1, "advance_automations", {{}}).id
+
+        def stop_when_done():
+            deadline = time.monotonic() + 45
+            while time.monotonic() < deadline:
+                with SessionLocal() as s:
+                    if s.get(Job, jid).status == "done":
+                        break
+                time.sleep(0.1)
+            time.sleep(1)  # let the recycled child be restarted
+            os.kill(os.getpid(), signal.SIGTERM)
+
+        threading.Thread(target=stop_when_done, daemon=True).start()
+        from icereach.services import supervisor
+        supervisor.main()  # returns once its children have drained
+
+        with SessionLocal() as s:
+            print("FINAL status=%r" % s.get(Job, jid).status)
+        """
+    )
+    env = {**os.environ, "PYTHONPATH": str(BACKEND)}
+    r = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True, text=True, env=env, timeout=90,
+    )
+    assert r.returncode == 0, f"stdout:\n{r.stdout}\nstderr:\n{r.stderr}"
+    assert "FINAL status='done'" in r.stdout, r.stdout
+    assert "recycled" in r.stdout, r.stdout